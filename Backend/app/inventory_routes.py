@@ -1,29 +1,46 @@
-from fastapi import APIRouter, Depends, HTTPException, Query
+from fastapi import APIRouter, Depends, HTTPException, Query, Request
 from watchfiles import awatch
 
 from .res_models import InventoryDetailsResponse, InventoryStatisticsResponse, InventoryResponse, \
-    ProductDetailsResponse
+    ProductDetailsResponse, LayoutRequest, LayoutResponse, CheckoutRequest, CheckoutResponse, ChangeFeedResponse
 from .services.inventorie import get_list_all_inventories, get_inventory_details, get_inventory_statistics, \
-    get_inventory_products
+    get_inventory_products, get_inventory_changes, provision_inventory_layout, checkout_basket
+from .services.utils import cached_json_response, event_stream_response
+from .job_routes import get_job_runner, job_accepted
+from src.jobs.analytics import PREVENTION_PLAN
+from src.cache.inventory_versions import inventory_versions
 from src.Db.db import get_session
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 inventory_router = APIRouter(prefix="/inventory",tags=["inventory"])
 
 @inventory_router.get("/", response_model=list[InventoryResponse], description="Get all inventories")
-async def fetch_all_inventories(session: AsyncSession = Depends(get_session)):
-    """Get a list of all inventories with basic details"""
-    return await get_list_all_inventories(session)
+async def fetch_all_inventories(request: Request, session: AsyncSession = Depends(get_session)):
+    """Get a list of all inventories with basic details, cached until any inventory changes"""
+    return await cached_json_response(request, ("inventories",), inventory_versions.total,
+                                      lambda: get_list_all_inventories(session))
+
+@inventory_router.get("/events", description="Stream the events of every inventory")
+async def stream_all_events(request: Request, last_event_id: str = None):
+    """Server-Sent Events of thefts, missing products, sales, placements and moves in every inventory"""
+    return event_stream_response(request, None, last_event_id)
 
 @inventory_router.get("/{inventory_id}", response_model=InventoryDetailsResponse,description="Get a specific inventory details")
-async def fetch_inventory_details(inventory_id: str, session: AsyncSession = Depends(get_session)):
+async def fetch_inventory_details(inventory_id: str, request: Request, session: AsyncSession = Depends(get_session)):
     """Get detailed information about a specific inventory including racks, shelves and products"""
-    return await get_inventory_details(session, inventory_id)
+    return await cached_json_response(request, ("details", inventory_id), inventory_versions.get(inventory_id),
+                                      lambda: get_inventory_details(session, inventory_id))
 
 @inventory_router.get("/{inventory_id}/statistics", response_model=InventoryStatisticsResponse,description="get statistics fo specific inventory")
-async def fetch_inventory_statistics(inventory_id: str, session: AsyncSession = Depends(get_session)):
+async def fetch_inventory_statistics(inventory_id: str, request: Request, session: AsyncSession = Depends(get_session)):
     """Get statistical information about an inventory"""
-    return await get_inventory_statistics(inventory_id, session)
+    return await cached_json_response(request, ("statistics", inventory_id), inventory_versions.get(inventory_id),
+                                      lambda: get_inventory_statistics(inventory_id, session))
+
+@inventory_router.get("/{inventory_id}/events", description="Stream the events of specific inventory")
+async def stream_inventory_events(inventory_id: str, request: Request, last_event_id: str = None):
+    """Server-Sent Events of thefts, missing products, sales, placements and moves in an inventory"""
+    return event_stream_response(request, inventory_id, last_event_id)
 
 @inventory_router.get("/{inventory_id}/products", response_model=ProductDetailsResponse, description="get all Product stored in specific inventory")
 async def fetch_inventory_products(
@@ -32,4 +49,49 @@ async def fetch_inventory_products(
     session: AsyncSession = Depends(get_session)
 ):
     """Get all products in an inventory with optional filtering by status"""
-    return await get_inventory_products(session, inventory_id, status)
\ No newline at end of file
+    return await get_inventory_products(session, inventory_id, status)
+
+@inventory_router.get("/{inventory_id}/changes", response_model=ChangeFeedResponse, description="Get product changes of specific inventory since a cursor")
+async def fetch_inventory_changes(
+    inventory_id: str,
+    cursor: str = None,
+    limit: int = Query(default=None, ge=1),
+    after: str = None,
+    session: AsyncSession = Depends(get_session)
+):
+    """Changes since cursor, or a snapshot of the products with a cursor to continue from"""
+    return await get_inventory_changes(session, inventory_id, cursor, limit, after)
+
+@inventory_router.get("/{inventory_id}/prevention-plan", description="Get the theft prevention plan of specific inventory")
+async def fetch_prevention_plan(inventory_id: str, request: Request, refresh: bool = False):
+    """
+    The plan from the last run, normally the nightly precompute. Without one, or with refresh, a new plan
+    job is queued and 202 with its status is returned.
+    """
+    runner = get_job_runner(request)
+    params = {"inventory_id": inventory_id}
+    job = None if refresh else runner.latest(PREVENTION_PLAN, params)
+    if job is not None:
+        return job.result
+    try:
+        return job_accepted(runner.submit(PREVENTION_PLAN, params))
+    except Exception as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "5"})
+
+@inventory_router.post("/{inventory_id}/layout", response_model=LayoutResponse, description="Provision racks and shelves of an inventory")
+async def create_inventory_layout(
+    inventory_id: str,
+    request: LayoutRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    """Bulk create racks and shelves from a layout, existing ones are kept"""
+    return await provision_inventory_layout(session, inventory_id, request)
+
+@inventory_router.post("/{inventory_id}/checkout", response_model=CheckoutResponse, description="Sell a basket of products")
+async def checkout(
+    inventory_id: str,
+    request: CheckoutRequest,
+    session: AsyncSession = Depends(get_session)
+):
+    """Sell many products at once, failed items are listed without aborting the basket"""
+    return await checkout_basket(session, inventory_id, request)
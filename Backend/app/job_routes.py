@@ -0,0 +1,65 @@
+from typing import Any
+
+from fastapi import APIRouter, HTTPException, Request, status
+from fastapi.responses import JSONResponse
+from fastapi.encoders import jsonable_encoder
+
+from .res_models import JobResponse
+from src.jobs.runner import JobRunner, SUCCEEDED, FAILED
+
+job_router = APIRouter(prefix="/jobs", tags=["Jobs"])
+
+
+def get_job_runner(request: Request) -> JobRunner:
+    return request.app.state.job_runner
+
+
+def job_accepted(job) -> JSONResponse:
+    """202 with the job status and where to poll it"""
+    return JSONResponse(
+        status_code=status.HTTP_202_ACCEPTED,
+        content=jsonable_encoder(JobResponse(**job.describe())),
+        headers={"Location": f"/jobs/{job.job_id}"}
+    )
+
+
+@job_router.post("/{kind}", response_model=JobResponse, status_code=status.HTTP_202_ACCEPTED,
+                 description="Submit a background analytics job")
+async def submit_job(kind: str, request: Request, inventory_id: str = None):
+    """
+    Queue prevention_plan, theft_patterns or theft_statistics of an inventory, or fleet_statistics.
+    An identical job that is still queued or running is returned instead of queueing another.
+    """
+    runner = get_job_runner(request)
+    params = {"inventory_id": inventory_id} if inventory_id else {}
+    if kind != "fleet_statistics" and not inventory_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=f"{kind} needs an inventory_id")
+    try:
+        job = runner.submit(kind, params)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
+    except Exception as e:
+        raise HTTPException(status_code=status.HTTP_503_SERVICE_UNAVAILABLE, detail=str(e),
+                            headers={"Retry-After": "5"})
+    return job_accepted(job)
+
+
+@job_router.get("/{job_id}", response_model=JobResponse, description="Get the status of a job")
+async def fetch_job(job_id: str, request: Request):
+    job = get_job_runner(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or its result expired")
+    return JobResponse(**job.describe())
+
+
+@job_router.get("/{job_id}/result", description="Get the result of a finished job")
+async def fetch_job_result(job_id: str, request: Request) -> Any:
+    """The job's result once it succeeded, 202 with its status while it is still queued or running"""
+    job = get_job_runner(request).get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found or its result expired")
+    if job.status == FAILED:
+        raise HTTPException(status_code=status.HTTP_500_INTERNAL_SERVER_ERROR, detail=f"Job failed: {job.error}")
+    if job.status != SUCCEEDED:
+        return job_accepted(job)
+    return job.result
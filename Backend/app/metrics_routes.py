@@ -0,0 +1,78 @@
+import time
+
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from src.cache.tag_index import tag_index
+from src.cache.shelf_state import shelf_state
+from src.cache.response_cache import response_cache
+from src.events.bus import event_bus
+from src.utils.metrics import metrics
+
+metrics_router = APIRouter(tags=["Metrics"])
+
+request_latency = metrics.histogram("http_request_seconds", "Latency of HTTP requests until the response is sent",
+                                    labels=("method", "route", "status"))
+requests_in_progress = [0]
+metrics.gauge("http_requests_in_progress", "HTTP requests being handled", lambda: requests_in_progress[0])
+
+
+def hit_ratio(hits: int, misses: int):
+    return hits / (hits + misses) if hits + misses else None
+
+
+def register_runtime_gauges(app=None) -> None:
+    """Gauges read from the caches, the event bus and the read pipeline at scrape time"""
+    metrics.gauge("tag_index_hit_ratio", "Tag index lookups answered from memory",
+                  lambda: hit_ratio(tag_index.hits, tag_index.misses))
+    metrics.gauge("tag_index_entries", "Tags held in the tag index", lambda: len(tag_index))
+    metrics.gauge("shelf_state_hit_ratio", "Shelf expected-tag lookups answered from memory",
+                  lambda: hit_ratio(shelf_state.hits, shelf_state.misses))
+    # A request that waited for another one building the same entry was served without a build of its own
+    metrics.gauge("response_cache_hit_ratio", "Inventory responses served from the response cache",
+                  lambda: hit_ratio(response_cache.hits + response_cache.merged,
+                                    response_cache.misses - response_cache.merged))
+    metrics.gauge("event_subscribers", "Open event stream subscriptions",
+                  lambda: event_bus.stats()["subscribers"])
+    if app is not None:
+        metrics.gauge("ingest_queue_depth", "Reads waiting in the ingestion pipeline",
+                      lambda: app.state.read_pipeline.depth if hasattr(app.state, "read_pipeline") else None)
+        metrics.gauge("jobs_queued", "Background jobs waiting for a worker",
+                      lambda: app.state.job_runner.stats()["queued"] if hasattr(app.state, "job_runner") else None)
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware observing every HTTP request into http_request_seconds, labelled with the route
+    template (/inventory/{inventory_id}) rather than the path so label values stay bounded
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        start = time.perf_counter()
+        status = [500]
+
+        async def send_status(message):
+            if message["type"] == "http.response.start":
+                status[0] = message["status"]
+            await send(message)
+
+        requests_in_progress[0] += 1
+        try:
+            await self.app(scope, receive, send_status)
+        finally:
+            requests_in_progress[0] -= 1
+            route = scope.get("route")
+            request_latency.observe(time.perf_counter() - start, scope["method"],
+                                    getattr(route, "path", "unmatched"), str(status[0]))
+
+
+@metrics_router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def fetch_metrics():
+    """Prometheus text exposition of every registered metric"""
+    return PlainTextResponse(metrics.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
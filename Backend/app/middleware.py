@@ -0,0 +1,127 @@
+import random
+
+from src.config.Settings import settings
+from src.Db.profiler import QueryProfile, current_profile
+from src.tracing.tracer import tracer, NOOP_SPAN
+from src.utils.log import get_logger
+
+log = get_logger("profiler")
+
+
+class QueryProfilerMiddleware:
+    """
+    ASGI middleware giving every HTTP request its own QueryProfile. The response carries X-DB-Queries and a
+    Server-Timing db entry with what ran before the headers were sent. Requests over the query budget or
+    repeating a statement shape repeat_threshold times (an N+1 loop) are logged with their repeated
+    shapes, and a sample_rate share of all requests is logged with the full profile.
+    """
+
+    def __init__(self, app, query_budget: int = 50, repeat_threshold: int = 10, sample_rate: float = 0.01,
+                 keep_slowest: int = 5):
+        self.app = app
+        self.query_budget = query_budget
+        self.repeat_threshold = repeat_threshold
+        self.sample_rate = sample_rate
+        self.keep_slowest = keep_slowest
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        profile = QueryProfile(self.keep_slowest)
+        token = current_profile.set(profile)
+
+        async def send_with_headers(message):
+            if message["type"] == "http.response.start":
+                headers = list(message.get("headers", []))
+                headers.append((b"x-db-queries", str(profile.count).encode()))
+                headers.append((b"server-timing",
+                                f'db;dur={profile.seconds * 1000:.2f};desc="{profile.count} queries"'.encode()))
+                if profile.count > self.query_budget:
+                    headers.append((b"x-db-query-budget", f"exceeded;budget={self.query_budget}".encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_headers)
+        finally:
+            current_profile.reset(token)
+            self.report(scope, profile)
+
+    def report(self, scope, profile: QueryProfile) -> None:
+        if not profile.count:
+            return
+        request = f"{scope['method']} {scope['path']}"
+        over_budget = profile.count > self.query_budget
+        repeated = profile.repeated(self.repeat_threshold)
+        if over_budget or repeated:
+            log.warning("db_profile_exceeded", request=request, queries=profile.count,
+                        db_ms=round(profile.seconds * 1000, 1), query_budget=self.query_budget,
+                        over_budget=over_budget, repeated_statements=len(repeated),
+                        repeated=[{"count": count, "fingerprint": shape[:200]} for shape, count in repeated[:3]])
+        if self.sample_rate and random.random() < self.sample_rate:
+            log.info("db_profile_sample", request=request, **profile.summary(self.repeat_threshold))
+
+
+def parse_traceparent(value: str):
+    """(trace_id, parent_id, sampled) of a W3C traceparent header, None when malformed"""
+    parts = value.strip().split("-")
+    if len(parts) != 4 or len(parts[1]) != 32 or len(parts[2]) != 16 or len(parts[3]) != 2:
+        return None
+    try:
+        flags = int(parts[3], 16)
+        int(parts[1], 16), int(parts[2], 16)
+    except ValueError:
+        return None
+    if parts[1] == "0" * 32 or parts[2] == "0" * 16:
+        return None
+    return parts[1], parts[2], bool(flags & 1)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware starting a trace per HTTP request, its root span named by the route template once routing
+    has run. A traceparent header from the caller continues the caller's trace and its sampling decision,
+    so a slow request can be traced on demand with a sampled flag. Sampled responses carry traceparent.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+        context = None
+        for name, value in scope.get("headers", []):
+            if name == b"traceparent":
+                context = parse_traceparent(value.decode("latin-1"))
+                break
+        trace_id, parent_id, sampled = context if context else (None, None, None)
+        status = [500]
+
+        with tracer.start_trace(f"{scope['method']} {scope['path']}", kind="server", sampled=sampled,
+                                trace_id=trace_id, parent_id=parent_id, **{"http.method": scope["method"],
+                                                                           "http.target": scope["path"]}) as span:
+            async def send_traced(message):
+                if message["type"] == "http.response.start":
+                    status[0] = message["status"]
+                    if span is not NOOP_SPAN:
+                        headers = list(message.get("headers", []))
+                        headers.append((b"traceparent", f"00-{span.trace.trace_id}-{span.span_id}-01".encode()))
+                        message = {**message, "headers": headers}
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_traced)
+            finally:
+                route = scope.get("route")
+                if route is not None:
+                    span.rename(f"{scope['method']} {route.path}")
+                    span.set(**{"http.route": route.path})
+                span.set(**{"http.status_code": status[0]})
+
+
+def query_profiler_options() -> dict:
+    return {"query_budget": settings.DB_QUERY_BUDGET, "repeat_threshold": settings.DB_REPEAT_THRESHOLD,
+            "sample_rate": settings.DB_PROFILE_SAMPLE_RATE, "keep_slowest": settings.DB_PROFILE_KEEP_SLOWEST}
@@ -0,0 +1,95 @@
+import asyncio
+import time
+from typing import List
+
+from fastapi import APIRouter, HTTPException, Request, WebSocket, WebSocketDisconnect, status
+from pydantic import ValidationError
+from .res_models import TagReadBatchRequest, TagReadBatchResponse, ScannerMessage
+from src.config.Settings import settings
+from src.Db.db import async_session
+from src.ingest.pipeline import TagRead
+from src.ingest.scanner import ShelfScanSession
+from src.utils.log import get_logger
+
+log = get_logger("reader")
+
+reader_router = APIRouter(prefix="/reader", tags=["Reader"])
+
+
+@reader_router.post("/{reader_id}/reads", response_model=TagReadBatchResponse, description="Submit raw RFID reads of a reader")
+async def submit_reads(reader_id: str, request: TagReadBatchRequest, http_request: Request):
+    """Queue reads into the ingestion pipeline, answers 429 when the queue is full"""
+    pipeline = http_request.app.state.read_pipeline
+    now = time.time()
+    reads = [
+        TagRead(reader_id, read.rfid_tag, read.timestamp if read.timestamp is not None else now, read.rssi)
+        for read in request.reads
+    ]
+    accepted = pipeline.offer(reads)
+    if accepted < len(reads):
+        raise HTTPException(
+            status_code=status.HTTP_429_TOO_MANY_REQUESTS,
+            detail=f"Ingestion queue full, {len(reads) - accepted} reads rejected",
+            headers={"Retry-After": "1"}
+        )
+    return TagReadBatchResponse(
+        reader_id=reader_id,
+        accepted=accepted,
+        queue_depth=pipeline.depth,
+        backpressure=pipeline.backpressure
+    )
+
+
+@reader_router.websocket("/scanner/{shelf_id}")
+async def scanner_stream(websocket: WebSocket, shelf_id: str):
+    """
+    Handheld scan of one shelf. The scanner streams {"type": "tags", "tags": [...]} messages and ends with
+    {"type": "complete"}. Tags are reconciled once SCANNER_BATCH_SIZE have arrived or after
+    SCANNER_FLUSH_INTERVAL_SECONDS, each batch is answered with a "progress" message and completion with the
+    stored scan. A scan that is cancelled or disconnects before completing stores nothing.
+    Each step uses a short-lived session, the socket does not hold a database connection while it waits.
+    """
+    await websocket.accept()
+    scan = ShelfScanSession(async_session, shelf_id)
+    try:
+        await websocket.send_json(await scan.start())
+    except ValueError as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=status.WS_1008_POLICY_VIOLATION)
+        return
+
+    loop = asyncio.get_running_loop()
+    pending: List[str] = []
+    flush_at = None
+    try:
+        while True:
+            message = None
+            try:
+                timeout = None if flush_at is None else max(0.0, flush_at - loop.time())
+                message = ScannerMessage.model_validate_json(await asyncio.wait_for(websocket.receive_text(), timeout))
+            except asyncio.TimeoutError:
+                pass
+            except ValidationError as e:
+                await websocket.send_json({"type": "error", "detail": str(e)})
+                continue
+
+            if message is not None and message.type == "cancel":
+                await websocket.close()
+                return
+            if message is not None and message.type == "tags":
+                pending.extend(message.tags)
+                if flush_at is None:
+                    flush_at = loop.time() + settings.SCANNER_FLUSH_INTERVAL_SECONDS
+                if len(pending) < settings.SCANNER_BATCH_SIZE:
+                    continue
+
+            if pending:
+                await websocket.send_json(await scan.add(pending))
+                pending = []
+                flush_at = None
+            if message is not None and message.type == "complete":
+                await websocket.send_json(await scan.complete(report_missing=message.report_missing))
+                await websocket.close()
+                return
+    except WebSocketDisconnect:
+        log.info("handheld_scan_abandoned", shelf_id=shelf_id)
@@ -1,6 +1,6 @@
 # res_models.py
 import datetime
-from typing import List, Optional
+from typing import List, Optional, Dict, Literal
 from pydantic import BaseModel, Field
 
 
@@ -88,4 +88,91 @@ class InventoryStatisticsResponse(BaseModel):
     total_sales: int
     total_sales_value: float
     total_receipts: int
-    sale:List[Sale]
\ No newline at end of file
+    sale:List[Sale]
+
+
+class LayoutRequest(BaseModel):
+    """Rack and shelf layout to provision, either uniform or one shelf count per rack"""
+    rack_count: Optional[int] = None
+    shelves_per_rack: Optional[int] = None
+    layout: Optional[List[int]] = Field(default=None, description="Number of shelves for each rack")
+
+
+class LayoutResponse(BaseModel):
+    inventory_id: str
+    total_racks: int
+    total_shelves: int
+    racks_created: int
+    shelves_created: int
+
+
+class CheckoutRequest(BaseModel):
+    """Basket of items to sell, by RFID tag and/or product ID"""
+    rfid_tags: List[str] = Field(default_factory=list)
+    product_ids: List[str] = Field(default_factory=list)
+
+
+class CheckoutResponse(BaseModel):
+    inventory_id: str
+    sales: List[Sale]
+    failed: Dict[str, str] = Field(description="Items that could not be sold and the reason")
+
+
+class ProductChangeResponse(BaseModel):
+    seq: int
+    product_id: str
+    rfid_tag: str
+    status: str
+    shelf_id: Optional[str] = None
+
+
+class ChangeFeedResponse(BaseModel):
+    """
+    Product changes of an inventory since a cursor. When the cursor is too old to be served, snapshot is
+    true and products holds a page of the inventory's unsold products; together the pages replace the
+    client's copy instead. A change to sold means the product has left the inventory.
+    """
+    inventory_id: str
+    cursor: str = Field(description="Pass back as cursor to get the changes after this response")
+    snapshot: bool = False
+    has_more: bool = Field(default=False, description="More changes are waiting, request again right away")
+    after: Optional[str] = Field(default=None, description="Pass back as after with cursor for the next snapshot page")
+    changes: List[ProductChangeResponse] = Field(default_factory=list)
+    products: Optional[List[ProductChangeResponse]] = None
+
+
+class JobResponse(BaseModel):
+    """Status of a background job, result is only set on the result endpoint"""
+    job_id: str
+    kind: str
+    params: Dict[str, str] = Field(default_factory=dict)
+    status: Literal["queued", "running", "succeeded", "failed"]
+    submitted_at: datetime.datetime
+    started_at: Optional[datetime.datetime] = None
+    finished_at: Optional[datetime.datetime] = None
+    error: Optional[str] = None
+
+
+class TagReadRequest(BaseModel):
+    rfid_tag: str
+    timestamp: Optional[float] = Field(default=None, description="Seconds since epoch, defaults to arrival time")
+    rssi: Optional[float] = None
+
+
+class TagReadBatchRequest(BaseModel):
+    """Raw reads reported by one reader"""
+    reads: List[TagReadRequest]
+
+
+class TagReadBatchResponse(BaseModel):
+    reader_id: str
+    accepted: int
+    queue_depth: int
+    backpressure: bool = Field(description="True when the producer should slow down")
+
+
+class ScannerMessage(BaseModel):
+    """Message from a handheld scanner: a batch of tags, the end of the scan or an abort"""
+    type: Literal["tags", "complete", "cancel"]
+    tags: List[str] = Field(default_factory=list)
+    report_missing: bool = True
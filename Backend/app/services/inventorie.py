@@ -6,10 +6,16 @@ from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..res_models import InventoryResponse, InventoryOwnerResponse, InventoryDetailsResponse, \
     StorageRackResponse, ShelfResponse, ProductResponse, SupplierResponse, InventoryStatisticsResponse, \
-    ProductDetailsResponse
+    ProductDetailsResponse, LayoutRequest, LayoutResponse, CheckoutRequest, CheckoutResponse, ChangeFeedResponse, \
+    ProductChangeResponse
+from src.cache.change_log import change_log
+from src.config.Settings import settings
 from src.Db.models import InventoryOwner, Inventory, Supplier, InventorySupplier, StorageRack, Shelf, Product, \
-    ProductStatus
+    ProductStatus, SupplierReceipt
 from src.manager.warehouse_manager import WarehouseManager
+from src.utils.log import get_logger
+
+log = get_logger("api")
 
 
 async def get_list_all_inventories(session: AsyncSession) -> List[InventoryResponse]:
@@ -113,10 +119,11 @@ async def get_inventory_details(session: AsyncSession, inventory_id: str) -> Inv
             total_products=inventory_stats.get('products_on_shelf')
         )
     except HTTPException as e:
-        print(f"Error get_inventory_details: {e} ")
+        log.warning("inventory_details_failed", inventory_id=inventory_id, status_code=e.status_code,
+                    error=str(e.detail))
         raise
     except Exception as e:
-        print(f"Error get_inventory_details: {e} ")
+        log.error("inventory_details_failed", inventory_id=inventory_id, error=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching inventory details: {str(e)}"
@@ -175,7 +182,7 @@ async def get_inventory_statistics(inventory_id: str, session: AsyncSession) ->
     except HTTPException:
         raise
     except Exception as e:
-        print(e)
+        log.error("inventory_statistics_failed", inventory_id=inventory_id, error=str(e))
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Error fetching inventory statistics: {str(e)}"
@@ -254,6 +261,72 @@ async def get_inventory_products(
         )
 
 
+async def get_inventory_changes(
+        session: AsyncSession,
+        inventory_id: str,
+        cursor: Optional[str] = None,
+        limit: Optional[int] = None,
+        after: Optional[str] = None
+) -> ChangeFeedResponse:
+    """
+    Product changes of an inventory since cursor. Without a cursor, or with one the change log can no
+    longer serve, the inventory's products are returned as a snapshot along with a cursor to continue from.
+    The feed covers the products received into the inventory through a supplier receipt: the snapshot holds
+    those not sold yet, and a change to sold removes a product. The snapshot is paged by product ID; while
+    has_more is set, pass its cursor and after back for the next page.
+    """
+    limit = min(limit or settings.CHANGE_FEED_PAGE_SIZE, settings.CHANGE_FEED_PAGE_SIZE)
+    if cursor:
+        try:
+            result = change_log.since(inventory_id, cursor, limit) if after is None else None
+            # A later snapshot page keeps the cursor of the first one, unless the log lost it meanwhile
+            if after is not None and not change_log.serves(inventory_id, cursor):
+                after = None
+        except ValueError as e:
+            raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+        if result is not None:
+            changes, next_cursor, has_more = result
+            return ChangeFeedResponse(
+                inventory_id=inventory_id,
+                cursor=next_cursor,
+                has_more=has_more,
+                changes=[ProductChangeResponse(**change._asdict()) for change in changes]
+            )
+
+    try:
+        inventory = await session.get(Inventory, inventory_id)
+        if not inventory:
+            raise HTTPException(status_code=404, detail=f"Inventory with ID {inventory_id} not found")
+
+        # Taken before the first page, changes committed while the snapshot is read are sent again after it
+        next_cursor = cursor if after is not None else change_log.cursor(inventory_id)
+        query = (
+            select(Product.product_id, Product.rfid_tag, Product.status, Product.shelf_id)
+            .join(SupplierReceipt, Product.receipt_id == SupplierReceipt.receipt_id)
+            .where(SupplierReceipt.inventory_id == inventory_id, Product.status != ProductStatus.SOLD)
+            .order_by(Product.product_id)
+            .limit(limit + 1)
+        )
+        if after is not None:
+            query = query.where(Product.product_id > after)
+        rows = (await session.exec(query)).all()
+        has_more = len(rows) > limit
+        products = [
+            ProductChangeResponse(seq=0, product_id=product_id, rfid_tag=rfid_tag,
+                                  status=ProductStatus(product_status).value, shelf_id=shelf_id)
+            for product_id, rfid_tag, product_status, shelf_id in rows[:limit]
+        ]
+        return ChangeFeedResponse(inventory_id=inventory_id, cursor=next_cursor, snapshot=True, has_more=has_more,
+                                  after=products[-1].product_id if has_more else None, products=products)
+    except HTTPException:
+        raise
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error fetching inventory changes: {str(e)}"
+        )
+
+
 async def move_product_to_shelf(
         session: AsyncSession,
         product_id: str,
@@ -382,3 +455,50 @@ async def sell_product(
         )
 
 
+async def provision_inventory_layout(
+        session: AsyncSession,
+        inventory_id: str,
+        request: LayoutRequest
+) -> LayoutResponse:
+    """Create all racks and shelves of an inventory from a layout"""
+    try:
+        warehouse_manager = WarehouseManager(session)
+        result = await warehouse_manager.provision_layout(
+            inventory_id,
+            rack_count=request.rack_count,
+            shelves_per_rack=request.shelves_per_rack,
+            layout=request.layout
+        )
+        return LayoutResponse(**result)
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error provisioning inventory layout: {str(e)}"
+        )
+
+
+async def checkout_basket(
+        session: AsyncSession,
+        inventory_id: str,
+        request: CheckoutRequest
+) -> CheckoutResponse:
+    """Sell a basket of products in one transaction"""
+    try:
+        warehouse_manager = WarehouseManager(session)
+        result = await warehouse_manager.checkout_products(
+            rfid_tags=request.rfid_tags,
+            product_ids=request.product_ids,
+            inventory_id=inventory_id
+        )
+        return CheckoutResponse(
+            inventory_id=inventory_id,
+            sales=[sale.model_dump() for sale in result["sales"]],
+            failed=result["failed"]
+        )
+    except Exception as e:
+        raise HTTPException(
+            status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
+            detail=f"Error recording checkout: {str(e)}"
+        )
@@ -1,11 +1,72 @@
-import datetime
-import hashlib
-import uuid
+import json
+from typing import Any, AsyncIterator, Awaitable, Callable, Hashable, Optional
+
+from fastapi import Request, Response
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import StreamingResponse
+
+from src.cache.response_cache import response_cache
+from src.config.Settings import settings
+from src.events.bus import event_bus
+from src.utils.id_generator import new_id
 
 
 def generate_id(tag:str):
-    unique_id = str(uuid.uuid4())
-    timestamp = str(datetime.datetime.now())
-    id_hash = hashlib.sha256((timestamp + unique_id).encode()).hexdigest()[:10]
-    id_tag = f"{tag}_{id_hash}"
-    return id_tag
+    return new_id(tag)
+
+
+def etag_matches(request: Request, etag: str) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if not if_none_match:
+        return False
+    candidates = [candidate.strip() for candidate in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates or f"W/{etag}" in candidates
+
+
+async def cached_json_response(request: Request, key: Hashable, version: int,
+                               produce: Callable[[], Awaitable[Any]]) -> Response:
+    """
+    Serve the JSON of produce() from the response cache while version is current, with an ETag so clients
+    that send it back in If-None-Match get a 304 without a body. version must be read before produce runs,
+    so a write that lands during produce leaves the entry already outdated instead of hiding the write.
+    Concurrent requests missing the same key and version share one produce() call.
+    """
+    async def build() -> bytes:
+        content = jsonable_encoder(await produce())
+        return json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+    entry = await response_cache.fill(key, version, build)
+    headers = {"ETag": entry.etag, "Cache-Control": "no-cache"}
+    if etag_matches(request, entry.etag):
+        return Response(status_code=304, headers=headers)
+    return Response(content=entry.body, media_type="application/json", headers=headers)
+
+
+def event_stream_response(request: Request, inventory_id: Optional[str],
+                          last_event_id: Optional[str] = None) -> StreamingResponse:
+    """
+    Server-Sent Events stream of an inventory's events, or of every event when inventory_id is None.
+    Browsers resume with the Last-Event-ID header, other clients can pass last_event_id instead.
+    A comment line is sent every EVENT_KEEPALIVE_SECONDS so proxies keep idle streams open.
+    """
+    subscription = event_bus.subscribe(inventory_id, request.headers.get("last-event-id") or last_event_id)
+
+    async def frames() -> AsyncIterator[bytes]:
+        try:
+            yield b"retry: 3000\n\n"
+            while True:
+                try:
+                    event = await subscription.next(settings.EVENT_KEEPALIVE_SECONDS)
+                except StopAsyncIteration:
+                    return
+                if event is None:
+                    if await request.is_disconnected():
+                        return
+                    yield b": keepalive\n\n"
+                else:
+                    yield event.frame
+        finally:
+            event_bus.unsubscribe(subscription)
+
+    return StreamingResponse(frames(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
@@ -0,0 +1,103 @@
+"""
+Index size and lookup speed of RFID tags stored as text versus binary EPCs.
+Loads the same random 128-bit tags into a text column and an EPC column, builds a unique index on each and
+times point lookups and batched IN lookups through SQLAlchemy, conversion included.
+Run from the Backend directory: python -m benchmarks.epc_bench [--url postgresql+asyncpg://...]
+"""
+import argparse
+import asyncio
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import MetaData, Table, Column, Integer, String, Index, select, text
+from sqlalchemy.ext.asyncio import create_async_engine
+
+from src.Db.types import EPC
+from src.utils.epc import TAG_PREFIX
+
+metadata = MetaData()
+text_tags = Table("bench_tag_text", metadata, Column("id", Integer, primary_key=True), Column("rfid_tag", String))
+epc_tags = Table("bench_tag_epc", metadata, Column("id", Integer, primary_key=True), Column("rfid_tag", EPC()))
+
+
+async def index_size(conn, table: Table) -> int:
+    """Bytes used by the unique index on rfid_tag"""
+    index_name = f"ix_{table.name}"
+    if conn.dialect.name == "postgresql":
+        return (await conn.execute(text(f"SELECT pg_relation_size('{index_name}')"))).scalar()
+    page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+    before = (await conn.execute(text("PRAGMA page_count"))).scalar()
+    await conn.run_sync(lambda sync: Index(index_name, table.c.rfid_tag, unique=True).create(sync))
+    return ((await conn.execute(text("PRAGMA page_count"))).scalar() - before) * page_size
+
+
+async def run(args):
+    url = args.url
+    path = None
+    if url is None:
+        path = os.path.join(tempfile.mkdtemp(), "epc_bench.db")
+        url = f"sqlite+aiosqlite:///{path}"
+    engine = create_async_engine(url)
+    rng = random.Random(args.seed)
+    tags = [TAG_PREFIX + rng.getrandbits(128).to_bytes(16, "big").hex() for _ in range(args.tags)]
+    rows = [{"id": number, "rfid_tag": tag} for number, tag in enumerate(tags)]
+
+    async with engine.begin() as conn:
+        await conn.run_sync(metadata.drop_all)
+        await conn.run_sync(metadata.create_all)
+        for table in (text_tags, epc_tags):
+            for offset in range(0, len(rows), 50_000):
+                await conn.execute(table.insert(), rows[offset:offset + 50_000])
+
+    results = {}
+    for table in (text_tags, epc_tags):
+        async with engine.begin() as conn:
+            if conn.dialect.name == "postgresql":
+                await conn.run_sync(lambda sync: Index(f"ix_{table.name}", table.c.rfid_tag, unique=True).create(sync))
+            size = await index_size(conn, table)
+
+        async with engine.connect() as conn:
+            probes = rng.sample(tags, args.lookups)
+            start = time.perf_counter()
+            for tag in probes:
+                (await conn.execute(select(table.c.id).where(table.c.rfid_tag == tag))).one()
+            point = (time.perf_counter() - start) / len(probes)
+
+            start = time.perf_counter()
+            for _ in range(args.batches):
+                batch = rng.sample(tags, args.batch_size)
+                found = (await conn.execute(select(table.c.rfid_tag).where(table.c.rfid_tag.in_(batch)))).all()
+                assert len(found) == len(batch)
+            batched = (time.perf_counter() - start) / (args.batches * args.batch_size)
+        results[table.name] = (size, point, batched)
+
+    await engine.dispose()
+    if path:
+        os.remove(path)
+
+    print(f"{args.tags:,} tags on {url.split(':')[0]}")
+    print(f"{'storage':<10}{'index size':>14}{'point lookup':>16}{'batched lookup':>18}")
+    for name, label in ((text_tags.name, "text"), (epc_tags.name, "binary")):
+        size, point, batched = results[name]
+        print(f"{label:<10}{size / 1024 / 1024:>11.1f} MB{point * 1e6:>13.1f} us{batched * 1e6:>12.2f} us/tag")
+    text_size, text_point, text_batched = results[text_tags.name]
+    epc_size, epc_point, epc_batched = results[epc_tags.name]
+    print(f"binary index is {epc_size / text_size:.0%} of text, point lookups {text_point / epc_point:.2f}x, "
+          f"batched lookups {text_batched / epc_batched:.2f}x")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--url", help="Async SQLAlchemy URL of a scratch database, default a temporary SQLite file")
+    parser.add_argument("--tags", type=int, default=500_000)
+    parser.add_argument("--lookups", type=int, default=5_000, help="Single tag lookups")
+    parser.add_argument("--batches", type=int, default=50)
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--seed", type=int, default=11)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
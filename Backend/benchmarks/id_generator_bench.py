@@ -0,0 +1,47 @@
+"""
+IDs per second of the ID generator compared with the old sha256(datetime.now()) IDs.
+Run from the Backend directory: python -m benchmarks.id_generator_bench
+"""
+import argparse
+import datetime
+import hashlib
+import time
+
+from src.utils.id_generator import IdGenerator
+
+
+def legacy_id(prefix: str) -> str:
+    return f"{prefix}_{hashlib.sha256(str(datetime.datetime.now()).encode()).hexdigest()[:10]}"
+
+
+def measure(label: str, func, count: int) -> float:
+    start = time.perf_counter()
+    func(count)
+    elapsed = time.perf_counter() - start
+    rate = count / elapsed
+    print(f"{label:<28} {rate:>14,.0f} IDs/s")
+    return rate
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--count", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    generator = IdGenerator(worker_id=1)
+
+    legacy = []
+    measure("legacy sha256", lambda n: legacy.extend(legacy_id("SCAN") for _ in range(n)), args.count)
+    single = []
+    measure("IdGenerator.new_id", lambda n: single.extend(generator.new_id("SCAN") for _ in range(n)), args.count)
+    batch = []
+    measure("IdGenerator.new_ids", lambda n: batch.extend(generator.new_ids("SCAN", n)), args.count)
+
+    print(f"legacy collisions: {len(legacy) - len(set(legacy)):,}")
+    generated = single + batch
+    print(f"generator collisions: {len(generated) - len(set(generated)):,}, "
+          f"sorted: {generated == sorted(generated)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,80 @@
+"""
+Raw read throughput of the ingestion pipeline on one core.
+Shelf readers report every tag in range several times per second; the sink resolves each
+deduplicated batch through a pre-warmed tag index, so no database is needed.
+Run from the Backend directory: python -m benchmarks.ingest_bench
+"""
+import argparse
+import asyncio
+import random
+import time
+
+from src.cache.tag_index import TagIndex, TagInfo
+from src.Db.models import ProductStatus
+from src.ingest.pipeline import ReadPipeline, TagRead
+
+
+def generate_reads(readers: int, tags_per_reader: int, reads_per_second: int, seconds: int, seed: int):
+    """Reads ordered by time, each tag is reported reads_per_second times per second"""
+    rng = random.Random(seed)
+    reader_tags = [
+        (f"SHELF_{reader:04d}", [f"RFID_{reader:04d}{tag:028x}" for tag in range(tags_per_reader)])
+        for reader in range(readers)
+    ]
+    reads = []
+    step = 1.0 / reads_per_second
+    start = 1_700_000_000.0
+    for tick in range(seconds * reads_per_second):
+        now = start + tick * step
+        for reader_id, tags in reader_tags:
+            for tag in tags:
+                reads.append(TagRead(reader_id, tag, now + rng.random() * step, -40 - rng.random() * 30))
+    return reader_tags, reads
+
+
+async def run(args):
+    reader_tags, reads = generate_reads(args.readers, args.tags, args.rate, args.seconds, args.seed)
+    index = TagIndex(max_size=args.readers * args.tags)
+    for reader_id, tags in reader_tags:
+        for tag in tags:
+            index.put(tag, TagInfo(f"PRODUCT_{tag[5:]}", ProductStatus.ON_SHELF, reader_id, "INV_1"))
+
+    resolved = 0
+
+    async def sink(batch):
+        nonlocal resolved
+        for read in batch:
+            if index.get(read.rfid_tag) is not None:
+                resolved += 1
+
+    pipeline = ReadPipeline(sink, max_queue_size=args.queue, dedup_window=1.0,
+                            batch_size=args.batch, flush_interval=0.05)
+    pipeline.start()
+    start = time.perf_counter()
+    for offset in range(0, len(reads), args.chunk):
+        await pipeline.submit(reads[offset:offset + args.chunk])
+    await pipeline.stop(drain=True)
+    elapsed = time.perf_counter() - start
+
+    stats = pipeline.stats()
+    print(f"raw reads:        {len(reads):,}")
+    print(f"after dedup:      {stats['flushed']:,} in {stats['batches']:,} batches ({resolved:,} resolved)")
+    print(f"elapsed:          {elapsed:.2f}s")
+    print(f"throughput:       {len(reads) / elapsed:,.0f} raw reads/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=200)
+    parser.add_argument("--tags", type=int, default=100, help="Tags in range of each reader")
+    parser.add_argument("--rate", type=int, default=10, help="Reports per tag per second")
+    parser.add_argument("--seconds", type=int, default=5)
+    parser.add_argument("--chunk", type=int, default=500, help="Reads per submit call")
+    parser.add_argument("--batch", type=int, default=2_000)
+    parser.add_argument("--queue", type=int, default=100_000)
+    parser.add_argument("--seed", type=int, default=7)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
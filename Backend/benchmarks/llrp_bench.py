@@ -0,0 +1,71 @@
+"""
+Report throughput of the LLRP reader endpoint with local stand-in readers.
+Every stand-in holds its own TCP connection; halfway through all connections are dropped to exercise
+reconnects. Reads go into a ReadPipeline with a counting sink, so no database is needed.
+Run from the Backend directory: python -m benchmarks.llrp_bench
+"""
+import argparse
+import asyncio
+import time
+
+from src.dummy.llrp_reader import LLRPStandInReader
+from src.dummy.reader_fleet import ReaderFleet
+from src.ingest.llrp import LLRPReaderServer
+from src.ingest.pipeline import ReadPipeline
+
+
+async def run(args):
+    flushed = 0
+
+    async def sink(batch):
+        nonlocal flushed
+        flushed += len(batch)
+
+    pipeline = ReadPipeline(sink, max_queue_size=args.queue, dedup_window=1.0, batch_size=2_000, flush_interval=0.05)
+    pipeline.start()
+    server = LLRPReaderServer(pipeline, host="127.0.0.1", port=0, keepalive_interval=1.0)
+    await server.start()
+
+    fleet = ReaderFleet.synthetic(args.readers, args.tags, seed=args.seed)
+    stand_ins = [
+        LLRPStandInReader(reader, "127.0.0.1", server.port, args.rate / args.readers, args.tags_per_report)
+        for reader in fleet.readers
+    ]
+    start = time.perf_counter()
+    runs = asyncio.gather(*(stand_in.run(args.duration) for stand_in in stand_ins))
+    if args.drop:
+        await asyncio.sleep(args.duration / 2)
+        for stand_in in stand_ins:
+            stand_in.drop_connection()
+    await runs
+    elapsed = time.perf_counter() - start
+    await server.stop()
+    await pipeline.stop(drain=True)
+
+    stats = server.stats()
+    sent = sum(stand_in.reports_sent for stand_in in stand_ins)
+    connections = sum(stand_in.connections for stand_in in stand_ins)
+    print(f"readers:          {args.readers} ({connections} connections)")
+    print(f"reports:          {stats['reports']:,} received of {sent:,} sent")
+    print(f"reads:            {stats['reads']:,} ({flushed:,} after dedup)")
+    print(f"rounds:           {stats['rounds']:,}")
+    print(f"flow control:     {stats['pauses']} pauses, {stats['protocol_errors']} protocol errors")
+    print(f"elapsed:          {elapsed:.2f}s")
+    print(f"throughput:       {stats['reports'] / elapsed:,.0f} reports/s, {stats['reads'] / elapsed:,.0f} reads/s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--readers", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=40, help="Tags in range of each reader")
+    parser.add_argument("--rate", type=float, default=5_000, help="Reports per second over all readers")
+    parser.add_argument("--tags-per-report", type=int, default=20)
+    parser.add_argument("--duration", type=float, default=5.0)
+    parser.add_argument("--queue", type=int, default=100_000)
+    parser.add_argument("--no-drop", dest="drop", action="store_false", help="Do not drop connections halfway")
+    parser.add_argument("--seed", type=int, default=3)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,332 @@
+"""
+Load test of the API with scripted scenarios, driving server.app in-process through its ASGI interface or a
+running server over HTTP.
+
+    python -m benchmarks.loadtest --database sqlite+aiosqlite:///loadtest.db --duration 30 --concurrency 20
+    python -m benchmarks.loadtest --url http://127.0.0.1:8000 --inventory INV_xxx --scenario dashboard
+    python -m benchmarks.loadtest --database sqlite+aiosqlite:///loadtest.db --save-baseline baseline.json
+    python -m benchmarks.loadtest --database sqlite+aiosqlite:///loadtest.db --baseline baseline.json
+
+Each of --concurrency virtual users loops over the scenario's actions until --duration is up:
+- dashboard: polls the inventory details, statistics and change feed, and the product list every 10th poll
+- receipt: creates a supplier receipt of --receipt-size products (POST /test/{inventory_id}/create_products)
+- scan: posts a shelf's tags as one reader batch (POST /reader/{shelf_id}/reads)
+- checkout: sells a basket of --basket-size products still on a shelf
+The mix scenario weights them 60/5/25/10. In-process, the app's lifespan runs against --database (default the
+configured Postgres) and a fresh inventory of --products products is seeded unless --inventory is given.
+Client and server then share one event loop, so absolute numbers are lower than over HTTP.
+
+Latency percentiles and requests/s are reported per endpoint (route template) and written as JSON with --out.
+With --baseline, p50/p95 and requests/s more than --tolerance worse than the baseline (p99 twice that), or an
+error rate up by more than a percent point, are regressions: they are listed and the exit code is 1.
+"""
+import argparse
+import asyncio
+import json
+import os
+import random
+import sys
+import time
+from typing import Optional, Dict, List, Any
+
+import httpx
+
+from src.utils.stats import latency_summary
+
+SUPPLIER_ID = "LOADTEST_SUPPLIER"
+SUPPLIER_NAME = "Load Test Supplier"
+SCENARIOS = {
+    "dashboard": {"dashboard": 1},
+    "receipts": {"receipt": 1},
+    "scans": {"scan": 1},
+    "checkout": {"checkout": 1},
+    "mix": {"dashboard": 60, "receipt": 5, "scan": 25, "checkout": 10}
+}
+
+
+class Fixture:
+    """What the scenarios work on: the inventory, the tags on each shelf and the products left to sell"""
+
+    def __init__(self, inventory_id: str, shelf_tags: Dict[str, List[str]], sellable: List[str]):
+        self.inventory_id = inventory_id
+        self.shelf_tags = shelf_tags
+        self.shelves = [shelf_id for shelf_id, tags in shelf_tags.items() if tags]
+        self.sellable = sellable
+
+    @classmethod
+    async def load(cls, client: httpx.AsyncClient, inventory_id: str, seed: int = 0) -> "Fixture":
+        response = await client.get(f"/inventory/{inventory_id}/products")
+        if response.status_code != 200:
+            raise ValueError(f"Inventory {inventory_id} could not be loaded: {response.status_code} {response.text}")
+        shelf_tags: Dict[str, List[str]] = {}
+        sellable = []
+        for product in response.json()["products"]:
+            if product["status"] == "on_shelf" and product["shelf_id"]:
+                shelf_tags.setdefault(product["shelf_id"], []).append(product["rfid_tag"])
+                sellable.append(product["product_id"])
+        random.Random(seed).shuffle(sellable)
+        return cls(inventory_id, shelf_tags, sellable)
+
+
+class LoadTest:
+    def __init__(self, client: httpx.AsyncClient, fixture: Fixture, scenario: str = "mix", concurrency: int = 10,
+                 duration: float = 30.0, warmup: float = 2.0, seed: int = 0, receipt_size: int = 20,
+                 basket_size: int = 3):
+        if scenario not in SCENARIOS:
+            raise ValueError(f"Unknown scenario {scenario}, expected one of {', '.join(SCENARIOS)}")
+        self.client = client
+        self.fixture = fixture
+        self.scenario = scenario
+        self.concurrency = concurrency
+        self.duration = duration
+        self.warmup = warmup
+        self.seed = seed
+        self.receipt_size = receipt_size
+        self.basket_size = basket_size
+        self.latencies: Dict[str, List[float]] = {}
+        self.statuses: Dict[str, Dict[str, int]] = {}
+        self.checkouts_skipped = 0
+        self._record_from = 0.0
+        self._deadline = 0.0
+
+    async def request(self, endpoint: str, method: str, url: str, **kwargs) -> Optional[httpx.Response]:
+        """Send one request, recorded under endpoint once the warm-up is over"""
+        start = time.perf_counter()
+        try:
+            response = await self.client.request(method, url, **kwargs)
+            status = str(response.status_code)
+        except httpx.HTTPError as e:
+            response = None
+            status = type(e).__name__
+        if start >= self._record_from:
+            self.latencies.setdefault(endpoint, []).append(time.perf_counter() - start)
+            statuses = self.statuses.setdefault(endpoint, {})
+            statuses[status] = statuses.get(status, 0) + 1
+        return response
+
+    async def dashboard(self, state: Dict[str, Any], rng: random.Random) -> None:
+        inventory_id = self.fixture.inventory_id
+        await self.request("GET /inventory/{inventory_id}", "GET", f"/inventory/{inventory_id}")
+        await self.request("GET /inventory/{inventory_id}/statistics", "GET", f"/inventory/{inventory_id}/statistics")
+        params = {"cursor": state["cursor"]} if state.get("cursor") else {}
+        response = await self.request("GET /inventory/{inventory_id}/changes", "GET",
+                                      f"/inventory/{inventory_id}/changes", params=params)
+        if response is not None and response.status_code == 200:
+            state["cursor"] = response.json()["cursor"]
+        state["polls"] = state.get("polls", 0) + 1
+        if state["polls"] % 10 == 0:
+            await self.request("GET /inventory/{inventory_id}/products", "GET", f"/inventory/{inventory_id}/products")
+
+    async def receipt(self, state: Dict[str, Any], rng: random.Random) -> None:
+        await self.request("POST /test/{inventory_id}/create_products", "POST",
+                           f"/test/{self.fixture.inventory_id}/create_products",
+                           params={"num_products": self.receipt_size, "supplier_name": SUPPLIER_NAME,
+                                   "supplier_id": SUPPLIER_ID})
+
+    async def scan(self, state: Dict[str, Any], rng: random.Random) -> None:
+        if not self.fixture.shelves:
+            return
+        shelf_id = rng.choice(self.fixture.shelves)
+        reads = [{"rfid_tag": tag, "rssi": round(-35 - rng.random() * 35, 1)}
+                 for tag in self.fixture.shelf_tags[shelf_id]]
+        await self.request("POST /reader/{reader_id}/reads", "POST", f"/reader/{shelf_id}/reads",
+                           json={"reads": reads})
+
+    async def checkout(self, state: Dict[str, Any], rng: random.Random) -> None:
+        basket = [self.fixture.sellable.pop() for _ in range(min(self.basket_size, len(self.fixture.sellable)))]
+        if not basket:
+            self.checkouts_skipped += 1
+            await self.dashboard(state, rng)
+            return
+        await self.request("POST /inventory/{inventory_id}/checkout", "POST",
+                           f"/inventory/{self.fixture.inventory_id}/checkout", json={"product_ids": basket})
+
+    async def _user(self, number: int) -> None:
+        rng = random.Random(self.seed * 1_000 + number)
+        actions, weights = zip(*SCENARIOS[self.scenario].items())
+        state: Dict[str, Any] = {}
+        while time.perf_counter() < self._deadline:
+            action = rng.choices(actions, weights)[0]
+            await getattr(self, action)(state, rng)
+
+    async def run(self) -> Dict[str, Any]:
+        start = time.perf_counter()
+        self._record_from = start + self.warmup
+        self._deadline = self._record_from + self.duration
+        await asyncio.gather(*(self._user(number) for number in range(self.concurrency)))
+        # Requests in flight at the deadline finish after it and are counted
+        measured = max(time.perf_counter() - self._record_from, 1e-9)
+
+        endpoints = {}
+        for endpoint in sorted(self.latencies):
+            latencies = self.latencies[endpoint]
+            statuses = self.statuses[endpoint]
+            errors = sum(count for status, count in statuses.items() if not status.isdigit() or int(status) >= 500)
+            endpoints[endpoint] = {
+                "requests": len(latencies),
+                "rps": round(len(latencies) / measured, 2),
+                "error_rate": round(errors / len(latencies), 4),
+                "status": statuses,
+                **{key: value for key, value in latency_summary(latencies).items() if key != "count"}
+            }
+        every_latency = [latency for latencies in self.latencies.values() for latency in latencies]
+        requests = len(every_latency)
+        return {
+            "scenario": self.scenario,
+            "concurrency": self.concurrency,
+            "duration_seconds": round(measured, 3),
+            "seed": self.seed,
+            "inventory_id": self.fixture.inventory_id,
+            "checkouts_skipped": self.checkouts_skipped,
+            "total": {
+                "requests": requests,
+                "rps": round(requests / measured, 2),
+                "error_rate": round(sum(endpoint["error_rate"] * endpoint["requests"]
+                                        for endpoint in endpoints.values()) / requests, 4) if requests else 0.0,
+                **{key: value for key, value in latency_summary(every_latency).items() if key != "count"}
+            },
+            "endpoints": endpoints
+        }
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.25,
+                    min_requests: int = 20, min_delta_ms: float = 1.0) -> List[str]:
+    """
+    Regressions of current against baseline per endpoint. Endpoints with fewer than min_requests requests in
+    either run are skipped, and latency changes under min_delta_ms never count.
+    """
+    regressions = []
+    for endpoint, before in baseline["endpoints"].items():
+        after = current["endpoints"].get(endpoint)
+        if after is None:
+            if before["requests"] >= min_requests:
+                regressions.append(f"{endpoint}: not requested in this run")
+            continue
+        if before["requests"] < min_requests or after["requests"] < min_requests:
+            continue
+        for key, allowed in (("p50_ms", tolerance), ("p95_ms", tolerance), ("p99_ms", 2 * tolerance)):
+            if after[key] > before[key] * (1 + allowed) and after[key] - before[key] >= min_delta_ms:
+                regressions.append(f"{endpoint}: {key} {before[key]:.2f} -> {after[key]:.2f} "
+                                   f"({after[key] / max(before[key], 1e-9) - 1:+.0%})")
+        if after["rps"] < before["rps"] * (1 - tolerance):
+            regressions.append(f"{endpoint}: rps {before['rps']:.1f} -> {after['rps']:.1f} "
+                               f"({after['rps'] / max(before['rps'], 1e-9) - 1:+.0%})")
+        if after["error_rate"] > before["error_rate"] + 0.01:
+            regressions.append(f"{endpoint}: error rate {before['error_rate']:.2%} -> {after['error_rate']:.2%}")
+    return regressions
+
+
+def format_results(results: Dict[str, Any], baseline: Optional[Dict[str, Any]] = None) -> str:
+    lines = [f"{results['scenario']} x{results['concurrency']} for {results['duration_seconds']:.1f}s: "
+             f"{results['total']['requests']:,} requests, {results['total']['rps']:,.1f} req/s, "
+             f"errors {results['total']['error_rate']:.2%}",
+             f"{'endpoint':<46}{'requests':>9}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}{'errors':>8}"]
+    for endpoint, stats in results["endpoints"].items():
+        line = (f"{endpoint:<46}{stats['requests']:>9,}{stats['rps']:>9.1f}{stats['p50_ms']:>9.2f}"
+                f"{stats['p95_ms']:>9.2f}{stats['p99_ms']:>9.2f}{stats['error_rate']:>8.1%}")
+        before = baseline["endpoints"].get(endpoint) if baseline else None
+        if before:
+            line += (f"  baseline p95 {before['p95_ms']:.2f} ({stats['p95_ms'] / max(before['p95_ms'], 1e-9) - 1:+.0%})"
+                     f", req/s {stats['rps'] / max(before['rps'], 1e-9) - 1:+.0%}")
+        lines.append(line)
+    return "\n".join(lines)
+
+
+async def seed_inventory(session_factory, products: int, racks: int, shelves_per_rack: int) -> str:
+    """New inventory with its layout and products received and placed on the shelves"""
+    from src.manager.supplier_manager import SupplierManager
+    from src.manager.warehouse_manager import WarehouseManager
+    from src.utils.id_generator import new_id
+    inventory_id = new_id("INV")
+    async with session_factory() as session:
+        warehouse_manager = WarehouseManager(session)
+        await warehouse_manager.setup_inventory(inventory_id, "LOADTEST_OWNER", "Load test warehouse")
+        await warehouse_manager.provision_layout(inventory_id, rack_count=racks, shelves_per_rack=shelves_per_rack)
+        created, receipt_id = await SupplierManager(session).create_random_products(
+            SUPPLIER_ID, SUPPLIER_NAME, products, inventory_id=inventory_id)
+        await warehouse_manager.receive_products(receipt_id, inventory_id)
+        await warehouse_manager.place_products_on_shelves(inventory_id, [product.product_id for product in created])
+    return inventory_id
+
+
+async def _run(args, client: httpx.AsyncClient, inventory_id: str) -> Dict[str, Any]:
+    fixture = await Fixture.load(client, inventory_id, args.seed)
+    load_test = LoadTest(client, fixture, scenario=args.scenario, concurrency=args.concurrency,
+                         duration=args.duration, warmup=args.warmup, seed=args.seed,
+                         receipt_size=args.receipt_size, basket_size=args.basket_size)
+    results = await load_test.run()
+    results["target"] = args.url or "asgi"
+    return results
+
+
+async def _main(args) -> Dict[str, Any]:
+    if args.url:
+        if not args.inventory:
+            raise ValueError("--inventory is required with --url")
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=args.url, timeout=30.0, limits=limits) as client:
+            return await _run(args, client, args.inventory)
+
+    # Read when the settings are first imported, below. No scenario uses the LLRP listener, and its port
+    # may be taken by a server running alongside
+    if args.database:
+        os.environ["DATABASE_URL"] = args.database
+    os.environ.setdefault("LLRP_ENABLED", "false")
+    from server import app
+    from src.Db.db import async_session
+    async with app.router.lifespan_context(app):
+        inventory_id = args.inventory or await seed_inventory(async_session, args.products, args.racks,
+                                                              args.shelves_per_rack)
+        async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://loadtest",
+                                     timeout=30.0) as client:
+            return await _run(args, client, inventory_id)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test of the API with scripted scenarios")
+    parser.add_argument("--url", help="Base URL of a running server, default drives server.app in-process")
+    parser.add_argument("--database", help="In-process only: SQLAlchemy URL to run the app against")
+    parser.add_argument("--inventory", help="Inventory to test against, required with --url")
+    parser.add_argument("--products", type=int, default=500, help="Products of the seeded inventory")
+    parser.add_argument("--racks", type=int, default=5)
+    parser.add_argument("--shelves-per-rack", type=int, default=10)
+    parser.add_argument("--scenario", choices=list(SCENARIOS), default="mix")
+    parser.add_argument("--concurrency", type=int, default=10, help="Virtual users")
+    parser.add_argument("--duration", type=float, default=30.0, help="Measured seconds, after the warm-up")
+    parser.add_argument("--warmup", type=float, default=2.0, help="Seconds of load before measuring")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--receipt-size", type=int, default=20, help="Products per created receipt")
+    parser.add_argument("--basket-size", type=int, default=3, help="Products per checkout")
+    parser.add_argument("--out", help="Write the results JSON here")
+    parser.add_argument("--save-baseline", help="Write the results JSON here as the new baseline")
+    parser.add_argument("--baseline", help="Results JSON of an earlier run, exit 1 on a regression against it")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="Allowed relative slowdown")
+    args = parser.parse_args()
+
+    baseline = None
+    if args.baseline:
+        with open(args.baseline) as baseline_file:
+            baseline = json.load(baseline_file)
+    results = asyncio.run(_main(args))
+    for path in (args.out, args.save_baseline):
+        if path:
+            with open(path, "w") as out_file:
+                json.dump(results, out_file, indent=2)
+    print(format_results(results, baseline))
+
+    if baseline is not None:
+        if baseline.get("scenario") != results["scenario"] or baseline.get("target") != results["target"]:
+            print(f"Baseline ran {baseline.get('scenario')} against {baseline.get('target')}, "
+                  f"this run {results['scenario']} against {results['target']}", file=sys.stderr)
+        regressions = compare_results(baseline, results, args.tolerance)
+        if regressions:
+            print(f"\nREGRESSION: {len(regressions)} checks worse than {args.baseline} "
+                  f"(tolerance {args.tolerance:.0%})", file=sys.stderr)
+            for regression in regressions:
+                print(f"  {regression}", file=sys.stderr)
+            sys.exit(1)
+        print(f"\nNo regressions against {args.baseline}")
+
+
+if __name__ == "__main__":
+    main()
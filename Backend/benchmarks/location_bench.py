@@ -0,0 +1,160 @@
+"""
+Cross-shelf read resolution on a warehouse of shelf readers that also hear their neighbours' tags.
+Every tag is read several times by the reader of the shelf it is on and, more weakly and less often, by
+the readers of the adjacent shelves; a share of the tags sits on a shelf other than the one the database
+has. Times LocationResolver over one window of reads for both strategies, scores the moves it plans
+against the true misplacements and applies them with WarehouseManager.move_products on a SQLite file.
+Run from the Backend directory: python -m benchmarks.location_bench [--tags 100000 --readers 500]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache.tag_index import tag_index, TagInfo
+from src.Db.database_management import DatabaseManagement
+from src.Db.models import (Product, ProductStatus, Shelf, StorageRack, Inventory, InventoryOwner, Supplier,
+                           ShelfInventory, SupplierReceipt)
+from src.ingest.pipeline import TagRead
+from src.ingest.resolver import LocationResolver
+from src.manager.warehouse_manager import WarehouseManager
+
+INVENTORY_ID = "BENCH_INV"
+
+
+def shelf_name(number: int) -> str:
+    return f"BENCH_SHELF_{number:04d}"
+
+
+def simulate(tags: int, readers: int, misplaced: float, reads_per_tag: int, neighbour_rate: float, seed: int):
+    """Home shelf of each tag, where it really is, and one window of reads"""
+    rng = random.Random(seed)
+    home = {}
+    actual = {}
+    for number in range(tags):
+        tag = f"RFID_{rng.getrandbits(128):032x}"
+        home[tag] = number % readers
+        actual[tag] = home[tag]
+        if rng.random() < misplaced:
+            actual[tag] = (home[tag] + rng.randint(1, readers - 1)) % readers
+
+    reads = []
+    start = 1_700_000_000.0
+    for tag, shelf in actual.items():
+        for _ in range(reads_per_tag):
+            reads.append(TagRead(shelf_name(shelf), tag, start + rng.random() * 30, rng.gauss(-52, 4)))
+        for neighbour in (shelf - 1, shelf + 1):
+            if 0 <= neighbour < readers:
+                for _ in range(reads_per_tag):
+                    if rng.random() < neighbour_rate:
+                        reads.append(TagRead(shelf_name(neighbour), tag, start + rng.random() * 30, rng.gauss(-64, 4)))
+    rng.shuffle(reads)
+    return home, actual, reads
+
+
+async def apply_moves(home, moves, readers: int):
+    """Load the warehouse into a scratch SQLite file and time move_products on the planned moves"""
+    path = os.path.join(tempfile.mkdtemp(), "location_bench.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    now = datetime.datetime.now()
+    async with maker() as session:
+        db = DatabaseManagement(session)
+        await db.bulk_insert(InventoryOwner, [{"owner_id": "BENCH_OWNER", "owner_name": "bench"}], auto_commit=False)
+        await db.bulk_insert(Inventory, [{"inventory_id": INVENTORY_ID, "owner_id": "BENCH_OWNER",
+                                          "location": "bench", "previous_theft_count": 0}], auto_commit=False)
+        await db.bulk_insert(Supplier, [{"supplier_id": "BENCH_SUPPLIER", "supplier_name": "bench"}],
+                             auto_commit=False)
+        await db.bulk_insert(StorageRack, [{"rack_id": "BENCH_RACK", "inventory_id": INVENTORY_ID,
+                                            "rack_location": "bench"}], auto_commit=False)
+        await db.bulk_insert(Shelf, [{"shelf_id": shelf_name(number), "rack_id": "BENCH_RACK",
+                                      "shelf_location": f"Level {number}"} for number in range(readers)],
+                             auto_commit=False)
+        # Products can only move within the inventory they were received into
+        await db.bulk_insert(SupplierReceipt, [{"receipt_id": "BENCH_RECEIPT", "supplier_id": "BENCH_SUPPLIER",
+                                                "inventory_id": INVENTORY_ID, "date_sent": now,
+                                                "total_products_sent": len(home)}], auto_commit=False)
+        products = [{"product_id": f"PRODUCT_{tag[5:]}", "rfid_tag": tag, "product_name": "bench",
+                     "status": ProductStatus.ON_SHELF, "supplier_id": "BENCH_SUPPLIER",
+                     "shelf_id": shelf_name(shelf), "price": 1.0, "receipt_id": "BENCH_RECEIPT"}
+                    for tag, shelf in home.items()]
+        for offset in range(0, len(products), 20_000):
+            await db.bulk_insert(Product, products[offset:offset + 20_000], auto_commit=False)
+            await db.bulk_insert(ShelfInventory, [
+                {"shelf_inventory_id": f"SI_{product['product_id']}", "shelf_id": product["shelf_id"],
+                 "product_id": product["product_id"], "added_timestamp": now}
+                for product in products[offset:offset + 20_000]
+            ], auto_commit=False)
+        await session.commit()
+
+    async with maker() as session:
+        start = time.perf_counter()
+        result = await WarehouseManager(session).move_products(moves)
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    os.remove(path)
+    return len(result["moved"]), elapsed
+
+
+async def run(args):
+    home, actual, reads = simulate(args.tags, args.readers, args.misplaced, args.reads_per_tag,
+                                   args.neighbour_rate, args.seed)
+    truth = {tag for tag in home if home[tag] != actual[tag]}
+    tag_index.max_size = max(tag_index.max_size, len(home))
+    for tag, shelf in home.items():
+        tag_index.put(tag, TagInfo(f"PRODUCT_{tag[5:]}", ProductStatus.ON_SHELF, shelf_name(shelf), INVENTORY_ID))
+    resolved = {tag: tag_index.get(tag) for tag in home}
+
+    print(f"{len(home):,} tags on {args.readers} shelf readers, {len(reads):,} reads in one window, "
+          f"{len(truth):,} tags misplaced")
+    print(f"{'strategy':<10}{'add':>10}{'locate':>10}{'plan':>10}{'reads/s':>14}"
+          f"{'moves':>8}{'correct':>9}{'wrong':>7}{'missed':>8}")
+    planned = {}
+    for strategy in ("rssi", "reads"):
+        resolver = LocationResolver(strategy=strategy, min_reads=args.min_reads)
+        start = time.perf_counter()
+        for offset in range(0, len(reads), 2_000):
+            resolver.add(reads[offset:offset + 2_000])
+        added = time.perf_counter()
+        locations = resolver.locate()
+        located = time.perf_counter()
+        moves = LocationResolver.plan_moves(locations, resolved)
+        planned_at = time.perf_counter()
+        correct = sum(1 for move in moves
+                      if move.rfid_tag in truth and move.to_shelf == shelf_name(actual[move.rfid_tag]))
+        print(f"{strategy:<10}{(added - start) * 1000:>8.0f}ms{(located - added) * 1000:>8.0f}ms"
+              f"{(planned_at - located) * 1000:>8.0f}ms{len(reads) / (planned_at - start):>14,.0f}"
+              f"{len(moves):>8,}{correct:>9,}{len(moves) - correct:>7,}{len(truth) - correct:>8,}")
+        planned[strategy] = moves
+
+    if not args.skip_apply:
+        moved, elapsed = await apply_moves(home, planned["reads"], args.readers)
+        print(f"move_products applied {moved:,} reads moves in {elapsed * 1000:.0f} ms on SQLite")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--tags", type=int, default=100_000)
+    parser.add_argument("--readers", type=int, default=500)
+    parser.add_argument("--misplaced", type=float, default=0.02, help="Share of tags on the wrong shelf")
+    parser.add_argument("--reads-per-tag", type=int, default=4, help="Reads of a tag by its own shelf's reader")
+    parser.add_argument("--neighbour-rate", type=float, default=0.5,
+                        help="Chance each of those reads is also heard by an adjacent shelf's reader")
+    parser.add_argument("--min-reads", type=int, default=2)
+    parser.add_argument("--skip-apply", action="store_true", help="Only time the in-memory resolution")
+    parser.add_argument("--seed", type=int, default=13)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+"""
+Cost of logging on the receive path: a supplier receipt of --products products received into an inventory.
+Three setups write to a log file:
+- "sync": every per-product event is written on the event loop, as the print() calls did.
+- "queued": every per-product event goes to the writer thread.
+- "summary": the default, one summary event per operation.
+Times the logging calls alone and the full receive path on a SQLite file.
+Run from the Backend directory: python -m benchmarks.logging_bench [--products 2000 --events 100000]
+"""
+import argparse
+import asyncio
+import logging
+import os
+import tempfile
+import time
+
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.manager.supplier_manager import SupplierManager
+from src.manager.warehouse_manager import WarehouseManager
+from src.utils import log
+from src.utils.log import setup_logging, shutdown_logging, get_logger, JsonFormatter, ROOT_LOGGER, logging_stats
+
+INVENTORY_ID = "BENCH_INV"
+MODES = ("sync", "queued", "summary")
+
+
+def configure(mode: str, path: str) -> None:
+    # Only the file is written, a terminal would dominate the measurement
+    if mode == "sync":
+        shutdown_logging()
+        handler = logging.FileHandler(path)
+        handler.setFormatter(JsonFormatter())
+        root = logging.getLogger(ROOT_LOGGER)
+        root.handlers = [handler]
+        root.setLevel(logging.INFO)
+        root.propagate = False
+        # Every per-product event, formatted and written by the caller like the print() calls
+        log._config.item_limiter = log._ItemLimiter(1.0, 0)
+    else:
+        setup_logging(path=path, item_events=mode == "queued", item_rate_limit=0, queue_size=1_000_000,
+                      stdout=False)
+
+
+def finish(mode: str) -> None:
+    if mode == "sync":
+        root = logging.getLogger(ROOT_LOGGER)
+        for handler in root.handlers:
+            handler.close()
+        root.handlers = []
+        log._config.item_limiter = None
+    else:
+        shutdown_logging()
+
+
+def time_events(count: int) -> float:
+    logger = get_logger("bench")
+    start = time.perf_counter()
+    for number in range(count):
+        logger.item("product_received", product_id=f"PRODUCT_{number}", rfid_tag="E280689400004001")
+    return time.perf_counter() - start
+
+
+async def receive(products: int, path: str) -> float:
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as session:
+        await WarehouseManager(session).setup_inventory(INVENTORY_ID, "BENCH_OWNER", "bench")
+        _, receipt_id = await SupplierManager(session).create_random_products(
+            "BENCH_SUPPLIER", "bench", products, inventory_id=INVENTORY_ID)
+        start = time.perf_counter()
+        await WarehouseManager(session).receive_products(receipt_id, INVENTORY_ID)
+        elapsed = time.perf_counter() - start
+    await engine.dispose()
+    os.remove(path)
+    return elapsed
+
+
+async def run(args):
+    directory = tempfile.mkdtemp()
+    print(f"{'mode':<10}{'events/s':>14}{'per event':>12}{'lines':>10}"
+          f"{f'receive {args.products:,}':>18}{'lines':>8}{'dropped':>9}")
+    for mode in args.modes:
+        log_path = os.path.join(directory, f"{mode}.log")
+        configure(mode, log_path)
+        elapsed = time_events(args.events)
+        finish(mode)
+        with open(log_path) as file:
+            event_lines = sum(1 for _ in file)
+        os.remove(log_path)
+
+        configure(mode, log_path)
+        received = await receive(args.products, os.path.join(directory, "bench.db"))
+        dropped = logging_stats()["dropped"]
+        finish(mode)
+        with open(log_path) as file:
+            receive_lines = sum(1 for _ in file)
+        os.remove(log_path)
+        print(f"{mode:<10}{args.events / elapsed:>14,.0f}{elapsed / args.events * 1e6:>10.2f}us{event_lines:>10,}"
+              f"{received:>16.2f}s{receive_lines:>8,}{dropped:>9,}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--products", type=int, default=2_000)
+    parser.add_argument("--events", type=int, default=100_000, help="Per-product events timed on their own")
+    parser.add_argument("--modes", nargs="+", choices=MODES, default=list(MODES))
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
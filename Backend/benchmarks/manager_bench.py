@@ -0,0 +1,389 @@
+"""
+Benchmark of every public method of WarehouseManager, TheftDetectionManager and SupplierManager against
+synthetic warehouses of growing size.
+
+    python -m benchmarks.manager_bench --scales small medium --out managers.json --history managers.jsonl
+
+For each scale a fresh SQLite database is filled by src.dummy.warehouse_generator from --seed, then each case
+calls its method --repeat times, every call in a new session like a request. Arguments are picked untimed
+before the call (a product still on a shelf, a pending receipt, ...); only the call itself is timed and its
+queries counted through the query profiler. Public coroutines without a case are listed as not benchmarked.
+
+The report has the spec, generation time and row counts of each scale and per method the calls, median/min/max
+latency and the median queries and database time per call. --out writes it as JSON, --history appends it as
+one line to a JSONL file to follow the numbers over commits.
+"""
+import argparse
+import asyncio
+import datetime
+import inspect
+import json
+import os
+import platform
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+from typing import Optional, Dict, List, Any, Callable, Awaitable
+
+import sqlalchemy
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.Db.models import ProductStatus, SupplierReceipt, InventoryReceipt
+from src.Db.profiler import QueryProfile, current_profile, install_query_profiler
+from src.cache.change_log import change_log
+from src.cache.missing_buffer import missing_buffer
+from src.cache.response_cache import response_cache
+from src.cache.shelf_state import shelf_state
+from src.cache.tag_index import tag_index
+from src.dummy.warehouse_generator import WarehouseGenerator, GeneratedInventory, SCALES, count_rows
+from src.manager.supplier_manager import SupplierManager
+from src.manager.theft_detection_manager import TheftDetectionManager
+from src.manager.warehouse_manager import WarehouseManager, ProductMove
+from src.utils.id_generator import new_id
+
+MANAGERS = [WarehouseManager, TheftDetectionManager, SupplierManager]
+
+# A case gets a fresh session and the inventory under test and returns the call to time, not awaited yet,
+# or None when the warehouse has nothing left to call it with
+Case = Callable[[AsyncSession, GeneratedInventory], Awaitable[Optional[Awaitable]]]
+CASES: Dict[str, Case] = {}
+
+
+def case(name: str):
+    def register(function: Case) -> Case:
+        CASES[name] = function
+        return function
+    return register
+
+
+def _take(product_ids: List[str]) -> Optional[str]:
+    return product_ids.pop() if product_ids else None
+
+
+def _remove_from_shelf(inventory: GeneratedInventory, product_id: str) -> None:
+    inventory.shelf_of.pop(product_id, None)
+
+
+def _shelf_tags(inventory: GeneratedInventory, shelf_id: str) -> List[str]:
+    return [inventory.tags[product_id] for product_id, on in inventory.shelf_of.items() if on == shelf_id]
+
+
+def _next_shelf(inventory: GeneratedInventory) -> str:
+    """Shelves in turn, so repeated calls do not all hit one warm shelf"""
+    inventory.shelf_ids.append(inventory.shelf_ids.pop(0))
+    return inventory.shelf_ids[-1]
+
+
+# WarehouseManager
+
+@case("WarehouseManager.setup_inventory")
+async def setup_inventory(session, inventory):
+    return WarehouseManager(session).setup_inventory(new_id("INV"), new_id("OWNER"), "Benchmark warehouse")
+
+
+@case("WarehouseManager.setup_racks_and_shelves")
+async def setup_racks_and_shelves(session, inventory):
+    inventory_id = new_id("INV")
+    await WarehouseManager(session).setup_inventory(inventory_id, new_id("OWNER"), "Benchmark warehouse")
+    return WarehouseManager(session).setup_racks_and_shelves(inventory_id, inventory.spec.racks,
+                                                             inventory.spec.shelves_per_rack)
+
+
+@case("WarehouseManager.provision_layout")
+async def provision_layout(session, inventory):
+    inventory_id = new_id("INV")
+    await WarehouseManager(session).setup_inventory(inventory_id, new_id("OWNER"), "Benchmark warehouse")
+    return WarehouseManager(session).provision_layout(inventory_id, rack_count=inventory.spec.racks,
+                                                      shelves_per_rack=inventory.spec.shelves_per_rack)
+
+
+@case("WarehouseManager.receive_products")
+async def receive_products(session, inventory):
+    receipt_id = _take(inventory.pending_receipts)
+    return receipt_id and WarehouseManager(session).receive_products(receipt_id, inventory.inventory_id)
+
+
+@case("WarehouseManager.place_products_on_shelves")
+async def place_products_on_shelves(session, inventory):
+    product_ids = [inventory.backlog.pop() for _ in range(min(10, len(inventory.backlog)))]
+    return product_ids and WarehouseManager(session).place_products_on_shelves(inventory.inventory_id, product_ids)
+
+
+@case("WarehouseManager.move_products")
+async def move_products(session, inventory):
+    moves = []
+    for product_id in list(inventory.shelf_of)[-5:]:
+        from_shelf = inventory.shelf_of[product_id]
+        to_shelf = _next_shelf(inventory)
+        moves.append(ProductMove(inventory.tags[product_id], product_id, from_shelf, to_shelf,
+                                 ProductStatus.ON_SHELF))
+        inventory.shelf_of[product_id] = to_shelf
+    return moves and WarehouseManager(session).move_products(moves)
+
+
+@case("WarehouseManager.scan_shelf")
+async def scan_shelf(session, inventory):
+    shelf_id = _next_shelf(inventory)
+    return WarehouseManager(session).scan_shelf(shelf_id, detected_tags=_shelf_tags(inventory, shelf_id))
+
+
+@case("WarehouseManager.report_missing_product")
+async def report_missing_product(session, inventory):
+    product_id = _take(inventory.on_shelf)
+    if product_id:
+        _remove_from_shelf(inventory, product_id)
+        return WarehouseManager(session).report_missing_product(product_id)
+
+
+@case("WarehouseManager.record_product_sale")
+async def record_product_sale(session, inventory):
+    product_id = _take(inventory.on_shelf)
+    if product_id:
+        _remove_from_shelf(inventory, product_id)
+        return WarehouseManager(session).record_product_sale(product_id, inventory.inventory_id)
+
+
+@case("WarehouseManager.checkout_products")
+async def checkout_products(session, inventory):
+    product_ids = [inventory.on_shelf.pop() for _ in range(min(5, len(inventory.on_shelf)))]
+    for product_id in product_ids:
+        _remove_from_shelf(inventory, product_id)
+    tags = [inventory.tags[product_id] for product_id in product_ids]
+    return tags and WarehouseManager(session).checkout_products(rfid_tags=tags, inventory_id=inventory.inventory_id)
+
+
+@case("WarehouseManager.get_inventory_statistics")
+async def get_inventory_statistics(session, inventory):
+    return WarehouseManager(session).get_inventory_statistics(inventory.inventory_id)
+
+
+@case("WarehouseManager.restock_inventory")
+async def restock_inventory(session, inventory):
+    # Inventories waiting for a receipt are not reordered: receive those first, and with a threshold above
+    # any stock level every call places an order
+    query = (
+        select(SupplierReceipt.receipt_id)
+        .outerjoin(InventoryReceipt, InventoryReceipt.supplier_receipt_id == SupplierReceipt.receipt_id)
+        .where(SupplierReceipt.inventory_id == inventory.inventory_id, InventoryReceipt.receipt_id.is_(None))
+    )
+    for receipt_id in (await session.exec(query)).all():
+        await WarehouseManager(session).receive_products(receipt_id, inventory.inventory_id)
+    inventory.pending_receipts.clear()
+    return WarehouseManager(session).restock_inventory(inventory.inventory_id, inventory.supplier_ids[0],
+                                                       min_threshold=len(inventory.tags) + 1)
+
+
+# TheftDetectionManager
+
+@case("TheftDetectionManager.detect_missing_products")
+async def detect_missing_products(session, inventory):
+    scan_id = inventory.latest_scans.get(_next_shelf(inventory))
+    return scan_id and TheftDetectionManager(session).detect_missing_products(scan_id)
+
+
+@case("TheftDetectionManager.report_theft")
+async def report_theft(session, inventory):
+    product_id = _take(inventory.on_shelf)
+    if product_id:
+        _remove_from_shelf(inventory, product_id)
+        return TheftDetectionManager(session).report_theft(product_id)
+
+
+@case("TheftDetectionManager.get_theft_statistics")
+async def get_theft_statistics(session, inventory):
+    return TheftDetectionManager(session).get_theft_statistics(inventory.inventory_id)
+
+
+@case("TheftDetectionManager.analyze_theft_patterns")
+async def analyze_theft_patterns(session, inventory):
+    return TheftDetectionManager(session).analyze_theft_patterns(inventory.inventory_id)
+
+
+@case("TheftDetectionManager.investigate_shelf")
+async def investigate_shelf(session, inventory):
+    return TheftDetectionManager(session).investigate_shelf(_next_shelf(inventory))
+
+
+@case("TheftDetectionManager.predict_theft_risk")
+async def predict_theft_risk(session, inventory):
+    product_id = inventory.on_shelf[len(inventory.on_shelf) // 2] if inventory.on_shelf else None
+    return product_id and TheftDetectionManager(session).predict_theft_risk(product_id)
+
+
+@case("TheftDetectionManager.generate_theft_prevention_plan")
+async def generate_theft_prevention_plan(session, inventory):
+    return TheftDetectionManager(session).generate_theft_prevention_plan(inventory.inventory_id)
+
+
+# SupplierManager
+
+@case("SupplierManager.create_supplier")
+async def create_supplier(session, inventory):
+    return SupplierManager(session).create_supplier(new_id("SUP"), "Benchmark Supplier")
+
+
+@case("SupplierManager.link_supplier_to_inventory")
+async def link_supplier_to_inventory(session, inventory):
+    supplier = await SupplierManager(session).create_supplier(new_id("SUP"), "Benchmark Supplier")
+    return SupplierManager(session).link_supplier_to_inventory(supplier["supplier_id"], inventory.inventory_id)
+
+
+@case("SupplierManager.create_supplier_receipt")
+async def create_supplier_receipt(session, inventory):
+    supplier_id = inventory.supplier_ids[0]
+    products, _ = await SupplierManager(session).create_random_products(supplier_id, "Benchmark Supplier",
+                                                                        inventory.spec.receipt_size)
+    return SupplierManager(session).create_supplier_receipt(supplier_id, inventory.inventory_id, products)
+
+
+@case("SupplierManager.create_random_products")
+async def create_random_products(session, inventory):
+    return SupplierManager(session).create_random_products(inventory.supplier_ids[0], "Benchmark Supplier",
+                                                           inventory.spec.receipt_size,
+                                                           inventory_id=inventory.inventory_id)
+
+
+def public_methods() -> List[str]:
+    return [f"{manager.__name__}.{name}" for manager in MANAGERS
+            for name, member in inspect.getmembers(manager, inspect.iscoroutinefunction)
+            if not name.startswith("_")]
+
+
+def clear_caches() -> None:
+    for cache in (tag_index, shelf_state, missing_buffer, change_log, response_cache):
+        cache.clear()
+
+
+async def time_case(maker, name: str, inventory: GeneratedInventory, repeat: int) -> Optional[Dict[str, Any]]:
+    seconds, queries, db_seconds = [], [], []
+    for _ in range(repeat):
+        async with maker() as session:
+            call = await CASES[name](session, inventory)
+            if not call:
+                break
+            profile = QueryProfile()
+            token = current_profile.set(profile)
+            try:
+                start = time.perf_counter()
+                await call
+                seconds.append(time.perf_counter() - start)
+            finally:
+                current_profile.reset(token)
+        queries.append(profile.count)
+        db_seconds.append(profile.seconds)
+    if not seconds:
+        return None
+    return {
+        "calls": len(seconds),
+        "median_ms": round(statistics.median(seconds) * 1000, 3),
+        "min_ms": round(min(seconds) * 1000, 3),
+        "max_ms": round(max(seconds) * 1000, 3),
+        "queries": statistics.median(queries),
+        "max_queries": max(queries),
+        "db_ms": round(statistics.median(db_seconds) * 1000, 3)
+    }
+
+
+async def run_scale(scale: str, directory: str, seed: int, repeat: int, only: Optional[List[str]]) -> Dict[str, Any]:
+    spec = SCALES[scale]
+    path = os.path.join(directory, f"manager_bench_{scale}.db")
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    try:
+        async with engine.begin() as conn:
+            await conn.run_sync(SQLModel.metadata.create_all)
+        install_query_profiler(engine.sync_engine)
+        maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+        clear_caches()
+
+        start = time.perf_counter()
+        async with maker() as session:
+            inventories = await WarehouseGenerator(session, spec, seed).generate()
+            rows = await count_rows(session)
+            await tag_index.warm(session)
+        generate_seconds = time.perf_counter() - start
+
+        inventory = inventories[0]
+        methods = {}
+        for name in CASES:
+            if only and not any(pattern in name for pattern in only):
+                continue
+            result = await time_case(maker, name, inventory, repeat)
+            if result is not None:
+                methods[name] = result
+        return {"spec": spec._asdict(), "generate_seconds": round(generate_seconds, 3), "rows": rows,
+                "methods": methods}
+    finally:
+        await engine.dispose()
+        os.remove(path)
+
+
+def git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def format_report(report: Dict[str, Any]) -> str:
+    lines = []
+    for scale, result in report["scales"].items():
+        rows = sum(result["rows"].values())
+        lines.append(f"\n{scale}: {rows:,} rows generated in {result['generate_seconds']:.2f} s")
+        lines.append(f"  {'method':52} {'calls':>5} {'median ms':>10} {'max ms':>10} {'queries':>8} {'db ms':>9}")
+        for name, stats in result["methods"].items():
+            lines.append(f"  {name:52} {stats['calls']:>5} {stats['median_ms']:>10.2f} {stats['max_ms']:>10.2f} "
+                         f"{stats['queries']:>8g} {stats['db_ms']:>9.2f}")
+    if report["not_benchmarked"]:
+        lines.append(f"\nNot benchmarked: {', '.join(report['not_benchmarked'])}")
+    return "\n".join(lines)
+
+
+async def run(args) -> Dict[str, Any]:
+    report = {
+        "created": datetime.datetime.now().isoformat(timespec="seconds"),
+        "commit": git_commit(),
+        "python": platform.python_version(),
+        "sqlalchemy": sqlalchemy.__version__,
+        "database": "sqlite",
+        "seed": args.seed,
+        "repeat": args.repeat,
+        "scales": {},
+        "not_benchmarked": [name for name in public_methods() if name not in CASES]
+    }
+    directory = tempfile.mkdtemp()
+    try:
+        for scale in args.scales:
+            report["scales"][scale] = await run_scale(scale, directory, args.seed, args.repeat, args.only)
+    finally:
+        shutil.rmtree(directory, ignore_errors=True)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--scales", nargs="+", choices=list(SCALES), default=["small", "medium"])
+    parser.add_argument("--repeat", type=int, default=5, help="Calls of each method per scale")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--only", nargs="+", help="Only methods whose name contains one of these")
+    parser.add_argument("--out", help="Write the report JSON here")
+    parser.add_argument("--history", help="Append the report as one line to this JSONL file")
+    args = parser.parse_args()
+
+    report = asyncio.run(run(args))
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(report, out_file, indent=2)
+    if args.history:
+        with open(args.history, "a") as history_file:
+            history_file.write(json.dumps(report) + "\n")
+    print(format_report(report))
+
+
+if __name__ == "__main__":
+    main()
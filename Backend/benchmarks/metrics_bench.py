@@ -0,0 +1,161 @@
+"""
+Cost of the metrics instrumentation on the request and manager hot paths.
+Times counter and histogram updates on their own, MetricsMiddleware around an ASGI app that does nothing,
+and an instrumented manager method against its undecorated original on a SQLite file, then relates the
+added time to the latency of a cached inventory request and of the manager call.
+Run from the Backend directory: python -m benchmarks.metrics_bench [--requests 5000 --calls 500]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.inventory_routes import inventory_router
+from app.metrics_routes import MetricsMiddleware
+from src.Db.db import get_session
+from src.manager.warehouse_manager import WarehouseManager
+from src.utils.metrics import MetricsRegistry, instrumented
+
+INVENTORY_ID = "BENCH_INV"
+
+
+def per_call(function, count: int) -> float:
+    start = time.perf_counter()
+    for _ in range(count):
+        function()
+    return (time.perf_counter() - start) / count
+
+
+async def middleware_cost(count: int) -> float:
+    """Seconds MetricsMiddleware adds to one request, measured around an app that does nothing"""
+    async def empty_app(scope, receive, send):
+        await send({"type": "http.response.start", "status": 200, "headers": []})
+        await send({"type": "http.response.body", "body": b""})
+
+    async def send(message):
+        pass
+
+    wrapped = MetricsMiddleware(empty_app)
+    scope = {"type": "http", "method": "GET", "path": "/"}
+    timings = {}
+    for name, app in (("bare", empty_app), ("wrapped", wrapped)):
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(count):
+                await app(scope, None, send)
+            samples.append((time.perf_counter() - start) / count)
+        timings[name] = min(samples)
+    return timings["wrapped"] - timings["bare"]
+
+
+async def wrapper_cost(count: int) -> float:
+    """Seconds the instrumented wrapper adds to one manager call, measured around a coroutine that does nothing"""
+    class Empty:
+        async def noop(self):
+            pass
+
+    original = Empty.noop
+    instrumented(Empty)
+    empty = Empty()
+    timings = {}
+    for name, method in (("original", original), ("instrumented", Empty.noop)):
+        samples = []
+        for _ in range(5):
+            start = time.perf_counter()
+            for _ in range(count):
+                await method(empty)
+            samples.append((time.perf_counter() - start) / count)
+        timings[name] = min(samples)
+    return timings["instrumented"] - timings["original"]
+
+
+async def setup(path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as session:
+        await WarehouseManager(session).setup_inventory(INVENTORY_ID, "BENCH_OWNER", "bench")
+    return engine, maker
+
+
+async def request_latency(maker, count: int) -> float:
+    """Median latency of a cached GET /inventory/{id}/statistics through the ASGI stack"""
+    app = FastAPI()
+    app.include_router(inventory_router)
+
+    async def session_override():
+        async with maker() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = session_override
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        await client.get(f"/inventory/{INVENTORY_ID}/statistics")
+        for _ in range(count):
+            start = time.perf_counter()
+            await client.get(f"/inventory/{INVENTORY_ID}/statistics")
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def manager_latency(maker, count: int):
+    """Median of get_inventory_statistics with and without the instrumented wrapper, interleaved"""
+    timed = WarehouseManager.get_inventory_statistics
+    original = timed.__wrapped__
+    timings = {"original": [], "instrumented": []}
+    async with maker() as session:
+        manager = WarehouseManager(session)
+        for _ in range(count):
+            for name, method in (("original", original), ("instrumented", timed)):
+                start = time.perf_counter()
+                await method(manager, INVENTORY_ID)
+                timings[name].append(time.perf_counter() - start)
+    return statistics.median(timings["original"]), statistics.median(timings["instrumented"])
+
+
+async def run(args):
+    registry = MetricsRegistry()
+    counter = registry.counter("bench_total", "bench")
+    histogram = registry.histogram("bench_seconds", "bench", labels=("route",))
+    inc = per_call(counter.inc, args.updates)
+    observe = per_call(lambda: histogram.observe(0.003, "/inventory/{inventory_id}"), args.updates)
+    print(f"counter.inc {inc * 1e9:,.0f} ns, histogram.observe {observe * 1e9:,.0f} ns")
+
+    added = await middleware_cost(args.requests)
+    wrapper = await wrapper_cost(args.updates // 10)
+    path = os.path.join(tempfile.mkdtemp(), "metrics_bench.db")
+    engine, maker = await setup(path)
+    try:
+        latency = await request_latency(maker, args.requests)
+        print(f"MetricsMiddleware adds {added * 1e6:.2f} us to a request, cached request median "
+              f"{latency * 1e6:.0f} us: {added / latency:.2%} overhead")
+        original, wrapped = await manager_latency(maker, args.calls)
+        print(f"instrumented wrapper adds {wrapper * 1e6:.2f} us to a manager call, get_inventory_statistics "
+              f"median {original * 1e6:.0f} us: {wrapper / original:.2%} overhead "
+              f"(side by side medians differ by {(wrapped - original) / original:+.2%})")
+    finally:
+        await engine.dispose()
+        os.remove(path)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--updates", type=int, default=1_000_000, help="Metric updates timed on their own")
+    parser.add_argument("--requests", type=int, default=5_000)
+    parser.add_argument("--calls", type=int, default=500, help="Manager calls of each variant")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,213 @@
+"""
+Storage and read latency of delta-encoded shelf scans against one full row per product per scan.
+Simulates a year of hourly scans of one shelf: every hour some products leave and new ones arrive, and a
+few reads are missed. Both layouts go through ScanStore (a checkpoint interval of 1 stores every scan in
+full) on separate SQLite files. The reader layout takes the path of fixed reader traffic instead: each hour's
+reads go through the ingestion pipeline in micro-batches, then the completed round is reconciled by
+ScanReconciler into WarehouseManager.scan_shelf, against real products on a real shelf.
+Run from the Backend directory: python -m benchmarks.scan_delta_bench [--items 2000]
+"""
+import argparse
+import asyncio
+import datetime
+import os
+import random
+import tempfile
+import time
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from src.cache.missing_buffer import missing_buffer
+from src.cache.shelf_state import shelf_state
+from src.cache.tag_index import tag_index
+from src.config.Settings import settings
+from src.Db.database_management import DatabaseManagement
+from src.Db.models import Product, ProductStatus
+from src.ingest.pipeline import ReadPipeline, TagRead, TagSightingSink
+from src.ingest.reconcile import ScanReconciler
+from src.manager.scan_store import ScanStore
+from src.manager.warehouse_manager import WarehouseManager, make_shelf_id
+from src.utils.stats import latency_summary
+
+INVENTORY_ID = "BENCH_INV"
+SHELF_ID = make_shelf_id(INVENTORY_ID, 1, 1)
+SCAN_TABLES = ("shelfscan", "shelfscanitem", "shelfscandelta", "shelfscanchange")
+
+
+def simulate(items: int, hours: int, churn: float, miss_rate: float, seed: int):
+    """What the reader found in each hourly scan"""
+    rng = random.Random(seed)
+    next_id = 0
+    on_shelf = []
+    for _ in range(items):
+        on_shelf.append(f"PRODUCT_{next_id:012d}")
+        next_id += 1
+    scans = []
+    for _ in range(hours):
+        for _ in range(int(items * churn) + (rng.random() < (items * churn) % 1)):
+            on_shelf[rng.randrange(len(on_shelf))] = f"PRODUCT_{next_id:012d}"
+            next_id += 1
+        scans.append([product_id for product_id in on_shelf if rng.random() >= miss_rate])
+    return scans
+
+
+def tag_of(product_id: str) -> str:
+    return f"RFID_{int(product_id.rsplit('_', 1)[1]):032x}"
+
+
+async def write_direct(maker, scans, checkpoint_interval: int, first: datetime.datetime):
+    scan_ids = []
+    async with maker() as session:
+        store = ScanStore(session, checkpoint_interval=checkpoint_interval)
+        for hour, found in enumerate(scans):
+            scan = await store.record_scan(SHELF_ID, found, first + datetime.timedelta(hours=hour))
+            scan_ids.append(scan.scan_id)
+    return scan_ids
+
+
+async def write_reader(maker, scans, checkpoint_interval: int, first: datetime.datetime, batches: int):
+    """
+    Every hour the products that arrived are placed on the shelf, the round's reads are fed to the pipeline
+    in batches spread over a minute and the round is then reconciled. Products that left are reported
+    missing by the scans once the missing buffer confirms them.
+    """
+    settings.SCAN_CHECKPOINT_INTERVAL = checkpoint_interval
+    for cache in (tag_index, shelf_state, missing_buffer):
+        cache.clear()
+    async with maker() as session:
+        manager = WarehouseManager(session)
+        await manager.setup_inventory(INVENTORY_ID, "BENCH_OWNER", "bench")
+        await manager.provision_layout(INVENTORY_ID, rack_count=1, shelves_per_rack=1)
+
+    pipeline = ReadPipeline(TagSightingSink(maker), flush_interval=0.0)
+    pipeline.start()
+    reconciler = ScanReconciler(maker)
+    reconciler.start()
+    placed = set()
+    for hour, found in enumerate(scans):
+        arrived = [product_id for product_id in found if product_id not in placed]
+        if arrived:
+            async with maker() as session:
+                await DatabaseManagement(session).bulk_insert(Product, [
+                    {"product_id": product_id, "rfid_tag": tag_of(product_id), "product_name": "Bench",
+                     "status": ProductStatus.ON_SHELF, "supplier_id": "BENCH_SUPPLIER", "shelf_id": SHELF_ID}
+                    for product_id in arrived
+                ])
+            for product_id in arrived:
+                tag_index.update(tag_of(product_id), product_id, ProductStatus.ON_SHELF, SHELF_ID, INVENTORY_ID)
+            placed.update(arrived)
+
+        started = (first + datetime.timedelta(hours=hour)).timestamp()
+        tags = [tag_of(product_id) for product_id in found]
+        size = -(-len(tags) // batches)
+        for batch in range(batches):
+            await pipeline.submit([TagRead(SHELF_ID, tag, started + batch * 60 / batches)
+                                   for tag in tags[batch * size:(batch + 1) * size]])
+        reconciler.submit(SHELF_ID, set(tags), started + 60)
+        while reconciler.reconciled + reconciler.errors <= hour:
+            await asyncio.sleep(0.001)
+    await pipeline.stop()
+    await reconciler.stop()
+    if reconciler.errors or pipeline.sink_errors:
+        raise Exception(f"Reader path failed: {reconciler.errors} rounds, {pipeline.sink_errors} batches")
+
+    async with maker() as session:
+        recent = await ScanStore(session).recent_scans(SHELF_ID)
+    return [scan.scan_id for scan in reversed(recent)]
+
+
+async def run_layout(path: str, scans, checkpoint_interval: int, reads: int, seed: int, reader_batches: int = 0):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+
+    start = time.perf_counter()
+    first = datetime.datetime(2024, 1, 1)
+    if reader_batches:
+        scan_ids = await write_reader(maker, scans, checkpoint_interval, first, reader_batches)
+    else:
+        scan_ids = await write_direct(maker, scans, checkpoint_interval, first)
+    write_seconds = time.perf_counter() - start
+    if len(scan_ids) != len(scans):
+        raise Exception(f"{len(scans)} scans written, {len(scan_ids)} stored")
+
+    rng = random.Random(seed)
+    latencies = []
+    history = []
+    async with maker() as session:
+        store = ScanStore(session, checkpoint_interval=checkpoint_interval)
+        for _ in range(reads):
+            index = rng.randrange(len(scan_ids))
+            start = time.perf_counter()
+            contents = await store.get_scan_contents(scan_ids[index])
+            latencies.append(time.perf_counter() - start)
+            assert contents == set(scans[index])
+        for _ in range(max(1, reads // 10)):
+            start = time.perf_counter()
+            recent = await store.recent_scans(SHELF_ID, limit=10)
+            await store.get_contents(scan.scan_id for scan in recent)
+            history.append(time.perf_counter() - start)
+
+    async with engine.connect() as conn:
+        rows = 0
+        for table in SCAN_TABLES:
+            rows += (await conn.execute(text(f"SELECT COUNT(*) FROM {table}"))).scalar()
+        # Only the scan tables count towards the size, the reader layout also has products and a shelf
+        for table in SQLModel.metadata.tables:
+            if table not in SCAN_TABLES:
+                await conn.execute(text(f"DROP TABLE {table}"))
+        await conn.execute(text("VACUUM"))
+        pages = (await conn.execute(text("PRAGMA page_count"))).scalar()
+        page_size = (await conn.execute(text("PRAGMA page_size"))).scalar()
+    await engine.dispose()
+    return {"rows": rows, "bytes": pages * page_size, "write_seconds": write_seconds,
+            "read": latency_summary(latencies), "history": latency_summary(history)}
+
+
+async def run(args):
+    scans = simulate(args.items, args.days * 24, args.churn, args.miss_rate, args.seed)
+    directory = tempfile.mkdtemp()
+    results = {}
+    layouts = [("full", 1, 0), ("delta", args.checkpoint_interval, 0)]
+    if args.reader_batches:
+        layouts.append(("reader", args.checkpoint_interval, args.reader_batches))
+    for label, interval, reader_batches in layouts:
+        path = os.path.join(directory, f"{label}.db")
+        results[label] = await run_layout(path, scans, interval, args.reads, args.seed, reader_batches)
+        os.remove(path)
+
+    print(f"{len(scans):,} hourly scans of {args.items:,} products, {args.churn:.1%} churn per hour, "
+          f"{args.miss_rate:.1%} missed reads, checkpoint every {args.checkpoint_interval} scans")
+    print(f"{'layout':<8}{'rows':>14}{'size':>12}{'write':>10}{'scan p50':>12}{'scan p95':>12}{'last 10 p50':>14}")
+    for label, result in results.items():
+        print(f"{label:<8}{result['rows']:>14,}{result['bytes'] / 1024 / 1024:>9.1f} MB{result['write_seconds']:>9.1f}s"
+              f"{result['read']['p50_ms']:>9.2f} ms{result['read']['p95_ms']:>9.2f} ms"
+              f"{result['history']['p50_ms']:>11.2f} ms")
+    full = results["full"]
+    for label in results:
+        if label != "full":
+            print(f"{label} layout uses {results[label]['rows'] / full['rows']:.1%} of the rows and "
+                  f"{results[label]['bytes'] / full['bytes']:.1%} of the bytes")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--items", type=int, default=500, help="Products on the shelf")
+    parser.add_argument("--days", type=int, default=365)
+    parser.add_argument("--churn", type=float, default=0.005, help="Share of products replaced every hour")
+    parser.add_argument("--miss-rate", type=float, default=0.001, help="Chance a product is not read in a scan")
+    parser.add_argument("--checkpoint-interval", type=int, default=24)
+    parser.add_argument("--reads", type=int, default=500, help="Random scans to rebuild")
+    parser.add_argument("--reader-batches", type=int, default=4,
+                        help="Pipeline batches per reader round, 0 skips the reader layout")
+    parser.add_argument("--seed", type=int, default=5)
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Cost of tracing on the manager and request paths.
+Times the traced wrapper around a coroutine that does nothing with tracing off, unsampled and sampled, then
+GET /inventory/{id}/statistics through TracingMiddleware at sample rates 0 and 1 on a SQLite file, exporting to
+a scratch JSONL file.
+Run from the Backend directory: python -m benchmarks.tracing_bench [--calls 100000 --requests 500]
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import tempfile
+import time
+
+import httpx
+from fastapi import FastAPI
+from sqlalchemy.ext.asyncio import create_async_engine
+from sqlalchemy.orm import sessionmaker
+from sqlmodel import SQLModel
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from app.inventory_routes import inventory_router
+from app.middleware import TracingMiddleware
+from src.Db.db import get_session
+from src.cache.response_cache import response_cache
+from src.manager.warehouse_manager import WarehouseManager
+from src.tracing.export import JsonlSpanExporter
+from src.tracing.tracer import tracer, traced, install_sql_tracing, shutdown_tracing
+
+INVENTORY_ID = "BENCH_INV"
+
+
+async def wrapper_cost(count: int, exporter) -> dict:
+    """
+    Seconds per call of a traced empty coroutine: undecorated, tracing off, outside any trace at sample
+    rate 0 (a sampling decision per call), inside an unsampled trace and inside a sampled one
+    """
+    @traced
+    class Empty:
+        async def noop(self):
+            pass
+
+    empty = Empty()
+
+    async def calls(method) -> float:
+        samples = []
+        for _ in range(3):
+            start = time.perf_counter()
+            for _ in range(count):
+                await method(empty)
+            samples.append((time.perf_counter() - start) / count)
+        return min(samples)
+
+    timings = {"undecorated": await calls(Empty.noop.__wrapped__), "off": await calls(Empty.noop)}
+    tracer.configure(exporter, 0.0, max_spans=3 * count + 1)
+    timings["unsampled root"] = await calls(Empty.noop)
+    for name, sampled in (("unsampled", False), ("sampled", True)):
+        with tracer.start_trace("bench", sampled=sampled):
+            timings[name] = await calls(Empty.noop)
+    return timings
+
+
+async def setup(path: str):
+    engine = create_async_engine(f"sqlite+aiosqlite:///{path}")
+    async with engine.begin() as conn:
+        await conn.run_sync(SQLModel.metadata.create_all)
+    maker = sessionmaker(bind=engine, class_=AsyncSession, expire_on_commit=False)
+    async with maker() as session:
+        await WarehouseManager(session).setup_inventory(INVENTORY_ID, "BENCH_OWNER", "bench")
+    return engine, maker
+
+
+async def request_latency(maker, count: int, sample_rate: float) -> float:
+    """Median latency of GET /inventory/{id}/statistics through TracingMiddleware, the response cache cleared"""
+    tracer.sample_rate = sample_rate
+    app = FastAPI()
+    app.include_router(inventory_router)
+    app.add_middleware(TracingMiddleware)
+
+    async def session_override():
+        async with maker() as session:
+            yield session
+
+    app.dependency_overrides[get_session] = session_override
+    samples = []
+    async with httpx.AsyncClient(transport=httpx.ASGITransport(app=app), base_url="http://bench") as client:
+        for _ in range(count):
+            response_cache.clear()
+            start = time.perf_counter()
+            await client.get(f"/inventory/{INVENTORY_ID}/statistics")
+            samples.append(time.perf_counter() - start)
+    return statistics.median(samples)
+
+
+async def run(args):
+    directory = tempfile.mkdtemp()
+    trace_path = os.path.join(directory, "traces.jsonl")
+    exporter = JsonlSpanExporter(trace_path, max_bytes=0, queue_size=100_000)
+    exporter.start()
+    timings = await wrapper_cost(args.calls, exporter)
+    print("traced wrapper per call: " +
+          ", ".join(f"{name} {seconds * 1e6:.2f} us" for name, seconds in timings.items()))
+
+    tracer.max_spans = 5_000
+    db_path = os.path.join(directory, "tracing_bench.db")
+    engine, maker = await setup(db_path)
+    install_sql_tracing(engine.sync_engine)
+    try:
+        for sample_rate in (0.0, 1.0, 0.0, 1.0):
+            latency = await request_latency(maker, args.requests, sample_rate)
+            print(f"GET /inventory/{{id}}/statistics at sample rate {sample_rate:.0%}: median {latency * 1e6:,.0f} us")
+    finally:
+        shutdown_tracing()
+        await engine.dispose()
+        os.remove(db_path)
+    with open(trace_path) as file:
+        spans = sum(1 for _ in file)
+    os.remove(trace_path)
+    print(f"{exporter.exported:,} traces, {spans:,} spans exported, {exporter.dropped} dropped")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--calls", type=int, default=100_000, help="Calls of the traced empty coroutine")
+    parser.add_argument("--requests", type=int, default=500, help="Requests at each sample rate")
+    asyncio.run(run(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
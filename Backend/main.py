@@ -5,35 +5,19 @@ from src.manager.supplier_manager import SupplierManager
 from src.Db.db import get_session, async_engine, create_db_and_tables
 from src.manager.theft_detection_manager import TheftDetectionManager
 from src.manager.warehouse_manager import WarehouseManager
+from src.utils.id_generator import new_id as generate_id
+from src.utils.log import setup_logging_from_settings, shutdown_logging
 import logging
 import asyncio
-import uuid
-import hashlib
-import datetime
 import random
 
-# Setup logging
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.StreamHandler(),
-        logging.FileHandler("smart_inventory.log")
-    ]
-)
-logger = logging.getLogger("smart_inventory")
+# Setup logging, written by a background thread to stdout and the log file
+setup_logging_from_settings(log_format="text", path="smart_inventory.log")
+logger = logging.getLogger("theftblock.smart_inventory")
 
 
 
 
-def generate_id(tag:str):
-    unique_id = str(uuid.uuid4())
-    timestamp = str(datetime.datetime.now())
-    id_hash = hashlib.sha256((timestamp + unique_id).encode()).hexdigest()[:10]
-    id_tag = f"{tag}_{id_hash}"
-    return id_tag
-
-
 async def main():
     logger.info("=== Starting Smart Inventory System Simulation ===\n")
 
@@ -289,4 +273,7 @@ async def main():
 
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    try:
+        asyncio.run(main())
+    finally:
+        shutdown_logging()
\ No newline at end of file
@@ -3,23 +3,144 @@ from typing import Union
 from app.inventory_routes import inventory_router
 from app.supplier_routes import supplier_router
 from app.testing_routes import test_router
-from src.Db.db import get_session, async_engine, create_db_and_tables
+from app.reader_routes import reader_router
+from app.job_routes import job_router
+from app.middleware import QueryProfilerMiddleware, TracingMiddleware, query_profiler_options
+from app.metrics_routes import metrics_router, MetricsMiddleware, register_runtime_gauges
+from src.Db.db import get_session, async_engine, create_db_and_tables, async_session
+from src.Db.profiler import install_query_profiler, install_pool_metrics
+from src.Db.worker_lease import WorkerIdLease
+from src.config.Settings import settings
+from src.manager.restock_manager import RestockMonitor
+from src.cache.tag_index import tag_index
+from src.cache.shelf_state import ShelfStateVerifier
+from src.cache.missing_buffer import missing_buffer, MissingBufferCheckpointer
+from src.ingest.pipeline import ReadPipeline, TagSightingSink
+from src.ingest.read_log import ReadCapture
+from src.ingest.llrp import LLRPReaderServer
+from src.ingest.reconcile import ScanReconciler
+from src.ingest.resolver import LocationResolver, RelocationSink
+from src.jobs.runner import JobRunner
+from src.jobs.analytics import register_analytics_jobs, PreventionPlanPrecompute
+from src.utils.metrics import LoopLagMonitor
+from src.utils.log import setup_logging_from_settings, shutdown_logging, get_logger
+from src.tracing.tracer import install_sql_tracing, setup_tracing_from_settings, shutdown_tracing
 from sqlmodel import SQLModel
 
 from fastapi import FastAPI
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
 
+log = get_logger("server")
+
 @asynccontextmanager
 async def lifespan(app: FastAPI):
+    setup_logging_from_settings()
+    setup_tracing_from_settings()
     await create_db_and_tables()  # Initialize DB
+    worker_lease = None
+    if settings.WORKER_ID is None:
+        worker_lease = WorkerIdLease(async_session, ttl_seconds=settings.WORKER_LEASE_SECONDS)
+        await worker_lease.start()
+    async with async_session() as session:
+        await tag_index.warm(session)
+        await missing_buffer.restore(session)
+    loop_lag_monitor = LoopLagMonitor(settings.LOOP_LAG_INTERVAL_SECONDS)
+    if settings.METRICS_ENABLED:
+        loop_lag_monitor.start()
+    restock_monitor = RestockMonitor(
+        session_factory=async_session,
+        interval_seconds=settings.RESTOCK_INTERVAL_SECONDS,
+        min_threshold=settings.RESTOCK_MIN_THRESHOLD,
+        order_size=settings.RESTOCK_ORDER_SIZE
+    )
+    if settings.RESTOCK_ENABLED:
+        restock_monitor.start()
+    shelf_state_verifier = ShelfStateVerifier(async_session,
+                                              interval_seconds=settings.SHELF_STATE_VERIFY_INTERVAL_SECONDS)
+    shelf_state_verifier.start()
+    missing_checkpointer = MissingBufferCheckpointer(async_session,
+                                                     interval_seconds=settings.MISSING_CHECKPOINT_INTERVAL_SECONDS)
+    missing_checkpointer.start()
+    app.state.job_runner = register_analytics_jobs(JobRunner(
+        async_session,
+        workers=settings.JOB_WORKERS,
+        max_queue_size=settings.JOB_QUEUE_SIZE,
+        result_ttl=settings.JOB_RESULT_TTL_SECONDS
+    ))
+    app.state.job_runner.start()
+    plan_precompute = PreventionPlanPrecompute(async_session, app.state.job_runner,
+                                               hour=settings.PREVENTION_PLAN_PRECOMPUTE_HOUR)
+    if settings.PREVENTION_PLAN_PRECOMPUTE_ENABLED:
+        plan_precompute.start()
+    read_capture = ReadCapture(settings.READ_CAPTURE_PATH) if settings.READ_CAPTURE_PATH else None
+    read_sink = TagSightingSink(async_session)
+    if settings.LOCATION_RESOLVER_ENABLED:
+        read_sink = RelocationSink(
+            read_sink,
+            async_session,
+            resolver=LocationResolver(strategy=settings.LOCATION_STRATEGY, min_reads=settings.LOCATION_MIN_READS),
+            window_seconds=settings.LOCATION_WINDOW_SECONDS
+        )
+    app.state.read_pipeline = ReadPipeline(
+        sink=read_sink,
+        max_queue_size=settings.INGEST_QUEUE_SIZE,
+        dedup_window=settings.INGEST_DEDUP_WINDOW_SECONDS,
+        batch_size=settings.INGEST_BATCH_SIZE,
+        flush_interval=settings.INGEST_FLUSH_INTERVAL_SECONDS,
+        tap=read_capture
+    )
+    app.state.read_pipeline.start()
+    llrp_server = None
+    if settings.LLRP_ENABLED:
+        reconciler = ScanReconciler(async_session)
+        reconciler.start()
+        llrp_server = LLRPReaderServer(
+            app.state.read_pipeline,
+            host=settings.LLRP_HOST,
+            port=settings.LLRP_PORT,
+            reconciler=reconciler,
+            keepalive_interval=settings.LLRP_KEEPALIVE_SECONDS
+        )
+        await llrp_server.start()
     yield  # The app runs here
-    print("Shutting down...")
+    if llrp_server:
+        await llrp_server.stop()
+        await llrp_server.reconciler.stop()
+    await app.state.read_pipeline.stop()
+    if isinstance(read_sink, RelocationSink):
+        await read_sink.flush()
+    if read_capture:
+        read_capture.close()
+    await restock_monitor.stop()
+    await shelf_state_verifier.stop()
+    await missing_checkpointer.stop()
+    await plan_precompute.stop()
+    await app.state.job_runner.stop()
+    await loop_lag_monitor.stop()
+    if worker_lease:
+        await worker_lease.stop()
+    log.info("server_stopped")
+    shutdown_tracing()
+    shutdown_logging()
 
 app = FastAPI(lifespan=lifespan)
 app.include_router(router=inventory_router)
 app.include_router(router=supplier_router)
 app.include_router(router=test_router)
+app.include_router(router=reader_router)
+app.include_router(router=job_router)
+if settings.METRICS_ENABLED:
+    app.include_router(router=metrics_router)
+    install_pool_metrics(async_engine.sync_engine)
+    register_runtime_gauges(app)
+    app.add_middleware(MetricsMiddleware)
+if settings.DB_PROFILER_ENABLED:
+    install_query_profiler(async_engine.sync_engine)
+    app.add_middleware(QueryProfilerMiddleware, **query_profiler_options())
+if settings.TRACING_ENABLED:
+    install_sql_tracing(async_engine.sync_engine)
+    app.add_middleware(TracingMiddleware)
 app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:5173"],  # Change this for security
@@ -1,8 +1,14 @@
 from sqlmodel.ext.asyncio.session import AsyncSession
 
-from typing import Dict, Type,Any
+from typing import Dict, Type, Any, List
+from sqlalchemy import insert
 from sqlmodel import SQLModel, select
+from ..tracing.tracer import traced
+from ..utils.log import get_logger
 
+log = get_logger("db")
+
+@traced(root=False)
 class DatabaseManagement:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
@@ -15,10 +21,24 @@ class DatabaseManagement:
                 await self.session.refresh(model)
             return model
         except Exception as e:
-            print(f"Database insert error: {str(e)}")
+            log.error("db_insert_failed", model=type(model).__name__, error=str(e))
             await self.session.rollback()
             raise Exception("Failed to insert record.")
 
+    async def bulk_insert(self, model: Type[SQLModel], rows: List[Dict[str, Any]], auto_commit: bool = True) -> int:
+        """Insert many rows with a single executemany statement"""
+        if not rows:
+            return 0
+        try:
+            await self.session.exec(insert(model), params=rows)
+            if auto_commit:
+                await self.session.commit()
+            return len(rows)
+        except Exception as e:
+            log.error("db_bulk_insert_failed", model=model.__name__, rows=len(rows), error=str(e))
+            await self.session.rollback()
+            raise Exception("Failed to bulk insert records.")
+
     async def upsert(self, model: SQLModel):
         try:
             merged_model = await self.session.merge(model)
@@ -26,7 +46,7 @@ class DatabaseManagement:
             await self.session.refresh(merged_model)
             return merged_model
         except Exception as e:
-            print(f"Database upsert error: {str(e)}")
+            log.error("db_upsert_failed", model=type(model).__name__, error=str(e))
             await self.session.rollback()
             raise Exception("Failed to upsert record.")
 
@@ -34,7 +54,9 @@ class DatabaseManagement:
         try:
             query = select(model)
             for key, value in kwargs.items():
-                if hasattr(model, key):
+                if key.endswith("__in") and hasattr(model, key[:-4]):
+                    query = query.where(getattr(model, key[:-4]).in_(value))
+                elif hasattr(model, key):
                     query = query.where(getattr(model, key) == value)
 
             if all_results:
@@ -43,7 +65,7 @@ class DatabaseManagement:
                 results = (await self.session.exec(query)).first()
             return results
         except Exception as e:
-            print(f"Database search error: {e}")
+            log.error("db_search_failed", model=model.__name__, error=str(e))
             raise Exception("Failed to search records.")
     async def update_row(self,model: Type[SQLModel],search_criteria: Dict[str, Any],update_data: Dict[str, Any],insert_if_not_exist: bool = True) -> SQLModel:
         try:
@@ -64,6 +86,6 @@ class DatabaseManagement:
             updated_record = model(**update_data)
             return await self.upsert(updated_record)
         except Exception as e:
-            print(f"Database update_row error: {str(e)}")
+            log.error("db_update_failed", model=model.__name__, error=str(e))
             await self.session.rollback()
             raise Exception(f"Failed to update record: {str(e)}")
\ No newline at end of file
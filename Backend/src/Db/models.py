@@ -1,8 +1,10 @@
-from sqlmodel import SQLModel, Field, Enum
+from sqlmodel import SQLModel, Field, Enum, Column, Index
 from typing import Optional
 from datetime import datetime
 import enum
 
+from .types import EPC
+
 # Enum for product status
 class ProductStatus(str, enum.Enum):
     SOLD = "sold"
@@ -49,7 +51,7 @@ class Shelf(SQLModel, table=True):
 # Products table
 class Product(SQLModel, table=True):
     product_id: str = Field(default=None, primary_key=True)
-    rfid_tag: str = Field(unique=True)
+    rfid_tag: str = Field(sa_column=Column(EPC(), unique=True, nullable=False))  # Stored as the binary EPC
     product_name: str
     status: ProductStatus = Field(default=ProductStatus.ON_SHELF)
     supplier_id: str = Field(foreign_key="supplier.supplier_id")
@@ -102,6 +104,8 @@ class Sale(SQLModel, table=True):
 
 # Shelf Scans table
 class ShelfScan(SQLModel, table=True):
+    # Latest scans of a shelf are looked up for every new scan
+    __table_args__ = (Index("ix_shelfscan_shelf_id_scan_timestamp", "shelf_id", "scan_timestamp"),)
     scan_id: str = Field(default=None, primary_key=True)
     shelf_id: str = Field(foreign_key="shelf.shelf_id")
     scan_timestamp: datetime
@@ -109,5 +113,35 @@ class ShelfScan(SQLModel, table=True):
 # Shelf Scan Items table
 class ShelfScanItem(SQLModel, table=True):
     scan_item_id: str = Field(default=None, primary_key=True)
-    scan_id: str = Field(foreign_key="shelfscan.scan_id")
-    product_id: str = Field(foreign_key="product.product_id")
\ No newline at end of file
+    scan_id: str = Field(foreign_key="shelfscan.scan_id", index=True)
+    product_id: str = Field(foreign_key="product.product_id")
+# Delta encoded scans: a scan with a ShelfScanDelta row only stores what changed since its base scan
+# (ShelfScanChange rows), a scan without one is a checkpoint with a ShelfScanItem per product found
+class ShelfScanDelta(SQLModel, table=True):
+    scan_id: str = Field(primary_key=True, foreign_key="shelfscan.scan_id")
+    base_scan_id: str = Field(foreign_key="shelfscan.scan_id")
+    checkpoint_scan_id: str = Field(foreign_key="shelfscan.scan_id", index=True)
+    depth: int  # Number of deltas since the checkpoint, this one included
+
+# Shelf Scan Changes table
+class ShelfScanChange(SQLModel, table=True):
+    change_id: str = Field(default=None, primary_key=True)
+    scan_id: str = Field(foreign_key="shelfscan.scan_id", index=True)
+    product_id: str = Field(foreign_key="product.product_id")
+    added: bool  # False when the product was no longer found
+
+# Worker IDs of the ID generator (src/utils/id_generator.py) held by running server processes, so no two
+# processes issue IDs with the same worker component
+class WorkerLease(SQLModel, table=True):
+    worker_id: int = Field(primary_key=True, sa_column_kwargs={"autoincrement": False})
+    holder: str  # host:pid:nonce of the process holding it
+    expires_at: datetime
+
+# Products missed by recent scans but not yet confirmed missing, checkpointed from the in-memory
+# missing buffer (src/cache/missing_buffer.py) so pending suspicions survive a restart
+class MissingSuspicion(SQLModel, table=True):
+    product_id: str = Field(primary_key=True, foreign_key="product.product_id")
+    shelf_id: str = Field(foreign_key="shelf.shelf_id")
+    first_missed_timestamp: datetime
+    misses: int  # Consecutive scans of the shelf that did not find the product
+    last_scan_id: Optional[str] = None
@@ -0,0 +1,121 @@
+import re
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Tuple, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..utils.metrics import metrics
+
+_STRINGS = re.compile(r"'(?:[^']|'')*'")
+_NUMBERS = re.compile(r"\b\d+(?:\.\d+)?\b")
+_PLACEHOLDER_LISTS = re.compile(r"\(\s*(?:\?|%\(\w+\)s|\$\d+|:\w+)(?:\s*,\s*(?:\?|%\(\w+\)s|\$\d+|:\w+))*\s*\)")
+_PLACEHOLDERS = re.compile(r"%\(\w+\)s|\$\d+|(?<![:\w]):\w+")
+_SPACES = re.compile(r"\s+")
+
+_fingerprints: Dict[str, str] = {}
+
+
+def fingerprint(statement: str) -> str:
+    """
+    Statement shape with its values taken out: literals and bind parameters become ?, IN lists (?, ?+)
+    whatever their length, so queries that differ only in their parameters share a fingerprint
+    """
+    shape = _fingerprints.get(statement)
+    if shape is None:
+        shape = _STRINGS.sub("?", statement)
+        shape = _PLACEHOLDERS.sub("?", shape)
+        shape = _NUMBERS.sub("?", shape)
+        shape = _PLACEHOLDER_LISTS.sub("(?+)", shape)
+        shape = _SPACES.sub(" ", shape).strip()
+        if len(_fingerprints) < 10_000:
+            _fingerprints[statement] = shape
+    return shape
+
+
+class QueryProfile:
+    """Queries a request ran: count, total time, the slowest statements and how often each shape repeated"""
+
+    def __init__(self, keep_slowest: int = 5):
+        self.keep_slowest = keep_slowest
+        self.count = 0
+        self.seconds = 0.0
+        self.slowest: List[Tuple[float, str]] = []  # (seconds, statement), slowest first
+        self.shapes: Counter = Counter()
+        self.shape_seconds: Dict[str, float] = {}
+
+    def record(self, statement: str, seconds: float) -> None:
+        self.count += 1
+        self.seconds += seconds
+        shape = fingerprint(statement)
+        self.shapes[shape] += 1
+        self.shape_seconds[shape] = self.shape_seconds.get(shape, 0.0) + seconds
+        if len(self.slowest) < self.keep_slowest or seconds > self.slowest[-1][0]:
+            self.slowest.append((seconds, statement))
+            self.slowest.sort(key=lambda item: item[0], reverse=True)
+            del self.slowest[self.keep_slowest:]
+
+    def repeated(self, threshold: int) -> List[Tuple[str, int]]:
+        """Shapes run at least threshold times, the N+1 suspects, most frequent first"""
+        return [(shape, count) for shape, count in self.shapes.most_common() if count >= threshold]
+
+    def summary(self, repeat_threshold: int) -> Dict[str, Any]:
+        return {
+            "queries": self.count,
+            "db_ms": round(self.seconds * 1000, 2),
+            "distinct_shapes": len(self.shapes),
+            "repeated": [{"fingerprint": shape, "count": count,
+                          "db_ms": round(self.shape_seconds[shape] * 1000, 2)}
+                         for shape, count in self.repeated(repeat_threshold)],
+            "slowest": [{"db_ms": round(seconds * 1000, 2), "fingerprint": fingerprint(statement)}
+                        for seconds, statement in self.slowest]
+        }
+
+
+current_profile: ContextVar[Optional[QueryProfile]] = ContextVar("current_profile", default=None)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    if current_profile.get() is not None:
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    profile = current_profile.get()
+    if profile is not None:
+        started = conn.info.get("query_started")
+        if started:
+            profile.record(statement, time.perf_counter() - started.pop())
+
+
+def _handle_error(context):
+    started = context.connection.info.get("query_started") if context.connection is not None else None
+    if started:
+        started.pop()
+
+
+def install_query_profiler(engine: Engine) -> None:
+    """Time every statement of the engine (the sync_engine of an async one) into the current profile"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+pool_checkouts = metrics.counter("db_pool_checkouts_total", "Connections checked out of the pool")
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    pool_checkouts.inc()
+
+
+def install_pool_metrics(engine: Engine) -> None:
+    """Count pool checkouts and report the connections in use and the pool size at scrape time"""
+    if not event.contains(engine.pool, "checkout", _on_checkout):
+        event.listen(engine.pool, "checkout", _on_checkout)
+    pool = engine.pool
+    metrics.gauge("db_pool_checked_out", "Connections currently checked out",
+                  lambda: pool.checkedout() if hasattr(pool, "checkedout") else None)
+    metrics.gauge("db_pool_size", "Configured pool size", lambda: pool.size() if hasattr(pool, "size") else None)
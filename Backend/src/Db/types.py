@@ -0,0 +1,19 @@
+from sqlalchemy.types import TypeDecorator, LargeBinary
+
+from ..utils.epc import tag_to_epc, epc_to_tag
+
+
+class EPC(TypeDecorator):
+    """RFID tag column, "RFID_<hex>" in Python and the raw 12/16 byte EPC in the database"""
+    impl = LargeBinary(16)
+    cache_ok = True
+
+    def process_bind_param(self, value, dialect):
+        if value is None or isinstance(value, bytes):
+            return value
+        return tag_to_epc(value)
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        return epc_to_tag(value)
@@ -0,0 +1,100 @@
+import datetime
+import os
+import socket
+from typing import Optional, Callable
+
+from sqlalchemy.exc import IntegrityError
+from sqlmodel import select, update, delete
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .models import WorkerLease
+from ..utils.background import PeriodicTask
+from ..utils.id_generator import IdGenerator, id_generator, new_id, MAX_WORKER_ID
+from ..utils.log import get_logger
+
+log = get_logger("db")
+
+
+class WorkerIdLease:
+    """
+    Leases a worker ID of the ID generator from the WorkerLease table, so every server process issues IDs
+    with a worker component no other running process holds. The derived worker ID is taken when it is free,
+    else the lowest free one. The lease is renewed every third of ttl_seconds and released on stop; the
+    lease of a process that died is reused once it has expired.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], generator: IdGenerator = id_generator,
+                 ttl_seconds: float = 120, attempts: int = 10):
+        self.session_factory = session_factory
+        self.generator = generator
+        self.ttl_seconds = ttl_seconds
+        self.attempts = attempts
+        self.holder = f"{socket.gethostname()}:{os.getpid()}:{new_id('LEASE')}"
+        self.worker_id: Optional[int] = None
+        self._task = PeriodicTask("worker_lease_renew", self.renew, lambda: self.ttl_seconds / 3)
+
+    async def claim(self) -> int:
+        preferred = self.generator.worker_id
+        for _ in range(self.attempts):
+            async with self.session_factory() as session:
+                now = datetime.datetime.now()
+                held = set((await session.exec(
+                    select(WorkerLease.worker_id).where(WorkerLease.expires_at > now)
+                )).all())
+                if len(held) > MAX_WORKER_ID:
+                    raise Exception("Every worker ID is leased")
+                worker_id = preferred if preferred not in held else \
+                    next(candidate for candidate in range(MAX_WORKER_ID + 1) if candidate not in held)
+                expires_at = now + datetime.timedelta(seconds=self.ttl_seconds)
+
+                # Take over an expired lease or insert a new one, a process claiming the same ID meanwhile
+                # makes one of the two fail and try again
+                result = await session.exec(
+                    update(WorkerLease)
+                    .where(WorkerLease.worker_id == worker_id, WorkerLease.expires_at <= now)
+                    .values(holder=self.holder, expires_at=expires_at)
+                )
+                if result.rowcount == 0:
+                    session.add(WorkerLease(worker_id=worker_id, holder=self.holder, expires_at=expires_at))
+                try:
+                    await session.commit()
+                except IntegrityError:
+                    await session.rollback()
+                    continue
+            self.worker_id = worker_id
+            self.generator.set_worker_id(worker_id)
+            log.info("worker_id_leased", worker_id=worker_id, holder=self.holder)
+            return worker_id
+        raise Exception(f"Could not lease a worker ID in {self.attempts} attempts")
+
+    async def renew(self) -> None:
+        async with self.session_factory() as session:
+            result = await session.exec(
+                update(WorkerLease)
+                .where(WorkerLease.worker_id == self.worker_id, WorkerLease.holder == self.holder)
+                .values(expires_at=datetime.datetime.now() + datetime.timedelta(seconds=self.ttl_seconds))
+            )
+            await session.commit()
+        if result.rowcount == 0:
+            # Expired and taken over, IDs issued since may share the other process's worker ID
+            log.error("worker_id_lease_lost", worker_id=self.worker_id, holder=self.holder)
+            await self.claim()
+
+    async def start(self) -> None:
+        try:
+            await self.claim()
+        except Exception as e:
+            log.warning("worker_id_derived", worker_id=self.generator.worker_id, error=str(e))
+            return
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+        if self.worker_id is None:
+            return
+        async with self.session_factory() as session:
+            await session.exec(
+                delete(WorkerLease).where(WorkerLease.worker_id == self.worker_id, WorkerLease.holder == self.holder)
+            )
+            await session.commit()
+        self.worker_id = None
@@ -0,0 +1,119 @@
+from collections import OrderedDict
+from typing import Optional, Dict, List, Tuple, NamedTuple, Any
+
+from ..config.Settings import settings
+from ..utils.id_generator import new_id
+from .tag_index import tag_index, TagInfo
+
+
+class ProductChange(NamedTuple):
+    seq: int
+    product_id: str
+    rfid_tag: str
+    status: str
+    shelf_id: Optional[str]
+
+
+class _InventoryLog:
+    def __init__(self):
+        self.seq = 0
+        # Compacted oldest to newest: a product's new change replaces its previous one at the end
+        self.changes: "OrderedDict[str, ProductChange]" = OrderedDict()
+        self.floor = 0  # Changes up to this seq may have been evicted
+
+
+class ChangeLog:
+    """
+    Per-inventory log of product changes (status, shelf, sale) fed by the tag index, read back as the
+    changes since a cursor. A product belongs to the inventory it was received into; a change to sold
+    means it has left the inventory. The log is compacted as it is written, only a product's latest change is kept,
+    so it never holds more than one entry per product, and past max_changes entries the oldest ones are
+    evicted. A cursor from before an eviction, or from an earlier process (the log lives in memory), can
+    no longer be served and the reader has to start over from a snapshot.
+    Cursors are "<epoch>:<seq>" where seq increases by one with every change of the inventory.
+    """
+
+    def __init__(self, max_changes: int = 50_000):
+        self.max_changes = max_changes
+        self.epoch = new_id("CHG")
+        self._logs: Dict[str, _InventoryLog] = {}
+        self.evicted = 0
+
+    def _log(self, inventory_id: str) -> _InventoryLog:
+        log = self._logs.get(inventory_id)
+        if log is None:
+            log = self._logs[inventory_id] = _InventoryLog()
+        return log
+
+    def record(self, inventory_id: str, product_id: str, rfid_tag: str, status: str,
+               shelf_id: Optional[str]) -> int:
+        log = self._log(inventory_id)
+        log.seq += 1
+        log.changes.pop(product_id, None)
+        log.changes[product_id] = ProductChange(log.seq, product_id, rfid_tag, status, shelf_id)
+        while len(log.changes) > self.max_changes:
+            _, evicted = log.changes.popitem(last=False)
+            log.floor = evicted.seq
+            self.evicted += 1
+        return log.seq
+
+    def apply(self, rfid_tag: str, info: TagInfo) -> None:
+        """Tag index listener, products outside any inventory (with a supplier) are not logged"""
+        if info.inventory_id is not None:
+            self.record(info.inventory_id, info.product_id, rfid_tag, info.status.value, info.shelf_id)
+
+    def cursor(self, inventory_id: str) -> str:
+        log = self._logs.get(inventory_id)
+        return f"{self.epoch}:{log.seq if log is not None else 0}"
+
+    def parse_cursor(self, cursor: str) -> Optional[int]:
+        """seq of a cursor of this log, None for one from another epoch; raises ValueError when malformed"""
+        epoch, separator, seq = cursor.rpartition(":")
+        if not separator or not seq.isdigit():
+            raise ValueError(f"Invalid cursor {cursor}")
+        return int(seq) if epoch == self.epoch else None
+
+    def serves(self, inventory_id: str, cursor: str) -> bool:
+        """Whether the changes after cursor are all still in the log; raises ValueError when malformed"""
+        seq = self.parse_cursor(cursor)
+        log = self._logs.get(inventory_id)
+        if log is None:
+            return seq == 0
+        return seq is not None and log.floor <= seq <= log.seq
+
+    def since(self, inventory_id: str, cursor: str, limit: Optional[int] = None) \
+            -> Optional[Tuple[List[ProductChange], str, bool]]:
+        """
+        Changes after cursor oldest first, at most limit of them, with the cursor to continue from and
+        whether more changes follow. None when the cursor can no longer be served.
+        """
+        if not self.serves(inventory_id, cursor):
+            return None
+        seq = self.parse_cursor(cursor)
+        log = self._logs.get(inventory_id)
+        current = log.seq if log is not None else 0
+        changes = []
+        if log is not None and seq < current:
+            for change in reversed(log.changes.values()):
+                if change.seq <= seq:
+                    break
+                changes.append(change)
+            changes.reverse()
+        has_more = limit is not None and len(changes) > limit
+        if has_more:
+            changes = changes[:limit]
+            return changes, f"{self.epoch}:{changes[-1].seq}", True
+        return changes, f"{self.epoch}:{current}", False
+
+    def clear(self) -> None:
+        self._logs.clear()
+        self.epoch = new_id("CHG")
+        self.evicted = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"inventories": len(self._logs), "changes": sum(len(log.changes) for log in self._logs.values()),
+                "max_changes": self.max_changes, "evicted": self.evicted}
+
+
+change_log = ChangeLog(settings.CHANGE_LOG_MAX_CHANGES)
+tag_index.subscribe(change_log.apply)
@@ -0,0 +1,37 @@
+from typing import Optional, Dict
+
+from .tag_index import tag_index, TagInfo
+
+
+class InventoryVersions:
+    """
+    Change counter per inventory, bumped after every write the managers commit for it, plus a global
+    counter bumped with each of them. Cached responses are keyed on these so any write invalidates them.
+    Status changes are picked up from the tag index; writes that do not change a product status (layout,
+    supplier links, receipts) bump explicitly.
+    """
+
+    def __init__(self):
+        self._versions: Dict[str, int] = {}
+        self.total = 0
+
+    def get(self, inventory_id: str) -> int:
+        return self._versions.get(inventory_id, 0)
+
+    def bump(self, inventory_id: Optional[str] = None) -> None:
+        """Record a write to an inventory, without one every inventory is considered changed"""
+        self.total += 1
+        if inventory_id is None:
+            for known in self._versions:
+                self._versions[known] += 1
+        else:
+            self._versions[inventory_id] = self._versions.get(inventory_id, 0) + 1
+
+    def apply(self, rfid_tag: str, info: TagInfo) -> None:
+        """Tag index listener, products outside any inventory (with a supplier) change nothing here"""
+        if info.inventory_id is not None:
+            self.bump(info.inventory_id)
+
+
+inventory_versions = InventoryVersions()
+tag_index.subscribe(inventory_versions.apply)
@@ -0,0 +1,158 @@
+import asyncio
+import datetime
+from typing import Optional, Dict, List, Callable, Iterable, Tuple, Any
+
+from sqlmodel import delete, select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config.Settings import settings
+from ..Db.database_management import DatabaseManagement
+from ..Db.models import MissingSuspicion, ProductStatus
+from ..utils.background import PeriodicTask
+from ..utils.log import get_logger
+from .tag_index import tag_index, TagInfo
+
+log = get_logger("cache")
+
+# shelf_id, first missed (epoch seconds), consecutive misses, scan that last missed it
+Suspicion = Tuple[str, float, int, Optional[str]]
+
+
+class MissingBuffer:
+    """
+    Products a scan did not find, held until they are confirmed missing: absent from confirm_scans
+    consecutive scans of their shelf or for confirm_minutes since the first miss. Any read of the product
+    clears its suspicion, as does a status change that takes it off its shelf (sale, move, report).
+    A scan counts once however many times it is reconciled, so scan_shelf and detect_missing_products can
+    both pass the same scan. checkpoint() writes the pending suspicions to the database and restore() loads
+    them back after a restart.
+    """
+
+    def __init__(self, confirm_scans: int = 3, confirm_minutes: float = 30.0):
+        self.confirm_scans = confirm_scans
+        self.confirm_seconds = confirm_minutes * 60
+        self._pending: Dict[str, Suspicion] = {}  # product_id -> Suspicion
+        self._dirty = False
+        self.confirmed = 0
+        self.cleared = 0
+
+    def __len__(self) -> int:
+        return len(self._pending)
+
+    def __contains__(self, product_id: str) -> bool:
+        return product_id in self._pending
+
+    def observe(self, shelf_id: str, scan_id: str, missing_ids: Iterable[str], found_ids: Iterable[str] = (),
+                scan_timestamp: Optional[datetime.datetime] = None) -> List[str]:
+        """Record one scan of a shelf, returns the missing products that are now confirmed"""
+        self.seen(found_ids)
+        now = (scan_timestamp or datetime.datetime.now()).timestamp()
+        confirmed = []
+        for product_id in missing_ids:
+            suspicion = self._pending.get(product_id)
+            if suspicion is None or suspicion[0] != shelf_id:
+                suspicion = (shelf_id, now, 0, None)
+            shelf, first_missed, misses, last_scan_id = suspicion
+            if last_scan_id != scan_id:
+                misses += 1
+            if misses >= self.confirm_scans or now - first_missed >= self.confirm_seconds:
+                self._pending.pop(product_id, None)
+                confirmed.append(product_id)
+            else:
+                self._pending[product_id] = (shelf, first_missed, misses, scan_id)
+            self._dirty = True
+        self.confirmed += len(confirmed)
+        return confirmed
+
+    def seen(self, product_ids: Iterable[str]) -> None:
+        """Clear the suspicions of products that were read again"""
+        if not self._pending:
+            return
+        before = len(self._pending)
+        for product_id in product_ids:
+            self._pending.pop(product_id, None)
+        if len(self._pending) != before:
+            self.cleared += before - len(self._pending)
+            self._dirty = True
+
+    def apply(self, rfid_tag: str, info: TagInfo) -> None:
+        """Tag index listener, a product that left its shelf is no longer suspected"""
+        suspicion = self._pending.get(info.product_id)
+        if suspicion is not None and (info.status != ProductStatus.ON_SHELF or info.shelf_id != suspicion[0]):
+            del self._pending[info.product_id]
+            self._dirty = True
+
+    def pending(self, shelf_id: Optional[str] = None) -> Dict[str, Suspicion]:
+        if shelf_id is None:
+            return dict(self._pending)
+        return {product_id: suspicion for product_id, suspicion in self._pending.items() if suspicion[0] == shelf_id}
+
+    def clear(self) -> None:
+        self._pending.clear()
+        self._dirty = False
+        self.confirmed = 0
+        self.cleared = 0
+
+    async def checkpoint(self, session: AsyncSession) -> int:
+        """Replace the stored suspicions with the pending ones, skipped when nothing changed"""
+        if not self._dirty:
+            return 0
+        self._dirty = False
+        rows = [
+            {"product_id": product_id, "shelf_id": shelf_id,
+             "first_missed_timestamp": datetime.datetime.fromtimestamp(first_missed),
+             "misses": misses, "last_scan_id": last_scan_id}
+            for product_id, (shelf_id, first_missed, misses, last_scan_id) in self._pending.items()
+        ]
+        try:
+            await session.exec(delete(MissingSuspicion))
+            await DatabaseManagement(session).bulk_insert(MissingSuspicion, rows, auto_commit=False)
+            await session.commit()
+        except Exception:
+            self._dirty = True
+            await session.rollback()
+            raise
+        return len(rows)
+
+    async def restore(self, session: AsyncSession) -> int:
+        """Load checkpointed suspicions, ones already pending in memory are kept"""
+        rows = (await session.exec(select(MissingSuspicion))).all()
+        for row in rows:
+            self._pending.setdefault(row.product_id, (
+                row.shelf_id, row.first_missed_timestamp.timestamp(), row.misses, row.last_scan_id
+            ))
+        if rows:
+            log.info("missing_suspicions_restored", suspicions=len(rows))
+        return len(rows)
+
+    def stats(self) -> Dict[str, Any]:
+        return {"pending": len(self._pending), "confirmed": self.confirmed, "cleared": self.cleared,
+                "confirm_scans": self.confirm_scans, "confirm_minutes": self.confirm_seconds / 60}
+
+
+class MissingBufferCheckpointer:
+    """Periodically runs MissingBuffer.checkpoint on its own session, and once more on stop"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], buffer: Optional[MissingBuffer] = None,
+                 interval_seconds: float = 60):
+        self.session_factory = session_factory
+        self.buffer = buffer if buffer is not None else missing_buffer
+        self.interval_seconds = interval_seconds
+        self._task = PeriodicTask("missing_buffer_checkpoint", self.run_once, lambda: self.interval_seconds)
+        self._lock = asyncio.Lock()
+
+    async def run_once(self) -> int:
+        async with self._lock:
+            async with self.session_factory() as session:
+                return await self.buffer.checkpoint(session)
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+        await self._task.run_job()
+
+
+missing_buffer = MissingBuffer(settings.MISSING_CONFIRM_SCANS, settings.MISSING_CONFIRM_MINUTES)
+tag_index.subscribe(missing_buffer.apply)
@@ -0,0 +1,104 @@
+import asyncio
+import hashlib
+import time
+from collections import OrderedDict
+from typing import Optional, Dict, Tuple, NamedTuple, Hashable, Any, Callable, Awaitable
+
+from ..config.Settings import settings
+
+
+class CachedResponse(NamedTuple):
+    version: int
+    etag: str
+    body: bytes
+    expires_at: float
+
+
+class ResponseCache:
+    """
+    Serialized responses keyed by route and inventory, valid while the inventory version they were built
+    at is current and for at most ttl_seconds, which bounds staleness from writes of other processes.
+    Least recently used entries are evicted past max_entries. fill() builds a missing entry once however
+    many requests ask for it at the same time.
+    """
+
+    def __init__(self, max_entries: int = 1024, ttl_seconds: float = 30.0):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self._entries: "OrderedDict[Hashable, CachedResponse]" = OrderedDict()
+        self._building: Dict[Tuple[Hashable, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, key: Hashable, version: int) -> Optional[CachedResponse]:
+        entry = self._entries.get(key)
+        if entry is None or entry.version != version or entry.expires_at <= time.monotonic():
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(key)
+        return entry
+
+    def put(self, key: Hashable, version: int, body: bytes) -> CachedResponse:
+        etag = '"' + hashlib.blake2b(body, digest_size=12).hexdigest() + '"'
+        entry = CachedResponse(version, etag, body, time.monotonic() + self.ttl_seconds)
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+        return entry
+
+    async def fill(self, key: Hashable, version: int, build: Callable[[], Awaitable[bytes]]) -> CachedResponse:
+        """
+        Entry of key at version, built with build() on a miss. Requests missing the same entry while it is
+        being built wait for that build (and get its error) instead of running their own.
+        """
+        while True:
+            entry = self.get(key, version)
+            if entry is not None:
+                return entry
+            building = self._building.get((key, version))
+            if building is None:
+                break
+            self.merged += 1
+            try:
+                return await asyncio.shield(building)
+            except asyncio.CancelledError:
+                # The request building it was cancelled, not this one: build it here instead
+                if not building.cancelled():
+                    raise
+
+        future = asyncio.get_running_loop().create_future()
+        self._building[(key, version)] = future
+        try:
+            entry = self.put(key, version, await build())
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # Retrieved, nobody may be waiting for it
+            raise
+        finally:
+            del self._building[(key, version)]
+        future.set_result(entry)
+        return entry
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+        self.merged = 0
+
+    def stats(self) -> Dict[str, Any]:
+        return {"entries": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds,
+                "hits": self.hits, "misses": self.misses, "merged": self.merged}
+
+
+response_cache = ResponseCache(settings.RESPONSE_CACHE_MAX_ENTRIES, settings.RESPONSE_CACHE_TTL_SECONDS)
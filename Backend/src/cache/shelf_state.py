@@ -0,0 +1,169 @@
+import asyncio
+from collections import OrderedDict
+from typing import Optional, Dict, List, Callable, Any
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config.Settings import settings
+from ..Db.models import Product, ProductStatus
+from ..utils.background import PeriodicTask
+from ..utils.log import get_logger
+from .tag_index import tag_index, TagInfo
+
+log = get_logger("cache")
+
+
+class ShelfState:
+    """
+    In-memory map of the tags expected on each active shelf (rfid_tag -> product_id of its ON_SHELF
+    products), so a scan is reconciled without querying the shelf's products.
+    A shelf is loaded with one query the first time it is asked for and then kept current from the status
+    changes the managers record in the tag index: placement adds a tag, a sale, theft report or move takes
+    it off its shelf. Whole shelves are evicted least recently used first once more than max_tags tags are
+    held, and verify() repairs any drift from changes made by other processes.
+    """
+
+    def __init__(self, max_tags: int = 2_000_000):
+        self.max_tags = max_tags
+        self._shelves: "OrderedDict[str, Dict[str, str]]" = OrderedDict()
+        self._shelf_of: Dict[str, str] = {}
+        # Status changes seen while a load or verify query is in flight, replayed over its result
+        self._watchers: List[Dict[str, TagInfo]] = []
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def __len__(self) -> int:
+        return len(self._shelf_of)
+
+    def __contains__(self, shelf_id: str) -> bool:
+        return shelf_id in self._shelves
+
+    def apply(self, rfid_tag: str, info: TagInfo) -> None:
+        """Move a tag to where its new status puts it, shelves that are not loaded are left alone"""
+        for watcher in self._watchers:
+            watcher[rfid_tag] = info
+        target = info.shelf_id if info.status == ProductStatus.ON_SHELF else None
+        current = self._shelf_of.get(rfid_tag)
+        if current is not None and current != target:
+            del self._shelves[current][rfid_tag]
+            del self._shelf_of[rfid_tag]
+        if target is not None and target in self._shelves:
+            self._shelves[target][rfid_tag] = info.product_id
+            self._shelf_of[rfid_tag] = target
+
+    def _store(self, shelf_id: str, expected: Dict[str, str]) -> None:
+        self.discard(shelf_id)
+        self._shelves[shelf_id] = expected
+        for tag in expected:
+            previous = self._shelf_of.get(tag)
+            if previous is not None and previous != shelf_id:
+                del self._shelves[previous][tag]
+            self._shelf_of[tag] = shelf_id
+        while len(self._shelf_of) > self.max_tags and len(self._shelves) > 1:
+            self.discard(next(iter(self._shelves)))
+            self.evictions += 1
+
+    @staticmethod
+    def _overlay(shelf_id: str, expected: Dict[str, str], changes: Dict[str, TagInfo]) -> None:
+        for tag, info in changes.items():
+            if info.status == ProductStatus.ON_SHELF and info.shelf_id == shelf_id:
+                expected[tag] = info.product_id
+            else:
+                expected.pop(tag, None)
+
+    async def _load(self, session: AsyncSession, shelf_ids: List[str]) -> Dict[str, Dict[str, str]]:
+        """ON_SHELF tags of the shelves as the database has them, with changes made meanwhile applied"""
+        changes: Dict[str, TagInfo] = {}
+        self._watchers.append(changes)
+        try:
+            loaded: Dict[str, Dict[str, str]] = {shelf_id: {} for shelf_id in shelf_ids}
+            for offset in range(0, len(shelf_ids), 500):
+                rows = (await session.exec(
+                    select(Product.shelf_id, Product.rfid_tag, Product.product_id)
+                    .where(Product.shelf_id.in_(shelf_ids[offset:offset + 500]),
+                           Product.status == ProductStatus.ON_SHELF)
+                )).all()
+                for shelf_id, tag, product_id in rows:
+                    loaded[shelf_id][tag] = product_id
+        finally:
+            self._watchers.remove(changes)
+        for shelf_id, expected in loaded.items():
+            self._overlay(shelf_id, expected, changes)
+        return loaded
+
+    async def get_expected(self, session: AsyncSession, shelf_id: str) -> Dict[str, str]:
+        """rfid_tag -> product_id of every product that should be on the shelf"""
+        expected = self._shelves.get(shelf_id)
+        if expected is not None:
+            self.hits += 1
+            self._shelves.move_to_end(shelf_id)
+            return dict(expected)
+        self.misses += 1
+        expected = (await self._load(session, [shelf_id]))[shelf_id]
+        self._store(shelf_id, dict(expected))
+        return expected
+
+    def discard(self, shelf_id: str) -> None:
+        expected = self._shelves.pop(shelf_id, None)
+        if expected:
+            for tag in expected:
+                self._shelf_of.pop(tag, None)
+
+    def clear(self) -> None:
+        self._shelves.clear()
+        self._shelf_of.clear()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    async def verify(self, session: AsyncSession) -> Dict[str, int]:
+        """Compare every loaded shelf with the database and replace the ones that drifted"""
+        shelf_ids = list(self._shelves)
+        loaded = await self._load(session, shelf_ids)
+        drifted = 0
+        added = 0
+        removed = 0
+        for shelf_id, actual in loaded.items():
+            expected = self._shelves.get(shelf_id)
+            if expected is None or expected == actual:
+                continue
+            drifted += 1
+            added += len(actual.keys() - expected.keys())
+            removed += len(expected.keys() - actual.keys())
+            self._store(shelf_id, actual)
+        if drifted:
+            log.warning("shelf_state_drifted", shelves=drifted, tags_added=added, tags_removed=removed)
+        return {"shelves": len(shelf_ids), "drifted_shelves": drifted, "tags_added": added, "tags_removed": removed}
+
+    def stats(self) -> Dict[str, Any]:
+        return {"shelves": len(self._shelves), "tags": len(self._shelf_of), "max_tags": self.max_tags,
+                "hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+
+class ShelfStateVerifier:
+    """Periodically runs ShelfState.verify on its own session"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], state: Optional[ShelfState] = None,
+                 interval_seconds: float = 600):
+        self.session_factory = session_factory
+        self.state = state if state is not None else shelf_state
+        self.interval_seconds = interval_seconds
+        self._task = PeriodicTask("shelf_state_verify", self.run_once, lambda: self.interval_seconds)
+        self._lock = asyncio.Lock()
+
+    async def run_once(self) -> Dict[str, int]:
+        async with self._lock:
+            async with self.session_factory() as session:
+                return await self.state.verify(session)
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
+
+
+shelf_state = ShelfState(settings.SHELF_STATE_MAX_TAGS)
+tag_index.subscribe(shelf_state.apply)
@@ -0,0 +1,133 @@
+from collections import OrderedDict
+from typing import Optional, Dict, List, NamedTuple, Iterable, Callable
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config.Settings import settings
+from ..Db.models import Product, Shelf, StorageRack, ProductStatus
+from ..utils.epc import is_epc_tag
+from ..utils.log import get_logger
+
+log = get_logger("cache")
+
+
+class TagInfo(NamedTuple):
+    product_id: str
+    status: ProductStatus
+    shelf_id: Optional[str]
+    inventory_id: Optional[str]
+
+
+def _tag_query():
+    return (
+        select(Product.rfid_tag, Product.product_id, Product.status, Product.shelf_id, StorageRack.inventory_id)
+        .outerjoin(Shelf, Product.shelf_id == Shelf.shelf_id)
+        .outerjoin(StorageRack, Shelf.rack_id == StorageRack.rack_id)
+    )
+
+
+class TagIndex:
+    """
+    Process local LRU map of rfid_tag -> TagInfo so sensor reads resolve without a database round trip.
+    The managers update it after every status change they commit; changes made by other processes
+    are only picked up when the entry is evicted or the index is warmed again.
+    Listeners added with subscribe() see every status change recorded through update().
+    """
+
+    def __init__(self, max_size: int = 1_000_000):
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, TagInfo]" = OrderedDict()
+        self._listeners: List[Callable[[str, TagInfo], None]] = []
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def get(self, rfid_tag: str) -> Optional[TagInfo]:
+        info = self._entries.get(rfid_tag)
+        if info is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self._entries.move_to_end(rfid_tag)
+        return info
+
+    def put(self, rfid_tag: str, info: TagInfo) -> None:
+        self._entries[rfid_tag] = info
+        self._entries.move_to_end(rfid_tag)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+
+    def update(self, rfid_tag: str, product_id: str, status: ProductStatus, shelf_id: Optional[str] = None,
+               inventory_id: Optional[str] = None) -> None:
+        """Record a status change, an unknown inventory_id keeps the one already cached"""
+        if inventory_id is None:
+            previous = self._entries.get(rfid_tag)
+            if previous is not None:
+                inventory_id = previous.inventory_id
+        info = TagInfo(product_id, ProductStatus(status), shelf_id, inventory_id)
+        self.put(rfid_tag, info)
+        for listener in self._listeners:
+            listener(rfid_tag, info)
+
+    def subscribe(self, listener: Callable[[str, TagInfo], None]) -> None:
+        self._listeners.append(listener)
+
+    def update_many(self, products: Iterable[Product], inventory_id: Optional[str] = None) -> None:
+        for product in products:
+            self.update(product.rfid_tag, product.product_id, product.status, product.shelf_id, inventory_id)
+
+    def discard(self, rfid_tag: str) -> None:
+        self._entries.pop(rfid_tag, None)
+
+    def clear(self) -> None:
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    async def resolve(self, session: AsyncSession, rfid_tag: str) -> Optional[TagInfo]:
+        """Cached lookup, falls back to one joined query on a miss"""
+        info = self.get(rfid_tag)
+        if info is not None or not is_epc_tag(rfid_tag):
+            return info
+        row = (await session.exec(_tag_query().where(Product.rfid_tag == rfid_tag))).first()
+        if not row:
+            return None
+        tag, product_id, status, shelf_id, inventory_id = row
+        info = TagInfo(product_id, ProductStatus(status), shelf_id, inventory_id)
+        self.put(tag, info)
+        return info
+
+    async def resolve_many(self, session: AsyncSession, rfid_tags: List[str]) -> Dict[str, TagInfo]:
+        """Resolve many tags, all cache misses are loaded with a single IN query"""
+        resolved = {}
+        missing = []
+        for tag in rfid_tags:
+            info = self.get(tag)
+            if info is None:
+                if is_epc_tag(tag):
+                    missing.append(tag)
+            else:
+                resolved[tag] = info
+        if missing:
+            rows = (await session.exec(_tag_query().where(Product.rfid_tag.in_(missing)))).all()
+            for tag, product_id, status, shelf_id, inventory_id in rows:
+                info = TagInfo(product_id, ProductStatus(status), shelf_id, inventory_id)
+                self.put(tag, info)
+                resolved[tag] = info
+        return resolved
+
+    async def warm(self, session: AsyncSession, limit: Optional[int] = None) -> int:
+        """Load every product that is not sold yet, up to the index size"""
+        limit = min(limit or self.max_size, self.max_size)
+        query = _tag_query().where(Product.status != ProductStatus.SOLD).limit(limit)
+        rows = (await session.exec(query)).all()
+        for tag, product_id, status, shelf_id, inventory_id in rows:
+            self.put(tag, TagInfo(product_id, ProductStatus(status), shelf_id, inventory_id))
+        log.info("tag_index_warmed", tags=len(rows))
+        return len(rows)
+
+
+tag_index = TagIndex(settings.TAG_INDEX_SIZE)
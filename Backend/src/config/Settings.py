@@ -8,6 +8,123 @@ class Settings(BaseSettings):
     POSTGRES_PASSWORD: Optional[str] ="postgres"
     POSTGRES_HOST: Optional[str] = "localhost:5432"
     POSTGRES_DBNAME: Optional[str] = "TheftBlock"
+    # Full SQLAlchemy URL used instead of the Postgres settings when set, e.g. a scratch
+    # sqlite+aiosqlite:///loadtest.db for load tests
+    DATABASE_URL: Optional[str] = None
+
+    # Worker component of generated IDs. When unset every server process leases a free one from the database
+    # for WORKER_LEASE_SECONDS, renewed while it runs; set it only with a distinct value per process
+    WORKER_ID: Optional[int] = None
+    WORKER_LEASE_SECONDS: Optional[int] = 120
+
+    # Max number of RFID tags kept in the in-memory tag index
+    TAG_INDEX_SIZE: Optional[int] = 1_000_000
+
+    # RFID read ingestion pipeline
+    INGEST_QUEUE_SIZE: Optional[int] = 100_000
+    INGEST_DEDUP_WINDOW_SECONDS: Optional[float] = 1.0
+    INGEST_BATCH_SIZE: Optional[int] = 2_000
+    INGEST_FLUSH_INTERVAL_SECONDS: Optional[float] = 0.5
+    # Record every raw read to this file for later replay (src/ingest/replay.py), off when unset
+    READ_CAPTURE_PATH: Optional[str] = None
+
+    # Every window of reads each tag is placed on the shelf whose reader heard it best, by most reads (reads)
+    # or strongest signal (rssi), and products heard away from their shelf are moved there. Opt-in, since the
+    # reads endpoint is unauthenticated; rssi made far more wrong moves than reads in benchmarks/location_bench.py
+    LOCATION_RESOLVER_ENABLED: Optional[bool] = False
+    LOCATION_STRATEGY: Optional[str] = "reads"
+    LOCATION_WINDOW_SECONDS: Optional[float] = 30.0
+    LOCATION_MIN_READS: Optional[int] = 2
+
+    # TCP endpoint for fixed readers speaking LLRP. It is unauthenticated and its reads move products, so it
+    # is opt-in and local only; set LLRP_HOST to the readers' network explicitly. Only one process can
+    # listen on the port, enable it on a single worker
+    LLRP_ENABLED: Optional[bool] = False
+    LLRP_HOST: Optional[str] = "127.0.0.1"
+    LLRP_PORT: Optional[int] = 5084
+    LLRP_KEEPALIVE_SECONDS: Optional[float] = 30.0
+
+    # Expected tags of active shelves kept in memory, least recently scanned shelves are dropped past the
+    # tag limit and the rest is checked against the database every verify interval
+    SHELF_STATE_MAX_TAGS: Optional[int] = 2_000_000
+    SHELF_STATE_VERIFY_INTERVAL_SECONDS: Optional[int] = 600
+
+    # Handheld scanner WebSocket, tags are reconciled every batch size or flush interval
+    SCANNER_BATCH_SIZE: Optional[int] = 200
+    SCANNER_FLUSH_INTERVAL_SECONDS: Optional[float] = 0.1
+
+    # Shelf scans are stored as deltas against the previous scan with a full checkpoint every this many scans
+    SCAN_CHECKPOINT_INTERVAL: Optional[int] = 24
+
+    # A product missed by a scan is only reported missing once absent from this many consecutive scans of its
+    # shelf or for this many minutes, pending suspicions are checkpointed to the database every interval
+    MISSING_CONFIRM_SCANS: Optional[int] = 3
+    MISSING_CONFIRM_MINUTES: Optional[float] = 30.0
+    MISSING_CHECKPOINT_INTERVAL_SECONDS: Optional[int] = 60
+
+    # Cached inventory responses, dropped on any write to their inventory and after the TTL at the latest
+    RESPONSE_CACHE_MAX_ENTRIES: Optional[int] = 1024
+    RESPONSE_CACHE_TTL_SECONDS: Optional[float] = 30.0
+
+    # Inventory event stream: events kept for Last-Event-ID resume, and events a client may fall behind
+    # before it is dropped
+    EVENT_HISTORY_SIZE: Optional[int] = 10_000
+    EVENT_SUBSCRIBER_BUFFER: Optional[int] = 1_000
+    EVENT_KEEPALIVE_SECONDS: Optional[float] = 15.0
+
+    # Change feed: latest change per product kept per inventory, older cursors fall back to a snapshot
+    CHANGE_LOG_MAX_CHANGES: Optional[int] = 50_000
+    CHANGE_FEED_PAGE_SIZE: Optional[int] = 1_000
+
+    # Background jobs for slow analytics: concurrent jobs (each holds a DB connection), waiting jobs,
+    # and how long results are kept
+    JOB_WORKERS: Optional[int] = 2
+    JOB_QUEUE_SIZE: Optional[int] = 100
+    JOB_RESULT_TTL_SECONDS: Optional[float] = 3600
+    # Nightly theft prevention plan of every inventory, at this hour (local time)
+    PREVENTION_PLAN_PRECOMPUTE_ENABLED: Optional[bool] = True
+    PREVENTION_PLAN_PRECOMPUTE_HOUR: Optional[int] = 2
+
+    # Per-request query profiling: X-DB-Queries/Server-Timing headers, requests over the budget or repeating
+    # one statement shape DB_REPEAT_THRESHOLD times are logged, and a sampled share with full fingerprints
+    DB_PROFILER_ENABLED: Optional[bool] = True
+    DB_QUERY_BUDGET: Optional[int] = 50
+    DB_REPEAT_THRESHOLD: Optional[int] = 10
+    DB_PROFILE_SAMPLE_RATE: Optional[float] = 0.01
+    DB_PROFILE_KEEP_SLOWEST: Optional[int] = 5
+
+    # Prometheus metrics at /metrics, and how often the event loop lag is sampled
+    METRICS_ENABLED: Optional[bool] = True
+    LOOP_LAG_INTERVAL_SECONDS: Optional[float] = 0.5
+
+    # Logging: records go through a bounded queue to a writer thread. Per-product events are off unless
+    # LOG_ITEM_EVENTS, then sampled and limited to LOG_ITEM_RATE_LIMIT per second for each event name
+    LOG_LEVEL: Optional[str] = "INFO"
+    LOG_FORMAT: Optional[str] = "json"
+    LOG_FILE: Optional[str] = None
+    LOG_QUEUE_SIZE: Optional[int] = 10_000
+    LOG_ITEM_EVENTS: Optional[bool] = False
+    LOG_ITEM_SAMPLE_RATE: Optional[float] = 1.0
+    LOG_ITEM_RATE_LIMIT: Optional[float] = 100.0
+
+    # Tracing: a TRACE_SAMPLE_RATE share of requests, jobs and manager calls outside a request is traced with
+    # spans for the route, manager methods, DatabaseManagement calls and SQL statements. A request with a
+    # sampled traceparent header is always traced. Traces are appended to TRACE_FILE (rotated at
+    # TRACE_FILE_MAX_BYTES) or, with TRACE_EXPORTER "otlp", posted as OTLP JSON to TRACE_OTLP_ENDPOINT
+    TRACING_ENABLED: Optional[bool] = False
+    TRACE_SAMPLE_RATE: Optional[float] = 0.01
+    TRACE_EXPORTER: Optional[str] = "jsonl"
+    TRACE_FILE: Optional[str] = "traces.jsonl"
+    TRACE_FILE_MAX_BYTES: Optional[int] = 50_000_000
+    TRACE_OTLP_ENDPOINT: Optional[str] = "http://127.0.0.1:4318/v1/traces"
+    TRACE_MAX_SPANS: Optional[int] = 5_000
+    TRACE_QUEUE_SIZE: Optional[int] = 1_000
+
+    # Restock monitor: places supplier orders for inventories below threshold on its own, so it is opt-in
+    RESTOCK_ENABLED: Optional[bool] = False
+    RESTOCK_INTERVAL_SECONDS: Optional[int] = 300
+    RESTOCK_MIN_THRESHOLD: Optional[int] = 10
+    RESTOCK_ORDER_SIZE: Optional[int] = 20
     model_config = SettingsConfigDict(env_file=".env", env_file_encoding="utf-8")
 
 
@@ -1,32 +1,26 @@
-import hashlib
-import datetime
-from itertools import product
-
 from sqlmodel.ext.asyncio.session import AsyncSession
 
 from ..Db.database_management import DatabaseManagement
 from ..Db.models import Product
+from ..utils.id_generator import new_id
+from ..utils.epc import new_rfid_tag
+from ..utils.log import get_logger
+
+log = get_logger("sensor")
 
 class BaseSensor:
     def __init__(self,rfid_tag: str):
         self.sensor_id = rfid_tag
 
     async def init_sensor(self,session: AsyncSession):
-        timestamp = str(datetime.datetime.now())
-        sensor_id_hash = hashlib.sha256(timestamp.encode()).hexdigest()[:10]
-        self.sensor_id = f"SENSOR_{sensor_id_hash}"
-        product_id =f"PRODUCT_{sensor_id_hash}"
-        supplier_id = f"SUPPLIER_{sensor_id_hash}"
+        # Generated IDs and random 128-bit tags do not collide, so a failed insert is a real error and is not retried
+        self.sensor_id = new_rfid_tag()
+        product_id = new_id("PRODUCT")
 
         sensor_data = Product(product_id=product_id,rfid_tag=self.sensor_id,product_name="Product")
-        try:
-            db = DatabaseManagement(session)
-            await db.insert(sensor_data)
-            print(f"Sensor created with ID: {self.sensor_id}")
-        except Exception as e:
-            print(e)
-            print("ID collision detected, regenerating...")
-            await self.init_sensor(session)
+        db = DatabaseManagement(session)
+        await db.insert(sensor_data)
+        log.info("sensor_created", sensor_id=self.sensor_id, product_id=product_id)
         return self.sensor_id
 
     async def get_sensor_id(self) -> str:
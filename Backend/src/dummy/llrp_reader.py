@@ -0,0 +1,171 @@
+"""
+Local stand-in for fixed LLRP readers, one TCP connection per simulated shelf reader.
+
+    python -m src.dummy.llrp_reader --shelves 100 --tags 40 --rate 5000 --duration 10
+    python -m src.dummy.llrp_reader --inventory INV_xxx --port 5084 --rate 2000
+
+Each reader identifies itself with its shelf ID, sends RO_ACCESS_REPORTs at its share of --rate, closes an
+inventory round every --round-reports reports and reconnects with backoff when the connection drops.
+"""
+import argparse
+import asyncio
+import json
+import time
+from typing import Optional, Dict, Any
+
+from .reader_fleet import ReaderFleet, ShelfReader
+from ..ingest import llrp
+
+
+class LLRPStandInReader:
+    def __init__(self, reader: ShelfReader, host: str = "127.0.0.1", port: int = llrp.DEFAULT_PORT,
+                 reports_per_second: float = 10.0, tags_per_report: int = 20, round_reports: int = 10,
+                 reconnect_delay: float = 0.2, max_reconnect_delay: float = 5.0):
+        self.reader = reader
+        self.host = host
+        self.port = port
+        self.reports_per_second = reports_per_second
+        self.tags_per_report = tags_per_report
+        self.round_reports = round_reports
+        self.reconnect_delay = reconnect_delay
+        self.max_reconnect_delay = max_reconnect_delay
+        self._message_id = 0
+        self._writer: Optional[asyncio.StreamWriter] = None
+
+        self.connections = 0
+        self.reports_sent = 0
+        self.reads_sent = 0
+        self.rounds_sent = 0
+        self.keepalives = 0
+
+    def _next_id(self) -> int:
+        self._message_id += 1
+        return self._message_id
+
+    async def _answer(self, stream: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        """Acknowledges KEEPALIVEs until the server closes the connection"""
+        while True:
+            header = await stream.readexactly(llrp.MESSAGE_HEADER.size)
+            version_type, length, message_id = llrp.MESSAGE_HEADER.unpack(header)
+            if length > llrp.MESSAGE_HEADER.size:
+                await stream.readexactly(length - llrp.MESSAGE_HEADER.size)
+            if version_type & 0x3FF == llrp.KEEPALIVE:
+                self.keepalives += 1
+                writer.write(llrp.encode_message(llrp.KEEPALIVE_ACK, message_id))
+
+    async def _session(self, deadline: float) -> None:
+        stream, writer = await asyncio.open_connection(self.host, self.port)
+        self._writer = writer
+        self.connections += 1
+        answering = asyncio.create_task(self._answer(stream, writer))
+        try:
+            now = time.time()
+            rospec_id = 1
+            writer.write(llrp.encode_connection_event(self._next_id(), self.reader.sensor_id, now))
+            writer.write(llrp.encode_rospec_event(self._next_id(), llrp.ROSPEC_STARTED, rospec_id, now))
+            interval = 1.0 / self.reports_per_second
+            next_report = time.monotonic()
+            in_round = 0
+            while time.monotonic() < deadline:
+                if answering.done():
+                    answering.result()  # Raises the reason the server went away
+                now = time.time()
+                reads = self.reader.emit(now, self.tags_per_report)
+                writer.write(llrp.encode_ro_access_report(self._next_id(), reads))
+                self.reports_sent += 1
+                self.reads_sent += len(reads)
+                in_round += 1
+                if in_round >= self.round_reports:
+                    writer.write(llrp.encode_rospec_event(self._next_id(), llrp.ROSPEC_ENDED, rospec_id, now))
+                    rospec_id += 1
+                    writer.write(llrp.encode_rospec_event(self._next_id(), llrp.ROSPEC_STARTED, rospec_id, now))
+                    self.rounds_sent += 1
+                    in_round = 0
+                # Waits while the server has paused reading from us
+                await writer.drain()
+                next_report += interval
+                delay = next_report - time.monotonic()
+                if delay > 0:
+                    await asyncio.sleep(delay)
+            writer.write(llrp.encode_message(llrp.CLOSE_CONNECTION, self._next_id()))
+            await writer.drain()
+        finally:
+            answering.cancel()
+            self._writer = None
+            writer.close()
+
+    async def run(self, duration: float) -> None:
+        deadline = time.monotonic() + duration
+        delay = self.reconnect_delay
+        while time.monotonic() < deadline:
+            try:
+                await self._session(deadline)
+                return
+            except (OSError, asyncio.IncompleteReadError):
+                await asyncio.sleep(min(delay, max(0.0, deadline - time.monotonic())))
+                delay = min(delay * 2, self.max_reconnect_delay)
+
+    def drop_connection(self) -> None:
+        """Simulate a network drop, the reader reconnects on its own"""
+        if self._writer is not None:
+            self._writer.transport.abort()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connections": self.connections,
+            "reports": self.reports_sent,
+            "reads": self.reads_sent,
+            "rounds": self.rounds_sent,
+            "keepalives": self.keepalives
+        }
+
+
+async def run_stand_ins(fleet: ReaderFleet, host: str, port: int, rate: float, duration: float,
+                        tags_per_report: int = 20, round_reports: int = 10) -> Dict[str, Any]:
+    """One stand-in per fleet reader sharing rate reports per second, returns the summed reader stats"""
+    per_reader = rate / len(fleet.readers)
+    stand_ins = [
+        LLRPStandInReader(reader, host, port, per_reader, tags_per_report, round_reports)
+        for reader in fleet.readers
+    ]
+    start = time.perf_counter()
+    await asyncio.gather(*(stand_in.run(duration) for stand_in in stand_ins))
+    elapsed = time.perf_counter() - start
+
+    totals: Dict[str, Any] = {key: 0 for key in ("connections", "reports", "reads", "rounds", "keepalives")}
+    for stand_in in stand_ins:
+        for key, value in stand_in.stats().items():
+            totals[key] += value
+    totals["readers"] = len(stand_ins)
+    totals["reports_per_second"] = round(totals["reports"] / elapsed, 1) if elapsed else 0.0
+    return totals
+
+
+async def _main(args) -> Dict[str, Any]:
+    if args.inventory:
+        from ..Db.db import async_session
+        async with async_session() as session:
+            fleet = await ReaderFleet.from_database(session, args.inventory, seed=args.seed)
+    else:
+        fleet = ReaderFleet.synthetic(args.shelves, args.tags, seed=args.seed)
+    return await run_stand_ins(fleet, args.host, args.port, args.rate, args.duration,
+                               args.tags_per_report, args.round_reports)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Stand-in LLRP shelf readers")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=llrp.DEFAULT_PORT)
+    parser.add_argument("--shelves", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=40, help="Tags per shelf for a synthetic fleet")
+    parser.add_argument("--inventory", help="One reader per shelf of this inventory")
+    parser.add_argument("--rate", type=float, default=2_000, help="RO_ACCESS_REPORTs per second over all readers")
+    parser.add_argument("--tags-per-report", type=int, default=20)
+    parser.add_argument("--round-reports", type=int, default=10, help="Reports per inventory round")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    print(json.dumps(asyncio.run(_main(parser.parse_args())), indent=2))
+
+
+if __name__ == "__main__":
+    main()
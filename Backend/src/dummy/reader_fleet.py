@@ -0,0 +1,310 @@
+"""
+Seeded simulator of a fleet of fixed shelf readers and a load generator driving it.
+
+    python -m src.dummy.reader_fleet --shelves 200 --tags 50 --rate 20000 --duration 10
+    python -m src.dummy.reader_fleet --inventory INV_xxx --rate 5000          # real inventory, in-process pipeline
+    python -m src.dummy.reader_fleet --inventory INV_xxx --url http://127.0.0.1:8000
+
+Without --url the reads go straight into a ReadPipeline in this process; with --url they are posted
+to /reader/{reader_id}/reads of a running server.
+"""
+import argparse
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List, Optional, Any, Tuple
+
+import httpx
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..dummy.base_sensor import BaseSensor
+from ..Db.models import Product, Shelf, StorageRack, ProductStatus
+from ..ingest.pipeline import ReadPipeline, TagRead, Sink
+from ..utils.stats import latency_summary
+
+
+class ShelfReader(BaseSensor):
+    """Fixed UHF reader mounted on a shelf, its sensor ID is the shelf ID"""
+
+    def __init__(self, shelf_id: str, tags: List[str], rng: random.Random, miss_rate: float = 0.05):
+        super().__init__(shelf_id)
+        self.range = 2
+        self.tags = list(tags)
+        self.rng = rng
+        self.miss_rate = miss_rate
+        self.offline_until = 0.0
+
+    def is_online(self, now: float) -> bool:
+        return now >= self.offline_until
+
+    def emit(self, now: float, count: int) -> List[TagRead]:
+        """count read attempts on random tags in range, some of them are missed"""
+        if not self.tags or not self.is_online(now):
+            return []
+        rng = self.rng
+        reads = []
+        for _ in range(count):
+            if rng.random() < self.miss_rate:
+                continue
+            tag = self.tags[rng.randrange(len(self.tags))]
+            reads.append(TagRead(self.sensor_id, tag, now, round(-35 - rng.random() * 35, 1)))
+        return reads
+
+    async def read_sensor(self, session: AsyncSession) -> dict:
+        return {"id": self.sensor_id, "tags_in_range": len(self.tags), "range": self.range,
+                "online": self.is_online(time.time())}
+
+
+class ReaderFleet:
+    """
+    Shelf readers that report the tags in range with missed reads, reader drop-outs,
+    thefts (tags disappear) and misplacements (tags move to another shelf).
+    theft_rate and misplace_rate are events per tag per second, dropout_rate is per reader per second.
+    """
+
+    def __init__(self, shelf_tags: Dict[str, List[str]], seed: int = 0, miss_rate: float = 0.05,
+                 dropout_rate: float = 0.001, dropout_seconds: float = 5.0, theft_rate: float = 0.0,
+                 misplace_rate: float = 0.0):
+        self.rng = random.Random(seed)
+        self.readers = [ShelfReader(shelf_id, tags, self.rng, miss_rate) for shelf_id, tags in shelf_tags.items()]
+        self.dropout_rate = dropout_rate
+        self.dropout_seconds = dropout_seconds
+        self.theft_rate = theft_rate
+        self.misplace_rate = misplace_rate
+        self.stolen: Dict[str, str] = {}  # tag -> shelf it was taken from
+        self.misplaced: Dict[str, Tuple[str, str]] = {}  # tag -> (home shelf, current shelf)
+        self.dropouts = 0
+        self._carry = 0.0
+
+    @classmethod
+    def synthetic(cls, shelves: int, tags_per_shelf: int, **kwargs) -> "ReaderFleet":
+        shelf_tags = {
+            f"SHELF_{shelf:05d}": [f"RFID_{shelf:05d}{tag:027x}" for tag in range(tags_per_shelf)]
+            for shelf in range(shelves)
+        }
+        return cls(shelf_tags, **kwargs)
+
+    @classmethod
+    async def from_database(cls, session: AsyncSession, inventory_id: str, **kwargs) -> "ReaderFleet":
+        """One reader per shelf of the inventory, in range of the ON_SHELF products of that shelf"""
+        query = (
+            select(Shelf.shelf_id, Product.rfid_tag)
+            .join(StorageRack, Shelf.rack_id == StorageRack.rack_id)
+            .outerjoin(Product, (Product.shelf_id == Shelf.shelf_id) & (Product.status == ProductStatus.ON_SHELF))
+            .where(StorageRack.inventory_id == inventory_id)
+        )
+        shelf_tags: Dict[str, List[str]] = {}
+        for shelf_id, rfid_tag in (await session.exec(query)).all():
+            tags = shelf_tags.setdefault(shelf_id, [])
+            if rfid_tag:
+                tags.append(rfid_tag)
+        if not shelf_tags:
+            raise ValueError(f"No shelves found in inventory {inventory_id}")
+        return cls(shelf_tags, **kwargs)
+
+    @property
+    def total_tags(self) -> int:
+        return sum(len(reader.tags) for reader in self.readers)
+
+    def _events(self, now: float, dt: float) -> None:
+        rng = self.rng
+        for reader in self.readers:
+            if reader.is_online(now) and rng.random() < self.dropout_rate * dt:
+                reader.offline_until = now + self.dropout_seconds
+                self.dropouts += 1
+            if not reader.tags:
+                continue
+            if rng.random() < self.theft_rate * dt * len(reader.tags):
+                tag = reader.tags.pop(rng.randrange(len(reader.tags)))
+                self.stolen[tag] = reader.sensor_id
+            if reader.tags and len(self.readers) > 1 and rng.random() < self.misplace_rate * dt * len(reader.tags):
+                tag = reader.tags.pop(rng.randrange(len(reader.tags)))
+                target = rng.choice([other for other in self.readers if other is not reader])
+                target.tags.append(tag)
+                home = self.misplaced.get(tag, (reader.sensor_id, None))[0]
+                self.misplaced[tag] = (home, target.sensor_id)
+
+    def tick(self, now: float, dt: float, read_rate: float) -> List[TagRead]:
+        """Reads of all readers for a dt second interval at read_rate attempts per second overall"""
+        self._events(now, dt)
+        if not self.readers:
+            return []
+        attempts = read_rate * dt + self._carry
+        per_reader, remainder = divmod(attempts, len(self.readers))
+        self._carry = remainder
+        reads = []
+        for reader in self.readers:
+            reads.extend(reader.emit(now, int(per_reader)))
+        return reads
+
+
+class PipelineTarget:
+    """Feeds reads into an in-process ReadPipeline, latency is read time until the sink has written it"""
+
+    def __init__(self, sink: Sink, **pipeline_kwargs):
+        self.latencies: List[float] = []
+        self.sent = 0
+
+        async def timed_sink(batch: List[TagRead]) -> None:
+            await sink(batch)
+            done = time.time()
+            self.latencies.extend(done - read.timestamp for read in batch)
+
+        self.pipeline = ReadPipeline(timed_sink, **pipeline_kwargs)
+
+    async def start(self) -> None:
+        self.pipeline.start()
+
+    async def send(self, reads: List[TagRead]) -> None:
+        self.sent += len(reads)
+        await self.pipeline.submit(reads)
+
+    async def close(self) -> None:
+        await self.pipeline.stop(drain=True)
+
+    def report(self) -> Dict[str, Any]:
+        return {"target": "pipeline", "sent": self.sent, "pipeline": self.pipeline.stats(),
+                "latency": latency_summary(self.latencies)}
+
+
+class HttpTarget:
+    """Posts each reader's reads to the server, latency is the HTTP round trip"""
+
+    def __init__(self, base_url: str, max_in_flight: int = 64):
+        self.client = httpx.AsyncClient(base_url=base_url, timeout=30.0)
+        self.semaphore = asyncio.Semaphore(max_in_flight)
+        self.latencies: List[float] = []
+        self.sent = 0
+        self.throttled = 0
+        self.errors = 0
+        self._pending = set()
+
+    async def start(self) -> None:
+        pass
+
+    async def _post(self, reader_id: str, payload: Dict[str, Any]) -> None:
+        try:
+            start = time.perf_counter()
+            response = await self.client.post(f"/reader/{reader_id}/reads", json=payload)
+            self.latencies.append(time.perf_counter() - start)
+            if response.status_code == 429:
+                self.throttled += 1
+            elif response.status_code >= 400:
+                self.errors += 1
+        except httpx.HTTPError:
+            self.errors += 1
+        finally:
+            self.semaphore.release()
+
+    async def send(self, reads: List[TagRead]) -> None:
+        self.sent += len(reads)
+        by_reader: Dict[str, List[Dict[str, Any]]] = {}
+        for read in reads:
+            by_reader.setdefault(read.reader_id, []).append(
+                {"rfid_tag": read.rfid_tag, "timestamp": read.timestamp, "rssi": read.rssi}
+            )
+        for reader_id, items in by_reader.items():
+            await self.semaphore.acquire()
+            task = asyncio.create_task(self._post(reader_id, {"reads": items}))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def close(self) -> None:
+        if self._pending:
+            await asyncio.gather(*self._pending)
+        await self.client.aclose()
+
+    def report(self) -> Dict[str, Any]:
+        return {"target": "http", "sent": self.sent, "requests": len(self.latencies), "throttled": self.throttled,
+                "errors": self.errors, "latency": latency_summary(self.latencies)}
+
+
+class LoadGenerator:
+    """Runs the fleet in real time at a target read rate against a target"""
+
+    def __init__(self, fleet: ReaderFleet, target, read_rate: float, duration: float, tick_interval: float = 0.05):
+        self.fleet = fleet
+        self.target = target
+        self.read_rate = read_rate
+        self.duration = duration
+        self.tick_interval = tick_interval
+
+    async def run(self) -> Dict[str, Any]:
+        await self.target.start()
+        start = time.time()
+        next_tick = start
+        last = start
+        while True:
+            now = time.time()
+            if now - start >= self.duration:
+                break
+            reads = self.fleet.tick(now, now - last if now > last else self.tick_interval, self.read_rate)
+            last = now
+            await self.target.send(reads)
+            next_tick += self.tick_interval
+            await asyncio.sleep(max(0.0, next_tick - time.time()))
+        sent_elapsed = time.time() - start
+        await self.target.close()
+        total_elapsed = time.time() - start
+
+        report = self.target.report()
+        report.update({
+            "readers": len(self.fleet.readers),
+            "tags": self.fleet.total_tags,
+            "target_read_rate": self.read_rate,
+            "achieved_read_rate": round(report["sent"] / sent_elapsed, 1) if sent_elapsed else 0.0,
+            "throughput": round(report["sent"] / total_elapsed, 1) if total_elapsed else 0.0,
+            "duration_seconds": round(total_elapsed, 3),
+            "thefts_simulated": len(self.fleet.stolen),
+            "misplaced_simulated": len(self.fleet.misplaced),
+            "reader_dropouts": self.fleet.dropouts
+        })
+        return report
+
+
+async def _discard(batch: List[TagRead]) -> None:
+    return None
+
+
+async def _main(args) -> Dict[str, Any]:
+    fleet_kwargs = dict(seed=args.seed, miss_rate=args.miss_rate, dropout_rate=args.dropout_rate,
+                        theft_rate=args.theft_rate, misplace_rate=args.misplace_rate)
+    sink: Sink = _discard
+    if args.inventory:
+        from ..Db.db import async_session
+        from ..ingest.pipeline import TagSightingSink
+        async with async_session() as session:
+            fleet = await ReaderFleet.from_database(session, args.inventory, **fleet_kwargs)
+        sink = TagSightingSink(async_session)
+    else:
+        fleet = ReaderFleet.synthetic(args.shelves, args.tags, **fleet_kwargs)
+
+    if args.url:
+        target = HttpTarget(args.url)
+    else:
+        target = PipelineTarget(sink, dedup_window=args.dedup_window)
+    return await LoadGenerator(fleet, target, args.rate, args.duration).run()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Simulated shelf reader fleet and load generator")
+    parser.add_argument("--shelves", type=int, default=100)
+    parser.add_argument("--tags", type=int, default=50, help="Tags per shelf for a synthetic fleet")
+    parser.add_argument("--inventory", help="Build the fleet from the shelves and products of this inventory")
+    parser.add_argument("--url", help="Base URL of a running server, default drives the pipeline in-process")
+    parser.add_argument("--rate", type=float, default=10_000, help="Target raw reads per second")
+    parser.add_argument("--duration", type=float, default=10.0)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--miss-rate", type=float, default=0.05)
+    parser.add_argument("--dropout-rate", type=float, default=0.001)
+    parser.add_argument("--theft-rate", type=float, default=0.0)
+    parser.add_argument("--misplace-rate", type=float, default=0.0)
+    parser.add_argument("--dedup-window", type=float, default=1.0)
+    report = asyncio.run(_main(parser.parse_args()))
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,19 @@
 import datetime
-import hashlib
 import random
-from typing import List, Optional
+from typing import List, Optional, Dict, Any
 
 from sqlmodel.ext.asyncio.session import AsyncSession
 from ..dummy.base_sensor import BaseSensor
-from ..Db.database_management import DatabaseManagement
-from ..Db.models import Product, ShelfInventory, Sale, Shelf, StorageRack
-from sqlmodel import select
+from ..Db.models import Product, ShelfInventory, Sale, ProductStatus
+from ..cache.tag_index import tag_index
+from ..events.bus import event_bus
+from ..manager.warehouse_manager import WarehouseManager
+from ..utils.id_generator import new_id
+from ..utils.log import get_logger
+from sqlmodel import select, update
+
+log = get_logger("sensor")
+
 
 class UHF_RFID(BaseSensor):
     def __init__(self, rfid_tag):
@@ -17,113 +23,109 @@ class UHF_RFID(BaseSensor):
     def set_range(self, meters: Optional[int] = None):
         if meters is not None and meters <= 2:  # Fixed condition
             self.range = meters
-            print(f"Range set to {self.range} meters")
+            log.info("sensor_range_set", sensor_id=self.sensor_id, range_meters=self.range)
 
     async def scan_item(self, session: AsyncSession) -> Optional[Product]:  # Adjusted return type
-        stmt = select(Product).where(Product.rfid_tag == self.sensor_id)
-        result = await session.exec(stmt)
-        product = result.first()
+        # A read is not a status change: the index is only filled through resolve(), which caches the
+        # inventory with the tag and does not notify the change listeners
+        info = await tag_index.resolve(session, self.sensor_id)
+        product = await session.get(Product, info.product_id) if info else None
         if product:
-            print(f"Scanned product: {product}")
+            log.item("tag_scanned", rfid_tag=self.sensor_id, product_id=product.product_id, status=product.status)
         else:
-            print(f"No product found with RFID {self.sensor_id}")
+            log.item("tag_unknown", rfid_tag=self.sensor_id)
         return product
 
     async def mark_as_sold(self, session: AsyncSession):
-        # Step 1: Get the product
-        stmt = select(Product).where(Product.rfid_tag == self.sensor_id)
-        result = await session.exec(stmt)
-        product = result.first()
-        if not product:
-            print(f"No product found with RFID {self.sensor_id} to mark as sold.")
+        # Step 1: Resolve the tag, normally from the in-memory tag index without a query
+        info = await tag_index.resolve(session, self.sensor_id)
+        if not info:
+            log.warning("sale_tag_unknown", rfid_tag=self.sensor_id)
+            return
+        if info.status == ProductStatus.SOLD:
+            log.info("sale_already_sold", product_id=info.product_id)
             return
 
-        # Step 2: Retrieve inventory_id
-        inventory_id = None
-        if product.shelf_id:
-            shelf_stmt = select(Shelf).where(Shelf.shelf_id == product.shelf_id)
-            shelf_result = await session.exec(shelf_stmt)
-            shelf = shelf_result.first()
-            if shelf:
-                rack_stmt = select(StorageRack).where(StorageRack.rack_id == shelf.rack_id)
-                rack_result = await session.exec(rack_stmt)
-                rack = rack_result.first()
-                if rack:
-                    inventory_id = rack.inventory_id
-                else:
-                    print(f"No rack found for shelf {shelf.shelf_id}")
-            else:
-                print(f"No shelf found for shelf_id {product.shelf_id}")
-        else:
-            print(f"Product {product.product_id} has no shelf_id")
-
-        # Step 3: Check if inventory_id was found
+        # Step 2: Check if inventory_id is known
+        inventory_id = info.inventory_id
         if inventory_id is None:
-            print(f"Cannot determine inventory_id for product {product.product_id}. Skipping sale record.")
+            log.warning("sale_inventory_unknown", product_id=info.product_id)
             return
 
-        # Step 4: Generate a unique sale_id
-        sale_hash = hashlib.sha256(
-            (str(datetime.datetime.now()) + product.product_id).encode()
-        ).hexdigest()[:10]
-        sale_id = f"SALE_{sale_hash}"
+        now = datetime.datetime.now()
 
-        # Step 5: Create Sale object with inventory_id
+        # Step 3: Mark the product sold and off its shelf, unless another process sold it meanwhile
+        result = await session.exec(
+            update(Product)
+            .where(Product.product_id == info.product_id, Product.status != ProductStatus.SOLD)
+            .values(status=ProductStatus.SOLD, shelf_id=None)
+        )
+        if result.rowcount == 0:
+            await session.rollback()
+            tag_index.discard(self.sensor_id)
+            log.info("sale_already_sold", product_id=info.product_id)
+            return
+
+        # Step 4: Create Sale object with inventory_id
         sale = Sale(
-            sale_id=sale_id,
-            product_id=product.product_id,
+            sale_id=new_id("SALE"),
+            product_id=info.product_id,
             inventory_id=inventory_id,
-            sale_timestamp=datetime.datetime.now()
+            sale_timestamp=now
         )
         session.add(sale)
 
-        # Step 6: Update product status
-        product.status = "sold"  # Adjust if ProductStatus enum is used
-        session.add(product)
-
-        # Step 7: Update ShelfInventory
-        shelf_inv_stmt = select(ShelfInventory).where(
-            ShelfInventory.product_id == product.product_id,
-            ShelfInventory.removed_timestamp.is_(None)
+        # Step 5: Close the ShelfInventory interval
+        await session.exec(
+            update(ShelfInventory)
+            .where(ShelfInventory.product_id == info.product_id, ShelfInventory.removed_timestamp.is_(None))
+            .values(removed_timestamp=now)
         )
-        shelf_inv_result = await session.exec(shelf_inv_stmt)
-        shelf_item = shelf_inv_result.first()
-        if shelf_item:
-            shelf_item.removed_timestamp = datetime.datetime.now()
-            session.add(shelf_item)
 
-        # Step 8: Commit all changes
+        # Step 6: Commit all changes
         await session.commit()
-        print(f"Item {self.sensor_id} marked as sold by sensor {self.sensor_id}")
+        tag_index.update(self.sensor_id, info.product_id, ProductStatus.SOLD, None, inventory_id)
+        event_bus.publish("sale", inventory_id, {"products": [
+            {"product_id": info.product_id, "rfid_tag": self.sensor_id}
+        ]})
+        log.info("product_sold", product_id=info.product_id, rfid_tag=self.sensor_id, inventory_id=inventory_id)
+
+    @staticmethod
+    async def checkout(session: AsyncSession, rfid_tags: List[str], inventory_id: Optional[str] = None) -> Dict[str, Any]:
+        """Mark every tag read at a gate or POS as sold in one transaction"""
+        return await WarehouseManager(session).checkout_products(rfid_tags=rfid_tags, inventory_id=inventory_id)
 
     async def is_sold(self, session: AsyncSession) -> bool:
-        product = await self.scan_item(session=session)
-        return product.status == "sold" if product else False
+        info = await tag_index.resolve(session, self.sensor_id)
+        return info.status == ProductStatus.SOLD if info else False
 
     async def scan_shelf(self, session: AsyncSession, shelf_id: str) -> List[str]:
-        db = DatabaseManagement(session)
-        stmt = select(ShelfInventory).where(
-            ShelfInventory.shelf_id == shelf_id,
-            ShelfInventory.removed_timestamp.is_(None)  # Only unsold products
+        # Products with an open interval on the shelf that are still on it, in one query
+        stmt = (
+            select(Product.product_id, Product.rfid_tag)
+            .join(ShelfInventory, ShelfInventory.product_id == Product.product_id)
+            .where(
+                ShelfInventory.shelf_id == shelf_id,
+                ShelfInventory.removed_timestamp.is_(None),
+                Product.status == ProductStatus.ON_SHELF
+            )
         )
-        result = await session.exec(stmt)
-        shelf_items = result.all()
+        shelf_items = (await session.exec(stmt)).all()
 
         detected_rfids = []
-        for item in shelf_items:
-            product = await db.search(Product, all_results=False, product_id=item.product_id)
-            if product and product.status == "available":
-                # Simulate RFID detection with a chance of "missing" (theft or scan failure)
-                if random.random() > 0.2:  # 80% chance of detection
-                    detected_rfids.append(product.rfid_tag)
-                    print(f"Detected on shelf {shelf_id}: {product.product_id}, RFID: {product.rfid_tag}")
-                else:
-                    print(f"Simulated missing: {product.product_id}, RFID: {product.rfid_tag}")
+        for product_id, rfid_tag in shelf_items:
+            # Simulate RFID detection with a chance of "missing" (theft or scan failure)
+            if random.random() > 0.2:  # 80% chance of detection
+                detected_rfids.append(rfid_tag)
+                log.item("tag_detected", shelf_id=shelf_id, product_id=product_id, rfid_tag=rfid_tag)
+            else:
+                log.item("tag_missed", shelf_id=shelf_id, product_id=product_id, rfid_tag=rfid_tag)
 
+        log.info("shelf_read", shelf_id=shelf_id, expected=len(shelf_items), detected=len(detected_rfids))
         return detected_rfids
 
     async def read_sensor(self, session: AsyncSession) -> dict:
-        product = await self.scan_item(session=session)
-        status = product.status if product else None
-        print(f"Reading sensor {self.sensor_id}: Status = {status}, Range = {self.range} meters")
+        info = await tag_index.resolve(session, self.sensor_id)
+        status = info.status if info else None
+        log.item("sensor_read", sensor_id=self.sensor_id, status=status, range_meters=self.range)
         return {"id": self.sensor_id, "status": status, "range": self.range}
\ No newline at end of file
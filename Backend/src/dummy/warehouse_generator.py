@@ -0,0 +1,257 @@
+"""
+Seeded generator of synthetic warehouses for benchmarks: inventories with racks and shelves, stocked by
+suppliers through received receipts, with a history of shelf scans, sales and thefts, all bulk loaded.
+
+Every random choice (names, prices, RFID tags, which products sell or go missing and when) comes from the
+seed, so the same spec and seed give the same warehouse shape. IDs come from the usual ID generator.
+"""
+import datetime
+import random
+from typing import Optional, Dict, List, Any, NamedTuple
+
+from sqlalchemy import func
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config.Settings import settings
+from ..Db.database_management import DatabaseManagement
+from ..Db.models import InventoryOwner, Inventory, Supplier, InventorySupplier, StorageRack, Shelf, Product, \
+    SupplierReceipt, SupplierReceiptItem, InventoryReceipt, InventoryReceiptItem, ShelfInventory, Sale, ShelfScan, \
+    ShelfScanItem, ShelfScanDelta, ShelfScanChange, ProductStatus
+from ..manager.warehouse_manager import make_rack_id, make_shelf_id, section_name
+from ..utils.id_generator import new_id, new_ids
+
+PRODUCT_NAMES = ["Widget A", "Widget B", "Gadget X", "Gadget Y", "Tool Y", "Tool Z", "Sensor Kit", "Cable Pack"]
+GENERATED_TABLES = [InventoryOwner, Inventory, Supplier, InventorySupplier, StorageRack, Shelf, Product,
+                    SupplierReceipt, SupplierReceiptItem, InventoryReceipt, InventoryReceiptItem, ShelfInventory,
+                    Sale, ShelfScan, ShelfScanItem, ShelfScanDelta, ShelfScanChange]
+
+
+class WarehouseSpec(NamedTuple):
+    """Size of a generated warehouse, counts other than inventories are per inventory"""
+    inventories: int = 1
+    racks: int = 4
+    shelves_per_rack: int = 5
+    products: int = 500  # Stocked on the shelves at the start of the history
+    suppliers: int = 2
+    scans_per_shelf: int = 6
+    sales: int = 50
+    thefts: int = 5
+    backlog: int = 50  # Received but not placed on a shelf yet
+    pending_receipts: int = 5  # Supplier receipts not received yet
+    receipt_size: int = 20
+    history_days: int = 30
+
+
+SCALES = {
+    "small": WarehouseSpec(),
+    "medium": WarehouseSpec(inventories=2, racks=10, shelves_per_rack=10, products=5_000, suppliers=4,
+                            scans_per_shelf=12, sales=500, thefts=25, backlog=200, pending_receipts=10),
+    "large": WarehouseSpec(inventories=2, racks=20, shelves_per_rack=10, products=20_000, suppliers=8,
+                           scans_per_shelf=24, sales=2_000, thefts=100, backlog=500, pending_receipts=10,
+                           receipt_size=50)
+}
+
+
+class GeneratedInventory:
+    """IDs of what was generated for one inventory, for picking benchmark arguments"""
+
+    def __init__(self, inventory_id: str, spec: WarehouseSpec):
+        self.inventory_id = inventory_id
+        self.spec = spec
+        self.supplier_ids: List[str] = []
+        self.shelf_ids: List[str] = []
+        self.on_shelf: List[str] = []  # Product IDs
+        self.shelf_of: Dict[str, str] = {}  # Product ID -> shelf ID of the products on a shelf
+        self.tags: Dict[str, str] = {}  # Product ID -> RFID tag
+        self.backlog: List[str] = []
+        self.sold: List[str] = []
+        self.missing: List[str] = []
+        self.pending_receipts: List[str] = []
+        self.latest_scans: Dict[str, str] = {}  # Shelf ID -> ID of its latest scan
+
+
+class WarehouseGenerator:
+    def __init__(self, session: AsyncSession, spec: WarehouseSpec = WarehouseSpec(), seed: int = 0,
+                 checkpoint_interval: Optional[int] = None, batch_size: int = 5_000):
+        self.session = session
+        self.db = DatabaseManagement(session)
+        self.spec = spec
+        self.rng = random.Random(seed)
+        self.checkpoint_interval = checkpoint_interval or settings.SCAN_CHECKPOINT_INTERVAL
+        self.batch_size = batch_size
+        self._rows: Dict[type, List[Dict[str, Any]]] = {}
+
+    def _add(self, model, row: Dict[str, Any]) -> None:
+        self._rows.setdefault(model, []).append(row)
+
+    async def _flush(self) -> None:
+        """Bulk insert the collected rows, parents before children"""
+        for model in GENERATED_TABLES:
+            rows = self._rows.pop(model, [])
+            for start in range(0, len(rows), self.batch_size):
+                await self.db.bulk_insert(model, rows[start:start + self.batch_size], auto_commit=False)
+        await self.session.commit()
+
+    def _tag(self) -> str:
+        return f"RFID_{self.rng.getrandbits(128):032x}"
+
+    def _products(self, count: int, supplier_ids: List[str], status: ProductStatus) -> List[Dict[str, Any]]:
+        rng = self.rng
+        products = []
+        for product_id in new_ids("PRODUCT", count):
+            product = {"product_id": product_id, "rfid_tag": self._tag(), "product_name": rng.choice(PRODUCT_NAMES),
+                       "status": status, "supplier_id": rng.choice(supplier_ids), "shelf_id": None,
+                       "price": float(rng.randint(50, 1000)), "receipt_id": None}
+            products.append(product)
+        return products
+
+    def _receipts(self, inventory_id: str, products: List[Dict[str, Any]], sent: datetime.datetime,
+                  received: Optional[datetime.datetime]) -> List[str]:
+        """One supplier receipt per supplier of the products, received into the inventory when received is set"""
+        by_supplier: Dict[str, List[Dict[str, Any]]] = {}
+        for product in products:
+            by_supplier.setdefault(product["supplier_id"], []).append(product)
+        receipt_ids = []
+        for supplier_id, supplied in by_supplier.items():
+            receipt_id = new_id("SR")
+            receipt_ids.append(receipt_id)
+            self._add(SupplierReceipt, {"receipt_id": receipt_id, "supplier_id": supplier_id,
+                                        "inventory_id": inventory_id, "date_sent": sent,
+                                        "total_products_sent": len(supplied)})
+            for product, item_id in zip(supplied, new_ids("SRI", len(supplied))):
+                product["receipt_id"] = receipt_id
+                self._add(SupplierReceiptItem, {"receipt_item_id": item_id, "receipt_id": receipt_id,
+                                                "product_id": product["product_id"]})
+            if received is not None:
+                inventory_receipt_id = new_id("IR")
+                self._add(InventoryReceipt, {"receipt_id": inventory_receipt_id, "supplier_receipt_id": receipt_id,
+                                             "inventory_id": inventory_id, "date_received": received,
+                                             "total_products_received": len(supplied)})
+                for product, item_id in zip(supplied, new_ids("IRI", len(supplied))):
+                    self._add(InventoryReceiptItem, {"receipt_item_id": item_id, "receipt_id": inventory_receipt_id,
+                                                     "product_id": product["product_id"]})
+        return receipt_ids
+
+    def _scan_history(self, shelf_id: str, products: List[Dict[str, Any]], removed_at: Dict[str, datetime.datetime],
+                      start: datetime.datetime, end: datetime.datetime) -> str:
+        """
+        Scans of a shelf evenly spread over the history, in the ScanStore format: a checkpoint listing what was
+        found every checkpoint_interval scans, deltas with the products gone since the previous scan between
+        """
+        scans = self.spec.scans_per_shelf
+        step = (end - start) / scans
+        scan_ids = new_ids("SCAN", scans)
+        present = {product["product_id"] for product in products}
+        checkpoint_id = None
+        for number, scan_id in enumerate(scan_ids):
+            scanned_at = start + step * (number + 1)
+            gone = [product_id for product_id in present if removed_at.get(product_id, end) <= scanned_at]
+            present.difference_update(gone)
+            self._add(ShelfScan, {"scan_id": scan_id, "shelf_id": shelf_id, "scan_timestamp": scanned_at})
+            depth = number % self.checkpoint_interval
+            if depth == 0:
+                checkpoint_id = scan_id
+                for product_id, item_id in zip(present, new_ids("SCANITEM", len(present))):
+                    self._add(ShelfScanItem, {"scan_item_id": item_id, "scan_id": scan_id, "product_id": product_id})
+                continue
+            self._add(ShelfScanDelta, {"scan_id": scan_id, "base_scan_id": scan_ids[number - 1],
+                                       "checkpoint_scan_id": checkpoint_id, "depth": depth})
+            for product_id, change_id in zip(gone, new_ids("SCANCHG", len(gone))):
+                self._add(ShelfScanChange, {"change_id": change_id, "scan_id": scan_id, "product_id": product_id,
+                                            "added": False})
+        return scan_ids[-1]
+
+    async def generate_inventory(self, number: int) -> GeneratedInventory:
+        spec = self.spec
+        rng = self.rng
+        end = datetime.datetime.now().replace(microsecond=0)
+        start = end - datetime.timedelta(days=spec.history_days)
+        inventory_id = new_id("INV")
+        generated = GeneratedInventory(inventory_id, spec)
+
+        owner_id = new_id("OWNER")
+        self._add(InventoryOwner, {"owner_id": owner_id, "owner_name": f"Generated Owner {number}"})
+        self._add(Inventory, {"inventory_id": inventory_id, "owner_id": owner_id,
+                              "location": f"Generated Warehouse {number}", "previous_theft_count": spec.thefts})
+        for supplier_number, supplier_id in enumerate(new_ids("SUP", spec.suppliers), start=1):
+            generated.supplier_ids.append(supplier_id)
+            self._add(Supplier, {"supplier_id": supplier_id, "supplier_name": f"Supplier {number}-{supplier_number}"})
+            self._add(InventorySupplier, {"inventory_supplier_id": new_id("IS"), "inventory_id": inventory_id,
+                                          "supplier_id": supplier_id})
+        for rack_number in range(1, spec.racks + 1):
+            rack_id = make_rack_id(inventory_id, rack_number)
+            self._add(StorageRack, {"rack_id": rack_id, "inventory_id": inventory_id,
+                                    "rack_location": f"Section {section_name(rack_number)}"})
+            for shelf_number in range(1, spec.shelves_per_rack + 1):
+                shelf_id = make_shelf_id(inventory_id, rack_number, shelf_number)
+                generated.shelf_ids.append(shelf_id)
+                self._add(Shelf, {"shelf_id": shelf_id, "rack_id": rack_id, "shelf_location": f"Level {shelf_number}"})
+
+        # Initial stock, received the day before the history starts and spread over the shelves
+        stock = self._products(spec.products, generated.supplier_ids, ProductStatus.ON_SHELF)
+        self._receipts(inventory_id, stock, start - datetime.timedelta(days=2), start - datetime.timedelta(days=1))
+        on_shelf: Dict[str, List[Dict[str, Any]]] = {shelf_id: [] for shelf_id in generated.shelf_ids}
+        for product in stock:
+            product["shelf_id"] = rng.choice(generated.shelf_ids) if generated.shelf_ids else None
+            if product["shelf_id"]:
+                on_shelf[product["shelf_id"]].append(product)
+
+        # Sales and thefts during the history, each product leaves its shelf at a random time
+        placed = [product for product in stock if product["shelf_id"]]
+        leaving = rng.sample(placed, min(len(placed), spec.sales + spec.thefts))
+        removed_at: Dict[str, datetime.datetime] = {}
+        for index, product in enumerate(leaving):
+            left_at = start + (end - start) * rng.random()
+            removed_at[product["product_id"]] = left_at
+            if index < spec.sales:
+                product["status"] = ProductStatus.SOLD
+                self._add(Sale, {"sale_id": new_id("SALE"), "product_id": product["product_id"],
+                                 "inventory_id": inventory_id, "sale_timestamp": left_at})
+            else:
+                product["status"] = ProductStatus.MISSING
+
+        for product, shelf_inventory_id in zip(placed, new_ids("SI", len(placed))):
+            self._add(ShelfInventory, {"shelf_inventory_id": shelf_inventory_id, "shelf_id": product["shelf_id"],
+                                       "product_id": product["product_id"], "added_timestamp": start,
+                                       "removed_timestamp": removed_at.get(product["product_id"])})
+        if spec.scans_per_shelf:
+            for shelf_id, products in on_shelf.items():
+                generated.latest_scans[shelf_id] = self._scan_history(shelf_id, products, removed_at, start, end)
+
+        for product in stock:
+            if product["status"] == ProductStatus.SOLD:
+                product["shelf_id"] = None  # As record_product_sale leaves them
+                generated.sold.append(product["product_id"])
+            elif product["status"] == ProductStatus.MISSING:
+                generated.missing.append(product["product_id"])
+            elif product["shelf_id"]:
+                generated.on_shelf.append(product["product_id"])
+                generated.shelf_of[product["product_id"]] = product["shelf_id"]
+
+        # Received products waiting to be placed, and receipts still with the suppliers
+        backlog = self._products(spec.backlog, generated.supplier_ids, ProductStatus.OUT_SHELF)
+        self._receipts(inventory_id, backlog, end - datetime.timedelta(days=1), end)
+        generated.backlog = [product["product_id"] for product in backlog]
+        pending = []
+        for _ in range(spec.pending_receipts):
+            products = self._products(spec.receipt_size, generated.supplier_ids[:1], ProductStatus.WITH_SUPPLIER)
+            generated.pending_receipts.extend(self._receipts(inventory_id, products, end, None))
+            pending.extend(products)
+
+        for product in stock + backlog + pending:
+            generated.tags[product["product_id"]] = product["rfid_tag"]
+            self._add(Product, product)
+        await self._flush()
+        return generated
+
+    async def generate(self) -> List[GeneratedInventory]:
+        return [await self.generate_inventory(number) for number in range(1, self.spec.inventories + 1)]
+
+
+async def count_rows(session: AsyncSession, models: Optional[List[type]] = None) -> Dict[str, int]:
+    """Rows of each table, by table name"""
+    counts = {}
+    for model in models or GENERATED_TABLES:
+        counts[model.__tablename__] = (await session.exec(select(func.count()).select_from(model))).one()
+    return counts
@@ -0,0 +1,152 @@
+import asyncio
+import datetime
+import json
+from collections import deque
+from typing import Optional, Dict, List, Set, Any, NamedTuple
+
+from fastapi.encoders import jsonable_encoder
+
+from ..config.Settings import settings
+from ..utils.id_generator import new_id
+
+
+class Event(NamedTuple):
+    event_id: Optional[str]  # Time ordered, so IDs compare in publish order across restarts too
+    event_type: str
+    inventory_id: Optional[str]
+    data: Dict[str, Any]
+    frame: bytes  # The event as a Server-Sent Events message, built once for every subscriber
+
+
+def sse_frame(event_id: Optional[str], event_type: str, data: Any) -> bytes:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append("data: " + json.dumps(jsonable_encoder(data), separators=(",", ":")))
+    return ("\n".join(lines) + "\n\n").encode("utf-8")
+
+
+class Subscription:
+    """
+    Events of one inventory (or all of them) for one client. At most buffer_size events wait for the
+    client; a client that falls further behind is dropped: its subscription closes once the buffered
+    events are delivered and it can reconnect with Last-Event-ID to catch up from the bus history.
+    """
+
+    def __init__(self, inventory_id: Optional[str], buffer_size: int):
+        self.inventory_id = inventory_id
+        self.buffer_size = buffer_size
+        self._buffer: deque = deque()
+        self._ready = asyncio.Event()
+        self.closed = False
+        self.dropped = False
+
+    def push(self, event: Event) -> bool:
+        if self.closed:
+            return False
+        if len(self._buffer) >= self.buffer_size:
+            self.dropped = True
+            self.close()
+            return False
+        self._buffer.append(event)
+        self._ready.set()
+        return True
+
+    def close(self) -> None:
+        self.closed = True
+        self._ready.set()
+
+    async def next(self, timeout: Optional[float] = None) -> Optional[Event]:
+        """Next event, None after timeout seconds without one; raises StopAsyncIteration once closed"""
+        while not self._buffer:
+            if self.closed:
+                raise StopAsyncIteration
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), timeout)
+            except asyncio.TimeoutError:
+                return None
+        return self._buffer.popleft()
+
+
+class EventBus:
+    """
+    In-process publish/subscribe of inventory events (thefts, missing products, sales, placements, moves).
+    The last history_size events are kept so a reconnecting client resumes after the last event it saw.
+    Publishing never waits on subscribers.
+    """
+
+    def __init__(self, history_size: int = 10_000, buffer_size: int = 1_000):
+        self.buffer_size = buffer_size
+        self._history: deque = deque(maxlen=history_size)
+        # Events up to this ID are not in the history: evicted, or published before this process started
+        self._floor = new_id("EVT")
+        self._subscribers: Dict[Optional[str], Set[Subscription]] = {}
+        self.published = 0
+        self.dropped = 0
+
+    def publish(self, event_type: str, inventory_id: Optional[str], data: Dict[str, Any]) -> Event:
+        event_id = new_id("EVT")
+        payload = {"type": event_type, "inventory_id": inventory_id,
+                   "timestamp": datetime.datetime.now().isoformat(), **data}
+        event = Event(event_id, event_type, inventory_id, payload, sse_frame(event_id, event_type, payload))
+        if len(self._history) == self._history.maxlen:
+            self._floor = self._history[0].event_id
+        self._history.append(event)
+        self.published += 1
+        for key in (inventory_id, None) if inventory_id is not None else (None,):
+            subscribers = self._subscribers.get(key)
+            if not subscribers:
+                continue
+            for subscription in list(subscribers):
+                if not subscription.push(event):
+                    subscribers.discard(subscription)
+                    if subscription.dropped:
+                        self.dropped += 1
+        return event
+
+    def subscribe(self, inventory_id: Optional[str] = None, last_event_id: Optional[str] = None,
+                  buffer_size: Optional[int] = None) -> Subscription:
+        """
+        Subscribe to an inventory's events, or to every event without one. With last_event_id the events
+        published after it are queued first; when those are no longer in the history the subscription
+        starts with a "reset" event telling the client to reload its state.
+        """
+        subscription = Subscription(inventory_id, buffer_size or self.buffer_size)
+        if last_event_id:
+            missed = self.since(last_event_id, inventory_id)
+            if missed is None:
+                reset = {"type": "reset", "inventory_id": inventory_id, "last_event_id": last_event_id}
+                subscription.push(Event(None, "reset", inventory_id, reset, sse_frame(None, "reset", reset)))
+                missed = []
+            for event in missed[-subscription.buffer_size:]:
+                subscription.push(event)
+        self._subscribers.setdefault(inventory_id, set()).add(subscription)
+        return subscription
+
+    def since(self, last_event_id: Optional[str], inventory_id: Optional[str] = None) -> Optional[List[Event]]:
+        """Events after last_event_id, None when events after it may have left the history already"""
+        if last_event_id is not None and last_event_id < self._floor:
+            return None
+        return [
+            event for event in self._history
+            if (last_event_id is None or event.event_id > last_event_id)
+            and (inventory_id is None or event.inventory_id == inventory_id)
+        ]
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        subscription.close()
+        subscribers = self._subscribers.get(subscription.inventory_id)
+        if subscribers is not None:
+            subscribers.discard(subscription)
+            if not subscribers:
+                del self._subscribers[subscription.inventory_id]
+
+    def stats(self) -> Dict[str, int]:
+        return {"published": self.published, "history": len(self._history),
+                "subscribers": sum(len(subscribers) for subscribers in self._subscribers.values()),
+                "dropped": self.dropped}
+
+
+event_bus = EventBus(settings.EVENT_HISTORY_SIZE, settings.EVENT_SUBSCRIBER_BUFFER)
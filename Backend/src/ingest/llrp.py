@@ -0,0 +1,388 @@
+"""
+TCP endpoint for fixed readers speaking a subset of LLRP (EPCglobal Low Level Reader Protocol 1.0.1).
+
+Readers connect to us (reader initiated connections) and open with a READER_EVENT_NOTIFICATION holding a
+ConnectionAttemptEvent and an Identification parameter with the reader ID, which is the shelf ID unless
+reader_shelves maps it. After that they stream RO_ACCESS_REPORTs and mark the end of every inventory round
+with a ROSpecEvent. We send KEEPALIVEs and drop readers that stop answering.
+
+All integers are big endian. Messages start with u16 version/type, u32 length (header included) and
+u32 message ID. Parameters are either TLV (u16 type, u16 length) or TV (u8 with the high bit set, fixed
+size value). Only the parameters used below are understood, unknown TLV parameters are skipped.
+"""
+import asyncio
+import struct
+import time
+from typing import Optional, Dict, List, Tuple, Iterable, Set
+
+from .pipeline import ReadPipeline, TagRead
+from .reconcile import ScanReconciler
+from ..utils.epc import tag_to_epc, epc_to_tag
+from ..utils.log import get_logger
+
+log = get_logger("llrp")
+
+VERSION = 1
+DEFAULT_PORT = 5084
+
+# Message types
+CLOSE_CONNECTION_RESPONSE = 4
+CLOSE_CONNECTION = 14
+RO_ACCESS_REPORT = 61
+KEEPALIVE = 62
+READER_EVENT_NOTIFICATION = 63
+KEEPALIVE_ACK = 72
+
+# TLV parameter types
+UTC_TIMESTAMP = 128
+IDENTIFICATION = 218
+TAG_REPORT_DATA = 240
+EPC_DATA = 241
+READER_EVENT_NOTIFICATION_DATA = 246
+RO_SPEC_EVENT = 249
+CONNECTION_ATTEMPT_EVENT = 256
+LLRP_STATUS = 287
+
+# TV parameter types and their value sizes
+ANTENNA_ID = 1
+FIRST_SEEN_TIMESTAMP_UTC = 2
+PEAK_RSSI = 6
+EPC_96 = 13
+TV_SIZES = {1: 2, 2: 8, 3: 8, 4: 8, 5: 8, 6: 1, 7: 2, 8: 2, 9: 4, 10: 2, 11: 2, 12: 2, 13: 12, 14: 2, 15: 2, 16: 4}
+
+ROSPEC_STARTED = 0
+ROSPEC_ENDED = 1
+
+MESSAGE_HEADER = struct.Struct(">HII")
+PARAM_HEADER = struct.Struct(">HH")
+U16 = struct.Struct(">H")
+U32 = struct.Struct(">I")
+U64 = struct.Struct(">Q")
+I8 = struct.Struct(">b")
+MAX_MESSAGE_SIZE = 1 << 20
+
+
+class ProtocolError(ValueError):
+    pass
+
+
+def encode_param(param_type: int, value: bytes) -> bytes:
+    return PARAM_HEADER.pack(param_type, PARAM_HEADER.size + len(value)) + value
+
+
+def encode_message(message_type: int, message_id: int, body: bytes = b"") -> bytes:
+    return MESSAGE_HEADER.pack((VERSION << 10) | message_type, MESSAGE_HEADER.size + len(body), message_id) + body
+
+
+def _tv(param_type: int, value: bytes) -> bytes:
+    return bytes((0x80 | param_type,)) + value
+
+
+def encode_tag_report(rfid_tag: str, timestamp: float, rssi: Optional[float] = None, antenna_id: int = 1) -> bytes:
+    epc = tag_to_epc(rfid_tag)
+    parts = [encode_param(EPC_DATA, U16.pack(len(epc) * 8) + epc), _tv(ANTENNA_ID, U16.pack(antenna_id))]
+    if rssi is not None:
+        parts.append(_tv(PEAK_RSSI, I8.pack(max(-128, min(127, int(round(rssi)))))))
+    parts.append(_tv(FIRST_SEEN_TIMESTAMP_UTC, U64.pack(int(timestamp * 1_000_000))))
+    return encode_param(TAG_REPORT_DATA, b"".join(parts))
+
+
+def encode_ro_access_report(message_id: int, reads: Iterable[TagRead]) -> bytes:
+    return encode_message(RO_ACCESS_REPORT, message_id,
+                          b"".join(encode_tag_report(read.rfid_tag, read.timestamp, read.rssi) for read in reads))
+
+
+def _event(message_id: int, timestamp: float, event: bytes) -> bytes:
+    data = encode_param(UTC_TIMESTAMP, U64.pack(int(timestamp * 1_000_000))) + event
+    return encode_message(READER_EVENT_NOTIFICATION, message_id, encode_param(READER_EVENT_NOTIFICATION_DATA, data))
+
+
+def encode_connection_event(message_id: int, reader_id: str, timestamp: float) -> bytes:
+    encoded_id = reader_id.encode()
+    identification = encode_param(IDENTIFICATION, bytes((1,)) + U16.pack(len(encoded_id)) + encoded_id)
+    return _event(message_id, timestamp, encode_param(CONNECTION_ATTEMPT_EVENT, U16.pack(0)) + identification)
+
+
+def encode_rospec_event(message_id: int, event_type: int, rospec_id: int, timestamp: float) -> bytes:
+    return _event(message_id, timestamp,
+                  encode_param(RO_SPEC_EVENT, bytes((event_type,)) + U32.pack(rospec_id) + U32.pack(0)))
+
+
+def encode_close_response(message_id: int) -> bytes:
+    return encode_message(CLOSE_CONNECTION_RESPONSE, message_id, encode_param(LLRP_STATUS, U16.pack(0) + U16.pack(0)))
+
+
+def _iter_tlv(data: memoryview, offset: int, end: int) -> Iterable[Tuple[int, int, int]]:
+    """(type, value start, value end) of the TLV parameters in data[offset:end]"""
+    while offset < end:
+        if end - offset < PARAM_HEADER.size:
+            raise ProtocolError("Truncated parameter header")
+        param_type, length = PARAM_HEADER.unpack_from(data, offset)
+        if length < PARAM_HEADER.size or offset + length > end:
+            raise ProtocolError(f"Bad length {length} for parameter {param_type & 0x3FF}")
+        yield param_type & 0x3FF, offset + PARAM_HEADER.size, offset + length
+        offset += length
+
+
+def decode_tag_reports(body: memoryview, reader_id: str, received_at: float) -> List[TagRead]:
+    reads = []
+    for param_type, start, end in _iter_tlv(body, 0, len(body)):
+        if param_type != TAG_REPORT_DATA:
+            continue
+        epc = None
+        rssi = None
+        timestamp = received_at
+        offset = start
+        while offset < end:
+            first = body[offset]
+            if first & 0x80:
+                tv_type = first & 0x7F
+                size = TV_SIZES.get(tv_type)
+                if size is None or offset + 1 + size > end:
+                    raise ProtocolError(f"Unknown or truncated TV parameter {tv_type}")
+                value = offset + 1
+                if tv_type == EPC_96:
+                    epc = body[value:value + 12]
+                elif tv_type == PEAK_RSSI:
+                    rssi = float(I8.unpack_from(body, value)[0])
+                elif tv_type == FIRST_SEEN_TIMESTAMP_UTC:
+                    timestamp = U64.unpack_from(body, value)[0] / 1_000_000
+                offset = value + size
+            else:
+                if end - offset < PARAM_HEADER.size:
+                    raise ProtocolError("Truncated parameter header")
+                tlv_type, length = PARAM_HEADER.unpack_from(body, offset)
+                if length < PARAM_HEADER.size or offset + length > end:
+                    raise ProtocolError(f"Bad length {length} for parameter {tlv_type & 0x3FF}")
+                if tlv_type & 0x3FF == EPC_DATA:
+                    bits = U16.unpack_from(body, offset + PARAM_HEADER.size)[0]
+                    value = offset + PARAM_HEADER.size + U16.size
+                    epc = body[value:value + (bits + 7) // 8]
+                offset += length
+        if epc is not None:
+            reads.append(TagRead(reader_id, epc_to_tag(epc), timestamp, rssi))
+    return reads
+
+
+def decode_reader_event(body: memoryview) -> Dict[str, object]:
+    """The parts of a READER_EVENT_NOTIFICATION we act on"""
+    event: Dict[str, object] = {}
+    for param_type, start, end in _iter_tlv(body, 0, len(body)):
+        if param_type != READER_EVENT_NOTIFICATION_DATA:
+            continue
+        for inner_type, value, inner_end in _iter_tlv(body, start, end):
+            if inner_type == UTC_TIMESTAMP:
+                event["timestamp"] = U64.unpack_from(body, value)[0] / 1_000_000
+            elif inner_type == CONNECTION_ATTEMPT_EVENT:
+                event["connection_status"] = U16.unpack_from(body, value)[0]
+            elif inner_type == IDENTIFICATION:
+                length = U16.unpack_from(body, value + 1)[0]
+                event["reader_id"] = bytes(body[value + 3:value + 3 + length]).decode()
+            elif inner_type == RO_SPEC_EVENT:
+                event["rospec_event"] = body[value]
+                event["rospec_id"] = U32.unpack_from(body, value + 1)[0]
+    return event
+
+
+class ReaderConnection(asyncio.BufferedProtocol):
+    """
+    One connected reader. Bytes are received straight into a per-connection buffer that is reused for
+    every message and only grows when a single message does not fit. Reads go into the pipeline while
+    they fit; otherwise reading from the socket pauses until the backlog has been submitted, so a fast
+    reader is slowed down by TCP instead of growing memory.
+    """
+
+    def __init__(self, server: "LLRPReaderServer", buffer_size: int = 64 * 1024):
+        self.server = server
+        self.reader_id: Optional[str] = None
+        self.transport: Optional[asyncio.Transport] = None
+        self._buffer = bytearray(buffer_size)
+        self._end = 0
+        self._round: Set[str] = set()
+        self._backlog: List[TagRead] = []
+        self._draining: Optional[asyncio.Task] = None
+        self._keepalive: Optional[asyncio.TimerHandle] = None
+        self._message_id = 0
+        self.last_seen = 0.0
+        self.paused = False
+
+    def connection_made(self, transport: asyncio.Transport) -> None:
+        self.transport = transport
+        self.last_seen = time.monotonic()
+        self._schedule_keepalive()
+
+    def get_buffer(self, sizehint: int) -> memoryview:
+        if self._end == len(self._buffer):
+            # Only reached when one message is larger than the buffer
+            grown = bytearray(len(self._buffer) * 2)
+            grown[:self._end] = self._buffer[:self._end]
+            self._buffer = grown
+        return memoryview(self._buffer)[self._end:]
+
+    def buffer_updated(self, nbytes: int) -> None:
+        self._end += nbytes
+        self.last_seen = time.monotonic()
+        try:
+            self._parse()
+        except (ProtocolError, struct.error, UnicodeDecodeError) as e:
+            self.server.protocol_errors += 1
+            log.warning("llrp_protocol_error", reader_id=self.reader_id, error=str(e))
+            self.transport.abort()
+
+    def _parse(self) -> None:
+        buffer = self._buffer
+        view = memoryview(buffer)
+        offset = 0
+        end = self._end
+        while end - offset >= MESSAGE_HEADER.size:
+            version_type, length, message_id = MESSAGE_HEADER.unpack_from(buffer, offset)
+            if length < MESSAGE_HEADER.size or length > MAX_MESSAGE_SIZE:
+                raise ProtocolError(f"Bad message length {length}")
+            if end - offset < length:
+                break
+            self._handle(version_type & 0x3FF, message_id, view[offset + MESSAGE_HEADER.size:offset + length])
+            offset += length
+        view.release()
+        if offset:
+            # Keep a partial message at the start of the buffer for the next recv
+            remaining = end - offset
+            buffer[:remaining] = buffer[offset:end]
+            self._end = remaining
+
+    def _handle(self, message_type: int, message_id: int, body: memoryview) -> None:
+        if message_type == RO_ACCESS_REPORT:
+            if self.reader_id is None:
+                raise ProtocolError("Tag report before the reader identified itself")
+            reads = decode_tag_reports(body, self.reader_id, time.time())
+            self.server.reports += 1
+            self.server.reads += len(reads)
+            self._round.update(read.rfid_tag for read in reads)
+            self._deliver(reads)
+        elif message_type == READER_EVENT_NOTIFICATION:
+            event = decode_reader_event(body)
+            if "reader_id" in event:
+                self.reader_id = event["reader_id"]
+                self.server.register(self)
+            if event.get("rospec_event") == ROSPEC_ENDED and self.reader_id is not None:
+                self.server.round_completed(self.reader_id, self._round, event.get("timestamp", time.time()))
+                self._round = set()
+            elif event.get("rospec_event") == ROSPEC_STARTED:
+                self._round = set()
+        elif message_type == CLOSE_CONNECTION:
+            self.transport.write(encode_close_response(message_id))
+            self.transport.close()
+
+    def _deliver(self, reads: List[TagRead]) -> None:
+        pipeline = self.server.pipeline
+        if self._draining is None and pipeline.depth + len(reads) <= pipeline.max_queue_size:
+            pipeline.offer(reads)
+            return
+        self._backlog.extend(reads)
+        if not self.paused:
+            self.paused = True
+            self.server.pauses += 1
+            self.transport.pause_reading()
+        if self._draining is None:
+            self._draining = asyncio.create_task(self._drain())
+
+    async def _drain(self) -> None:
+        try:
+            while self._backlog:
+                backlog, self._backlog = self._backlog, []
+                await self.server.pipeline.submit(backlog)
+        finally:
+            self._draining = None
+            if self.paused and not self.transport.is_closing():
+                self.paused = False
+                self.transport.resume_reading()
+
+    def _schedule_keepalive(self) -> None:
+        interval = self.server.keepalive_interval
+        if interval:
+            self._keepalive = asyncio.get_running_loop().call_later(interval, self._send_keepalive)
+
+    def _send_keepalive(self) -> None:
+        # A paused connection is quiet because of us, not because the reader is gone
+        if not self.paused and time.monotonic() - self.last_seen > self.server.keepalive_interval * 3:
+            log.warning("llrp_reader_timed_out", reader_id=self.reader_id)
+            self.transport.abort()
+            return
+        self._message_id += 1
+        self.transport.write(encode_message(KEEPALIVE, self._message_id))
+        self._schedule_keepalive()
+
+    def connection_lost(self, exc: Optional[Exception]) -> None:
+        if self._keepalive:
+            self._keepalive.cancel()
+        self.server.unregister(self)
+
+    def close(self) -> None:
+        if self.transport and not self.transport.is_closing():
+            self.transport.close()
+
+
+class LLRPReaderServer:
+    """
+    Accepts reader connections and feeds their reads into the same ReadPipeline as the HTTP endpoint.
+    Completed inventory rounds are handed to the reconciler, if any, which runs the managers' shelf scan.
+    A reader that reconnects replaces its previous connection, the unfinished round of the old one is dropped.
+    """
+
+    def __init__(self, pipeline: ReadPipeline, host: str = "127.0.0.1", port: int = DEFAULT_PORT,
+                 reconciler: Optional[ScanReconciler] = None, keepalive_interval: float = 30.0):
+        self.pipeline = pipeline
+        self.host = host
+        self.port = port
+        self.reconciler = reconciler
+        self.keepalive_interval = keepalive_interval
+        self.connections: Dict[str, ReaderConnection] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+
+        self.reconnects = 0
+        self.reports = 0
+        self.reads = 0
+        self.rounds = 0
+        self.pauses = 0
+        self.protocol_errors = 0
+
+    async def start(self) -> None:
+        loop = asyncio.get_running_loop()
+        self._server = await loop.create_server(lambda: ReaderConnection(self), self.host, self.port)
+        # Port 0 picks a free port
+        self.port = self._server.sockets[0].getsockname()[1]
+        log.info("llrp_listening", host=self.host, port=self.port)
+
+    async def stop(self) -> None:
+        if self._server:
+            self._server.close()
+            for connection in list(self.connections.values()):
+                connection.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    def register(self, connection: ReaderConnection) -> None:
+        previous = self.connections.get(connection.reader_id)
+        if previous is not None and previous is not connection:
+            self.reconnects += 1
+            previous.close()
+        self.connections[connection.reader_id] = connection
+
+    def unregister(self, connection: ReaderConnection) -> None:
+        if connection.reader_id is not None and self.connections.get(connection.reader_id) is connection:
+            del self.connections[connection.reader_id]
+
+    def round_completed(self, reader_id: str, tags: Set[str], timestamp: float) -> None:
+        self.rounds += 1
+        if self.reconciler is not None:
+            self.reconciler.submit(reader_id, tags, timestamp)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "connected": len(self.connections),
+            "reconnects": self.reconnects,
+            "reports": self.reports,
+            "reads": self.reads,
+            "rounds": self.rounds,
+            "pauses": self.pauses,
+            "protocol_errors": self.protocol_errors
+        }
@@ -0,0 +1,220 @@
+import asyncio
+from collections import deque
+from typing import Optional, List, Dict, Tuple, Callable, Awaitable, Iterable, AsyncIterable, NamedTuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..cache.tag_index import tag_index
+from ..cache.missing_buffer import missing_buffer
+from ..utils.background import BackgroundTask
+from ..utils.log import get_logger
+
+log = get_logger("ingest")
+
+
+class TagRead(NamedTuple):
+    reader_id: str
+    rfid_tag: str
+    timestamp: float  # Seconds since epoch as reported by the reader
+    rssi: Optional[float] = None
+
+
+Sink = Callable[[List[TagRead]], Awaitable[None]]
+
+
+class ReadPipeline:
+    """
+    Bounded, deduplicating queue between reader adapters and the database.
+    A (reader, tag) pair seen again within dedup_window seconds is dropped before it is queued.
+    Reads are handed to the sink in micro-batches of batch_size or every flush_interval seconds.
+    Producers either await submit() which waits for space, or use offer() and back off when it
+    accepts less than it was given or when backpressure is True.
+    """
+
+    def __init__(self, sink: Sink, max_queue_size: int = 100_000, dedup_window: float = 1.0,
+                 batch_size: int = 2_000, flush_interval: float = 0.25, high_watermark: float = 0.8,
+                 tap: Optional[Callable[[List[TagRead]], None]] = None):
+        self.sink = sink
+        # Sees every raw read before dedup, used to capture reader traffic
+        self.tap = tap
+        self.max_queue_size = max_queue_size
+        self.dedup_window = dedup_window
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self.high_watermark = int(max_queue_size * high_watermark)
+
+        self._queue: deque = deque()
+        self._last_seen: Dict[Tuple[str, str], float] = {}
+        self._newest_timestamp = 0.0
+        self._pruned_at = 0.0
+        self._ready = asyncio.Event()
+        self._space = asyncio.Event()
+        self._space.set()
+        self._task = BackgroundTask(self._run)
+
+        self.received = 0
+        self.duplicates = 0
+        self.rejected = 0
+        self.flushed = 0
+        self.batches = 0
+        self.sink_errors = 0
+
+    @property
+    def depth(self) -> int:
+        return len(self._queue)
+
+    @property
+    def backpressure(self) -> bool:
+        return len(self._queue) >= self.high_watermark
+
+    def offer(self, reads: Iterable[TagRead]) -> int:
+        """Queue reads without waiting, returns how many were accepted; reads that do not fit are rejected"""
+        if self.tap is not None:
+            reads = list(reads)
+            self.tap(reads)
+        return self._enqueue(reads, reject_when_full=True)
+
+    async def submit(self, reads: List[TagRead]) -> None:
+        """Queue reads, waiting for space while the queue is full"""
+        if self.tap is not None:
+            self.tap(reads)
+        start = 0
+        while start < len(reads):
+            await self._space.wait()
+            start += self._enqueue(reads[start:] if start else reads, reject_when_full=False)
+
+    def _enqueue(self, reads: Iterable[TagRead], reject_when_full: bool) -> int:
+        """Dedup and queue reads, returns how many were consumed (duplicates included)"""
+        queue = self._queue
+        last_seen = self._last_seen
+        window = self.dedup_window
+        max_size = self.max_queue_size
+        was_empty = not queue
+        newest = self._newest_timestamp
+        consumed = 0
+
+        for read in reads:
+            key = (read.reader_id, read.rfid_tag)
+            timestamp = read.timestamp
+            previous = last_seen.get(key)
+            if previous is not None and timestamp - previous < window:
+                self.duplicates += 1
+            elif len(queue) < max_size:
+                last_seen[key] = timestamp
+                if timestamp > newest:
+                    newest = timestamp
+                queue.append(read)
+            elif reject_when_full:
+                self.rejected += 1
+                self.received += 1
+                continue
+            else:
+                break
+            self.received += 1
+            consumed += 1
+
+        self._newest_timestamp = newest
+        if queue and (was_empty or len(queue) >= self.batch_size):
+            self._ready.set()
+        if len(queue) >= max_size:
+            self._space.clear()
+        if newest - self._pruned_at > window * 10:
+            self._prune()
+        return consumed
+
+    async def feed(self, source: AsyncIterable[List[TagRead]]) -> None:
+        """Drain a reader adapter that yields lists of reads"""
+        async for reads in source:
+            await self.submit(reads)
+
+    def _prune(self) -> None:
+        cutoff = self._newest_timestamp - self.dedup_window
+        self._last_seen = {key: seen for key, seen in self._last_seen.items() if seen >= cutoff}
+        self._pruned_at = self._newest_timestamp
+
+    async def _next_batch(self) -> List[TagRead]:
+        loop = asyncio.get_running_loop()
+        while not self._queue:
+            self._ready.clear()
+            await self._ready.wait()
+
+        deadline = loop.time() + self.flush_interval
+        while len(self._queue) < self.batch_size:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                break
+            self._ready.clear()
+            try:
+                await asyncio.wait_for(self._ready.wait(), remaining)
+            except asyncio.TimeoutError:
+                break
+
+        queue = self._queue
+        batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+        if len(queue) < self.max_queue_size:
+            self._space.set()
+        return batch
+
+    async def _flush(self, batch: List[TagRead]) -> None:
+        try:
+            await self.sink(batch)
+            self.flushed += len(batch)
+            self.batches += 1
+        except Exception as e:
+            self.sink_errors += 1
+            log.error("read_pipeline_sink_failed", reads=len(batch), error=str(e))
+
+    async def _run(self) -> None:
+        while True:
+            batch = await self._next_batch()
+            await self._flush(batch)
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self, drain: bool = True) -> None:
+        await self._task.stop()
+        while drain and self._queue:
+            queue = self._queue
+            await self._flush([queue.popleft() for _ in range(min(self.batch_size, len(queue)))])
+        self._space.set()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "received": self.received,
+            "duplicates": self.duplicates,
+            "rejected": self.rejected,
+            "queued": len(self._queue),
+            "flushed": self.flushed,
+            "batches": self.batches,
+            "sink_errors": self.sink_errors
+        }
+
+
+class TagSightingSink:
+    """
+    Pipeline sink that resolves the tags of a micro-batch through the tag index (one IN query for misses) and
+    marks the products read as seen, which clears their missing suspicions. A micro-batch is only part of
+    what a reader sees, so nothing is stored as a scan here: complete inventory rounds are stored through
+    ScanReconciler and WarehouseManager.scan_shelf.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession]):
+        self.session_factory = session_factory
+        self.unknown_tags = 0
+        self.seen = 0
+
+    async def __call__(self, batch: List[TagRead]) -> None:
+        async with self.session_factory() as session:
+            resolved = await tag_index.resolve_many(session, list({read.rfid_tag for read in batch}))
+
+        seen = set()
+        for read in batch:
+            info = resolved.get(read.rfid_tag)
+            if info is None:
+                self.unknown_tags += 1
+                continue
+            seen.add(info.product_id)
+        if seen:
+            missing_buffer.seen(seen)
+            self.seen += len(seen)
@@ -0,0 +1,237 @@
+"""
+Compact append-only binary log of raw reader traffic.
+
+File layout: an 8 byte header (b"TBRL" + u32 version) followed by blocks of
+    u32 payload length | u32 record count | zlib payload
+A payload starts with the reader IDs and tags first seen in this block (u32 count, then u16 length + UTF-8
+bytes for each), followed by fixed 18 byte records: f64 timestamp, u32 reader index, u32 tag index,
+i16 RSSI x 10. Readers and tags are numbered in order of first appearance across the whole file.
+"""
+import mmap
+import os
+import queue
+import struct
+import threading
+import zlib
+from typing import Iterator, List, Dict, Iterable
+
+from .pipeline import TagRead
+from ..utils.log import get_logger
+
+log = get_logger("ingest")
+
+MAGIC = b"TBRL"
+VERSION = 1
+HEADER = struct.Struct("<4sI")
+BLOCK_HEADER = struct.Struct("<II")
+RECORD = struct.Struct("<dIIh")
+STRING_LENGTH = struct.Struct("<H")
+COUNT = struct.Struct("<I")
+NO_RSSI = -32768
+
+
+def _pack_strings(strings: List[str]) -> bytes:
+    parts = [COUNT.pack(len(strings))]
+    for value in strings:
+        encoded = value.encode()
+        parts.append(STRING_LENGTH.pack(len(encoded)))
+        parts.append(encoded)
+    return b"".join(parts)
+
+
+def _unpack_strings(payload: bytes, offset: int):
+    (count,) = COUNT.unpack_from(payload, offset)
+    offset += COUNT.size
+    strings = []
+    for _ in range(count):
+        (length,) = STRING_LENGTH.unpack_from(payload, offset)
+        offset += STRING_LENGTH.size
+        strings.append(bytes(payload[offset:offset + length]).decode())
+        offset += length
+    return strings, offset
+
+
+class ReadLogWriter:
+    """Streams reads into a log file, one compressed block every block_size reads"""
+
+    def __init__(self, path: str, block_size: int = 8192, compression_level: int = 6):
+        self.path = path
+        self.block_size = block_size
+        self.compression_level = compression_level
+        self._readers: Dict[str, int] = {}
+        self._tags: Dict[str, int] = {}
+        self._new_readers: List[str] = []
+        self._new_tags: List[str] = []
+        self._records: List[bytes] = []
+        self.reads_written = 0
+
+        if os.path.exists(path) and os.path.getsize(path) > 0:
+            # Appending continues the numbering of readers and tags already in the file
+            with ReadLogReader(path) as existing:
+                readers, tags = existing.scan_dictionaries()
+                end = existing.valid_end()
+            self._readers = {reader_id: index for index, reader_id in enumerate(readers)}
+            self._tags = {tag: index for index, tag in enumerate(tags)}
+            self._file = open(path, "r+b")
+            # Drop a block that was cut off by a crash before appending after it
+            self._file.truncate(end)
+            self._file.seek(end)
+        else:
+            self._file = open(path, "wb")
+            self._file.write(HEADER.pack(MAGIC, VERSION))
+
+    def _index(self, mapping: Dict[str, int], new: List[str], value: str) -> int:
+        index = mapping.get(value)
+        if index is None:
+            index = mapping[value] = len(mapping)
+            new.append(value)
+        return index
+
+    def write(self, read: TagRead) -> None:
+        reader_index = self._index(self._readers, self._new_readers, read.reader_id)
+        tag_index = self._index(self._tags, self._new_tags, read.rfid_tag)
+        rssi = NO_RSSI if read.rssi is None else max(-32767, min(32767, int(round(read.rssi * 10))))
+        self._records.append(RECORD.pack(read.timestamp, reader_index, tag_index, rssi))
+        if len(self._records) >= self.block_size:
+            self.flush()
+
+    def write_many(self, reads: Iterable[TagRead]) -> None:
+        for read in reads:
+            self.write(read)
+
+    def flush(self) -> None:
+        if not self._records:
+            return
+        payload = (_pack_strings(self._new_readers) + _pack_strings(self._new_tags) + b"".join(self._records))
+        compressed = zlib.compress(payload, self.compression_level)
+        self._file.write(BLOCK_HEADER.pack(len(compressed), len(self._records)))
+        self._file.write(compressed)
+        self._file.flush()
+        self.reads_written += len(self._records)
+        self._records = []
+        self._new_readers = []
+        self._new_tags = []
+
+    def close(self) -> None:
+        self.flush()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReadLogReader:
+    """Memory-maps a log and decodes it block by block"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._file = open(path, "rb")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version = HEADER.unpack_from(self._map, 0)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{path} is not a version {VERSION} read log")
+        self.readers: List[str] = []
+        self.tags: List[str] = []
+
+    def _blocks(self) -> Iterator[tuple]:
+        offset = HEADER.size
+        size = len(self._map)
+        while offset + BLOCK_HEADER.size <= size:
+            length, count = BLOCK_HEADER.unpack_from(self._map, offset)
+            start = offset + BLOCK_HEADER.size
+            if start + length > size:
+                break  # Partially written last block
+            yield start, length, count
+            offset = start + length
+
+    def valid_end(self) -> int:
+        """Offset just after the last complete block"""
+        end = HEADER.size
+        for start, length, _ in self._blocks():
+            end = start + length
+        return end
+
+    def _decode(self, start: int, length: int):
+        payload = zlib.decompress(self._map[start:start + length])
+        new_readers, offset = _unpack_strings(payload, 0)
+        new_tags, offset = _unpack_strings(payload, offset)
+        self.readers.extend(new_readers)
+        self.tags.extend(new_tags)
+        return payload, offset
+
+    def scan_dictionaries(self):
+        """Read every block to learn all reader IDs and tags"""
+        self.readers, self.tags = [], []
+        for start, length, _ in self._blocks():
+            self._decode(start, length)
+        return self.readers, self.tags
+
+    def iter_blocks(self) -> Iterator[List[TagRead]]:
+        self.readers, self.tags = [], []
+        readers, tags = self.readers, self.tags
+        for start, length, _ in self._blocks():
+            payload, offset = self._decode(start, length)
+            yield [
+                TagRead(readers[reader_index], tags[tag_index], timestamp, None if rssi == NO_RSSI else rssi / 10)
+                for timestamp, reader_index, tag_index, rssi in RECORD.iter_unpack(memoryview(payload)[offset:])
+            ]
+
+    def __iter__(self) -> Iterator[TagRead]:
+        for block in self.iter_blocks():
+            yield from block
+
+    def count(self) -> int:
+        return sum(count for _, _, count in self._blocks())
+
+    def close(self) -> None:
+        self._map.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class ReadCapture:
+    """
+    Pipeline tap that records every raw read it is given. The tap runs on the event loop, so it only queues
+    the reads; a writer thread packs, compresses and writes the blocks. A full queue drops the reads.
+    """
+
+    def __init__(self, path: str, block_size: int = 8192, queue_size: int = 10_000):
+        self.writer = ReadLogWriter(path, block_size=block_size)
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread = threading.Thread(target=self._run, name="ReadCapture", daemon=True)
+        self._thread.start()
+        self.dropped = 0
+        self.failed = 0
+
+    def __call__(self, reads: List[TagRead]) -> None:
+        try:
+            self._queue.put_nowait(reads)
+        except queue.Full:
+            self.dropped += len(reads)
+
+    def _run(self) -> None:
+        while True:
+            reads = self._queue.get()
+            if reads is None:
+                return
+            try:
+                self.writer.write_many(reads)
+            except Exception as e:
+                self.failed += len(reads)
+                log.warning("read_capture_failed", reads=len(reads), error=str(e))
+
+    def close(self) -> None:
+        """Write what is queued and close the log"""
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.writer.close()
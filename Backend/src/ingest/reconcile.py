@@ -0,0 +1,79 @@
+import asyncio
+import datetime
+from typing import Optional, Dict, Set, Tuple, Callable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..manager.warehouse_manager import WarehouseManager
+from ..utils.background import BackgroundTask
+from ..utils.log import get_logger
+
+log = get_logger("ingest")
+
+
+class ScanReconciler:
+    """
+    Reconciles completed reader inventory rounds against the shelves through WarehouseManager.scan_shelf,
+    the same path a manual scan takes. Rounds are queued per shelf and only the newest pending round of a
+    shelf is kept, so a slow database delays reconciliation instead of growing a backlog.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession],
+                 reader_shelves: Optional[Dict[str, str]] = None):
+        self.session_factory = session_factory
+        self.reader_shelves = reader_shelves or {}
+        self._pending: Dict[str, Tuple[Set[str], float]] = {}
+        self._ready = asyncio.Event()
+        self._task = BackgroundTask(self._run)
+
+        self.submitted = 0
+        self.superseded = 0
+        self.reconciled = 0
+        self.errors = 0
+
+    def submit(self, reader_id: str, tags: Set[str], timestamp: float) -> None:
+        shelf_id = self.reader_shelves.get(reader_id, reader_id)
+        if shelf_id in self._pending:
+            self.superseded += 1
+        self._pending[shelf_id] = (tags, timestamp)
+        self.submitted += 1
+        self._ready.set()
+
+    async def _reconcile_pending(self) -> None:
+        pending, self._pending = self._pending, {}
+        async with self.session_factory() as session:
+            manager = WarehouseManager(session)
+            for shelf_id, (tags, timestamp) in pending.items():
+                try:
+                    await manager.scan_shelf(shelf_id, detected_tags=tags,
+                                             scan_timestamp=datetime.datetime.fromtimestamp(timestamp),
+                                             with_products=False)
+                    self.reconciled += 1
+                except Exception as e:
+                    # A failed flush leaves the session unusable for the remaining shelves until rolled back
+                    await session.rollback()
+                    self.errors += 1
+                    log.error("shelf_reconcile_failed", shelf_id=shelf_id, error=str(e))
+
+    async def _run(self) -> None:
+        while True:
+            await self._ready.wait()
+            self._ready.clear()
+            await self._reconcile_pending()
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self, drain: bool = True) -> None:
+        await self._task.stop()
+        if drain and self._pending:
+            await self._reconcile_pending()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+            "reconciled": self.reconciled,
+            "pending": len(self._pending),
+            "errors": self.errors
+        }
@@ -0,0 +1,159 @@
+"""
+Replays a captured read log through the scan and sale paths.
+
+    python -m src.ingest.replay capture.tbrl --speed 10 --gate GATE_1 --out run.json
+    python -m src.ingest.replay capture.tbrl --max --compare run.json
+
+Shelf reader reads are grouped per reader into scan windows of --scan-interval seconds (log time) and passed
+to WarehouseManager.scan_shelf; reads of --gate readers are sold through UHF_RFID.mark_as_sold.
+Replaying changes product statuses, so run it against a scratch copy of the database.
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import time
+from typing import Optional, Dict, Set, Iterable, Callable, Any, List
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .read_log import ReadLogReader
+from ..cache.shelf_state import shelf_state
+from ..cache.missing_buffer import missing_buffer
+from ..dummy.uhf_rfid import UHF_RFID
+from ..manager.warehouse_manager import WarehouseManager
+
+
+class ReadReplayer:
+    """speed is a multiple of real time, None replays as fast as possible"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], speed: Optional[float] = 1.0,
+                 scan_interval: float = 60.0, gate_readers: Iterable[str] = (),
+                 reader_shelves: Optional[Dict[str, str]] = None):
+        self.session_factory = session_factory
+        self.speed = speed
+        self.scan_interval = scan_interval
+        self.gate_readers = set(gate_readers)
+        self.reader_shelves = reader_shelves or {}
+
+    async def _scan(self, manager: WarehouseManager, shelf_id: str, tags: Set[str], end: float,
+                    thefts: Set[str]) -> None:
+        expected = await shelf_state.get_expected(manager.session, shelf_id)
+        await manager.scan_shelf(shelf_id, detected_tags=tags, scan_timestamp=datetime.datetime.fromtimestamp(end),
+                                 with_products=False)
+        # Missed tags only count once the scan confirmed them and they left the shelf
+        remaining = await shelf_state.get_expected(manager.session, shelf_id)
+        thefts.update(tag for tag in expected if tag not in tags and tag not in remaining)
+
+    async def replay(self, log_path: str) -> Dict[str, Any]:
+        reads = 0
+        scans = 0
+        sold: Set[str] = set()
+        thefts: Set[str] = set()
+        windows: Dict[str, List] = {}  # shelf_id -> [window start, last read, tags]
+
+        async with self.session_factory() as session:
+            manager = WarehouseManager(session)
+            wall_start = time.perf_counter()
+            log_start = None
+            with ReadLogReader(log_path) as log:
+                for block in log.iter_blocks():
+                    for read in block:
+                        reads += 1
+                        if log_start is None:
+                            log_start = read.timestamp
+                        if self.speed:
+                            ahead = (read.timestamp - log_start) / self.speed - (time.perf_counter() - wall_start)
+                            if ahead > 0.001:
+                                await asyncio.sleep(ahead)
+
+                        if read.reader_id in self.gate_readers:
+                            if read.rfid_tag not in sold:
+                                sold.add(read.rfid_tag)
+                                await UHF_RFID(read.rfid_tag).mark_as_sold(session)
+                            continue
+
+                        shelf_id = self.reader_shelves.get(read.reader_id, read.reader_id)
+                        window = windows.get(shelf_id)
+                        if window and read.timestamp - window[0] >= self.scan_interval:
+                            await self._scan(manager, shelf_id, window[2], window[1], thefts)
+                            scans += 1
+                            window = None
+                        if window is None:
+                            window = windows[shelf_id] = [read.timestamp, read.timestamp, set()]
+                        window[1] = read.timestamp
+                        window[2].add(read.rfid_tag)
+
+                for shelf_id, (_, last, tags) in windows.items():
+                    await self._scan(manager, shelf_id, tags, last, thefts)
+                    scans += 1
+            elapsed = time.perf_counter() - wall_start
+
+        return {
+            "log": log_path,
+            "speed": self.speed or "max",
+            "reads": reads,
+            "scans": scans,
+            "sales": len(sold),
+            "elapsed_seconds": round(elapsed, 3),
+            "throughput_reads_per_second": round(reads / elapsed, 1) if elapsed else 0.0,
+            "thefts_detected": len(thefts),
+            "theft_tags": sorted(thefts)
+        }
+
+
+def compare_reports(baseline: Dict[str, Any], current: Dict[str, Any]) -> Dict[str, Any]:
+    """Thefts detected in only one of two replays of the same log"""
+    before = set(baseline.get("theft_tags", []))
+    after = set(current.get("theft_tags", []))
+    return {
+        "new_thefts": sorted(after - before),
+        "no_longer_detected": sorted(before - after),
+        "throughput_change": round(
+            current["throughput_reads_per_second"] / max(baseline["throughput_reads_per_second"], 1e-9), 3)
+    }
+
+
+async def _main(args) -> Dict[str, Any]:
+    from ..Db.db import async_session
+    if args.confirm_scans:
+        missing_buffer.confirm_scans = args.confirm_scans
+    replayer = ReadReplayer(async_session, speed=None if args.max else args.speed,
+                            scan_interval=args.scan_interval, gate_readers=args.gate)
+    report = await replayer.replay(args.log)
+    if args.compare:
+        with open(args.compare) as baseline_file:
+            report["diff"] = compare_reports(json.load(baseline_file), report)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a captured read log")
+    parser.add_argument("log")
+    parser.add_argument("--speed", type=float, default=1.0, help="Multiple of real time")
+    parser.add_argument("--max", action="store_true", help="Replay as fast as possible")
+    parser.add_argument("--scan-interval", type=float, default=60.0, help="Seconds of reads per shelf scan")
+    parser.add_argument("--gate", action="append", default=[], help="Reader ID of an exit gate or POS")
+    parser.add_argument("--confirm-scans", type=int,
+                        help="Consecutive missed scans before a product is reported, default MISSING_CONFIRM_SCANS")
+    parser.add_argument("--compare", help="Report JSON of an earlier run to diff detected thefts against")
+    parser.add_argument("--out", help="Write the report JSON here")
+    parser.add_argument("--info", action="store_true", help="Only print what the log contains")
+    args = parser.parse_args()
+
+    if args.info:
+        with ReadLogReader(args.log) as log:
+            readers, tags = log.scan_dictionaries()
+            print(json.dumps({"reads": log.count(), "readers": len(readers), "tags": len(tags)}, indent=2))
+        return
+
+    report = asyncio.run(_main(args))
+    if args.out:
+        with open(args.out, "w") as out_file:
+            json.dump(report, out_file, indent=2)
+    summary = {key: value for key, value in report.items() if key != "theft_tags"}
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,163 @@
+from typing import Optional, Dict, List, Callable, Iterable, Any
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .pipeline import TagRead, Sink
+from ..cache.tag_index import tag_index, TagInfo
+from ..Db.models import ProductStatus
+from ..manager.warehouse_manager import WarehouseManager, ProductMove
+
+NO_RSSI = float("-inf")
+STRATEGIES = ("rssi", "reads")
+
+
+class LocationResolver:
+    """
+    Most likely shelf of every tag heard within a window of reads from many readers. Each shelf whose
+    reader heard a tag keeps its read count and strongest RSSI; strategy "rssi" picks the strongest signal
+    (read count breaks ties) and "reads" the shelf that read the tag most often (RSSI breaks ties).
+    A shelf needs at least min_reads reads of a tag to be picked. Reads of ignore_readers (exit gates,
+    handhelds) say nothing about shelves and are dropped.
+    """
+
+    def __init__(self, reader_shelves: Optional[Dict[str, str]] = None, strategy: str = "reads",
+                 min_reads: int = 2, ignore_readers: Iterable[str] = ()):
+        if strategy not in STRATEGIES:
+            raise ValueError(f"Unknown strategy {strategy}, use one of {', '.join(STRATEGIES)}")
+        self.reader_shelves = reader_shelves or {}
+        self.strategy = strategy
+        self.min_reads = min_reads
+        self.ignore_readers = set(ignore_readers)
+        self._heard: Dict[str, Dict[str, List]] = {}  # rfid_tag -> shelf_id -> [reads, strongest rssi]
+        self.window_start: Optional[float] = None
+        self.window_end: Optional[float] = None
+        self.reads = 0
+
+    def __len__(self) -> int:
+        return len(self._heard)
+
+    def add(self, reads: Iterable[TagRead]) -> None:
+        heard = self._heard
+        reader_shelves = self.reader_shelves
+        ignore = self.ignore_readers
+        start = self.window_start
+        end = self.window_end
+        count = 0
+        for read in reads:
+            if read.reader_id in ignore:
+                continue
+            shelf_id = reader_shelves.get(read.reader_id, read.reader_id)
+            rssi = NO_RSSI if read.rssi is None else read.rssi
+            shelves = heard.get(read.rfid_tag)
+            if shelves is None:
+                heard[read.rfid_tag] = {shelf_id: [1, rssi]}
+            else:
+                entry = shelves.get(shelf_id)
+                if entry is None:
+                    shelves[shelf_id] = [1, rssi]
+                else:
+                    entry[0] += 1
+                    if rssi > entry[1]:
+                        entry[1] = rssi
+            if start is None or read.timestamp < start:
+                start = read.timestamp
+            if end is None or read.timestamp > end:
+                end = read.timestamp
+            count += 1
+        self.window_start = start
+        self.window_end = end
+        self.reads += count
+
+    @property
+    def window_seconds(self) -> float:
+        if self.window_start is None:
+            return 0.0
+        return self.window_end - self.window_start
+
+    def locate(self) -> Dict[str, str]:
+        """rfid_tag -> shelf_id of every tag with a shelf that read it at least min_reads times"""
+        min_reads = self.min_reads
+        if self.strategy == "rssi":
+            rank = lambda item: (item[1][1], item[1][0])
+        else:
+            rank = lambda item: (item[1][0], item[1][1])
+        locations = {}
+        for tag, shelves in self._heard.items():
+            if len(shelves) == 1:
+                shelf_id, (reads, _) = next(iter(shelves.items()))
+                if reads >= min_reads:
+                    locations[tag] = shelf_id
+                continue
+            candidates = [item for item in shelves.items() if item[1][0] >= min_reads]
+            if candidates:
+                locations[tag] = max(candidates, key=rank)[0]
+        return locations
+
+    @staticmethod
+    def plan_moves(locations: Dict[str, str], resolved: Dict[str, TagInfo]) -> List[ProductMove]:
+        """
+        Moves for products located somewhere other than their shelf, and for missing products that were
+        heard again. Products in any other status are left to their own flows.
+        """
+        moves = []
+        for tag, shelf_id in locations.items():
+            info = resolved.get(tag)
+            if info is None:
+                continue
+            if (info.status == ProductStatus.ON_SHELF and info.shelf_id != shelf_id) \
+                    or info.status == ProductStatus.MISSING:
+                moves.append(ProductMove(tag, info.product_id, info.shelf_id, shelf_id, info.status))
+        return moves
+
+    def reset(self) -> None:
+        self._heard = {}
+        self.window_start = None
+        self.window_end = None
+        self.reads = 0
+
+
+class RelocationSink:
+    """
+    Pipeline sink that passes every batch on to another sink and feeds it to a LocationResolver.
+    Once the reads span window_seconds (reader time) the window is resolved: tags go through the tag index
+    and the moves are applied with WarehouseManager.move_products, then a new window starts.
+    """
+
+    def __init__(self, sink: Sink, session_factory: Callable[[], AsyncSession],
+                 resolver: Optional[LocationResolver] = None, window_seconds: float = 30.0):
+        self.sink = sink
+        self.session_factory = session_factory
+        self.resolver = resolver if resolver is not None else LocationResolver()
+        self.window_seconds = window_seconds
+        self.windows = 0
+        self.moves = 0
+        self.skipped = 0
+        self.failed = 0
+
+    async def __call__(self, batch: List[TagRead]) -> None:
+        self.resolver.add(batch)
+        await self.sink(batch)
+        if self.resolver.window_seconds >= self.window_seconds:
+            await self.flush()
+
+    async def flush(self) -> List[ProductMove]:
+        """Resolve the current window and apply its moves"""
+        locations = self.resolver.locate()
+        self.resolver.reset()
+        self.windows += 1
+        if not locations:
+            return []
+        async with self.session_factory() as session:
+            resolved = await tag_index.resolve_many(session, list(locations))
+            moves = LocationResolver.plan_moves(locations, resolved)
+            if not moves:
+                return []
+            result = await WarehouseManager(session).move_products(moves)
+        self.moves += len(result["moved"])
+        self.skipped += len(result["skipped"])
+        self.failed += len(result["failed"])
+        return result["moved"]
+
+    def stats(self) -> Dict[str, Any]:
+        return {"windows": self.windows, "moves": self.moves, "skipped": self.skipped,
+                "failed": self.failed, "tags_in_window": len(self.resolver), "reads_in_window": self.resolver.reads}
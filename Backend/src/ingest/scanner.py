@@ -0,0 +1,120 @@
+import datetime
+from typing import Dict, Any, Iterable, Callable
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..cache.tag_index import tag_index
+from ..cache.shelf_state import shelf_state
+from ..cache.missing_buffer import missing_buffer
+from ..Db.database_management import DatabaseManagement
+from ..Db.models import Shelf
+from ..manager.scan_store import ScanStore
+from ..manager.warehouse_manager import WarehouseManager
+from ..utils.log import get_logger
+
+log = get_logger("ingest")
+
+
+class ShelfScanSession:
+    """
+    Incremental reconciliation of a handheld scan of one shelf. Tags are added in batches and every batch
+    returns what it changed: expected products found, products that belong somewhere else and unknown tags.
+    Nothing is written until complete(), which stores the scan through the ScanStore in one commit and
+    reports the expected products that were never seen as missing once the missing buffer confirms them.
+    A handheld scan can take minutes, so every step opens its own short session instead of holding a
+    pooled connection for the whole scan.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], shelf_id: str):
+        self.session_factory = session_factory
+        self.shelf_id = shelf_id
+        self.started_at = datetime.datetime.now()
+        self.expected: Dict[str, str] = {}  # rfid_tag -> product_id
+        self.found: Dict[str, str] = {}
+        self.misplaced: Dict[str, Dict[str, Any]] = {}
+        self.unknown: set = set()
+        self.completed = False
+
+    async def start(self) -> Dict[str, Any]:
+        async with self.session_factory() as session:
+            shelf = await DatabaseManagement(session).search(Shelf, all_results=False, shelf_id=self.shelf_id)
+            if not shelf:
+                raise ValueError(f"Shelf {self.shelf_id} not found")
+            self.expected = await shelf_state.get_expected(session, self.shelf_id)
+        return {"type": "started", "shelf_id": self.shelf_id, "expected": len(self.expected)}
+
+    def _progress(self) -> Dict[str, int]:
+        return {
+            "found_total": len(self.found),
+            "missing_total": len(self.expected) - len(self.found),
+            "misplaced_total": len(self.misplaced),
+            "unknown_total": len(self.unknown)
+        }
+
+    async def add(self, rfid_tags: Iterable[str]) -> Dict[str, Any]:
+        """Reconcile a batch of tags, tags already seen in this session are ignored"""
+        if self.completed:
+            raise ValueError("Scan already completed")
+        found = []
+        others = []
+        for tag in dict.fromkeys(rfid_tags):
+            if tag in self.found or tag in self.misplaced or tag in self.unknown:
+                continue
+            product_id = self.expected.get(tag)
+            if product_id is not None:
+                self.found[tag] = product_id
+                found.append(tag)
+            else:
+                others.append(tag)
+
+        misplaced = []
+        unknown = []
+        if others:
+            async with self.session_factory() as session:
+                resolved = await tag_index.resolve_many(session, others)
+            for tag in others:
+                info = resolved.get(tag)
+                if info is None:
+                    self.unknown.add(tag)
+                    unknown.append(tag)
+                    continue
+                entry = {"rfid_tag": tag, "product_id": info.product_id, "status": info.status.value,
+                         "home_shelf_id": info.shelf_id}
+                self.misplaced[tag] = entry
+                misplaced.append(entry)
+
+        return {"type": "progress", "found": found, "misplaced": misplaced, "unknown": unknown, **self._progress()}
+
+    async def complete(self, report_missing: bool = True) -> Dict[str, Any]:
+        """Store the scan in one commit with every detected product, found or misplaced"""
+        if self.completed:
+            raise ValueError("Scan already completed")
+        self.completed = True
+        product_ids = list(self.found.values()) + [entry["product_id"] for entry in self.misplaced.values()]
+        missing = [
+            {"rfid_tag": tag, "product_id": product_id}
+            for tag, product_id in self.expected.items() if tag not in self.found
+        ]
+        confirmed = []
+        async with self.session_factory() as session:
+            scan = await ScanStore(session).record_scan(self.shelf_id, product_ids)
+            scan_id = scan.scan_id
+            if report_missing:
+                confirmed = missing_buffer.observe(self.shelf_id, scan_id, [item["product_id"] for item in missing],
+                                                   product_ids, scan.scan_timestamp)
+                manager = WarehouseManager(session)
+                for product_id in confirmed:
+                    await manager.report_missing_product(product_id)
+
+        log.info("handheld_scan_completed", shelf_id=self.shelf_id, scan_id=scan_id, found=len(self.found),
+                 missing=len(missing), misplaced=len(self.misplaced))
+        return {
+            "type": "complete",
+            "scan_id": scan_id,
+            "shelf_id": self.shelf_id,
+            "missing": missing,
+            "confirmed_missing": confirmed,
+            "misplaced": list(self.misplaced.values()),
+            "duration_seconds": round((datetime.datetime.now() - self.started_at).total_seconds(), 3),
+            **self._progress()
+        }
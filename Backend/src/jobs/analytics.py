@@ -0,0 +1,105 @@
+import asyncio
+import datetime
+from typing import Optional, Dict, List, Callable, Any
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..Db.models import Inventory
+from ..manager.theft_detection_manager import TheftDetectionManager
+from ..manager.warehouse_manager import WarehouseManager
+from ..utils.background import PeriodicTask
+from ..utils.log import get_logger
+from .runner import JobRunner, Job
+
+log = get_logger("jobs")
+
+PREVENTION_PLAN = "prevention_plan"
+THEFT_PATTERNS = "theft_patterns"
+THEFT_STATISTICS = "theft_statistics"
+FLEET_STATISTICS = "fleet_statistics"
+
+
+async def prevention_plan_job(session: AsyncSession, params: Dict[str, Any]) -> Dict[str, Any]:
+    return await TheftDetectionManager(session).generate_theft_prevention_plan(params["inventory_id"])
+
+
+async def theft_patterns_job(session: AsyncSession, params: Dict[str, Any]) -> Dict[str, Any]:
+    return await TheftDetectionManager(session).analyze_theft_patterns(params["inventory_id"])
+
+
+async def theft_statistics_job(session: AsyncSession, params: Dict[str, Any]) -> Dict[str, Any]:
+    return await TheftDetectionManager(session).get_theft_statistics(params["inventory_id"])
+
+
+async def fleet_statistics_job(session: AsyncSession, params: Dict[str, Any]) -> Dict[str, Any]:
+    """Headline statistics of every inventory"""
+    warehouse_manager = WarehouseManager(session)
+    inventory_ids = (await session.exec(select(Inventory.inventory_id))).all()
+    inventories = []
+    for inventory_id in inventory_ids:
+        stats = await warehouse_manager.get_inventory_statistics(inventory_id)
+        inventories.append({key: stats[key] for key in (
+            "inventory_id", "location", "total_shelves", "products_on_shelf", "total_shelf_value",
+            "total_sales", "total_sales_value", "total_receipts", "missing_products", "theft_count",
+            "estimated_loss_value"
+        )})
+    return {
+        "inventories": inventories,
+        "total_inventories": len(inventories),
+        "products_on_shelf": sum(stats["products_on_shelf"] for stats in inventories),
+        "total_shelf_value": sum(stats["total_shelf_value"] for stats in inventories),
+        "total_sales_value": sum(stats["total_sales_value"] for stats in inventories),
+        "missing_products": sum(stats["missing_products"] for stats in inventories),
+        "estimated_loss_value": sum(stats["estimated_loss_value"] for stats in inventories)
+    }
+
+
+def register_analytics_jobs(runner: JobRunner) -> JobRunner:
+    runner.register(PREVENTION_PLAN, prevention_plan_job)
+    runner.register(THEFT_PATTERNS, theft_patterns_job)
+    runner.register(THEFT_STATISTICS, theft_statistics_job)
+    runner.register(FLEET_STATISTICS, fleet_statistics_job)
+    return runner
+
+
+def seconds_until(hour: int, now: Optional[datetime.datetime] = None) -> float:
+    """Seconds from now until the next time the clock reads hour:00"""
+    now = now or datetime.datetime.now()
+    target = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+    if target <= now:
+        target += datetime.timedelta(days=1)
+    return (target - now).total_seconds()
+
+
+class PreventionPlanPrecompute:
+    """
+    Submits every inventory's theft prevention plan to the job runner each night at hour:00. The plans are
+    kept for ttl_seconds, a little over a day, so the plan endpoint answers from the last night's run.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], runner: JobRunner, hour: int = 2,
+                 ttl_seconds: float = 26 * 3600):
+        self.session_factory = session_factory
+        self.runner = runner
+        self.hour = hour
+        self.ttl_seconds = ttl_seconds
+        self._task = PeriodicTask("prevention_plan_precompute", self.run_once, lambda: seconds_until(self.hour))
+        self._lock = asyncio.Lock()
+
+    async def run_once(self) -> List[Job]:
+        """Queue a plan job per inventory, waits for room in the queue but not for the jobs"""
+        async with self._lock:
+            async with self.session_factory() as session:
+                inventory_ids = (await session.exec(select(Inventory.inventory_id))).all()
+            jobs = [await self.runner.enqueue(PREVENTION_PLAN, {"inventory_id": inventory_id},
+                                              ttl_seconds=self.ttl_seconds)
+                    for inventory_id in inventory_ids]
+            log.info("prevention_plans_queued", inventories=len(jobs))
+            return jobs
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
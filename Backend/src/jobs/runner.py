@@ -0,0 +1,202 @@
+import asyncio
+import datetime
+import time
+from typing import Optional, Dict, List, Callable, Awaitable, Any, Tuple
+
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..utils.id_generator import new_id
+from ..utils.log import get_logger
+from ..tracing.tracer import tracer
+
+log = get_logger("jobs")
+
+JobHandler = Callable[[AsyncSession, Dict[str, Any]], Awaitable[Any]]
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+
+
+class Job:
+    def __init__(self, kind: str, params: Dict[str, Any], ttl_seconds: float):
+        self.job_id = new_id("JOB")
+        self.kind = kind
+        self.params = params
+        self.key = job_key(kind, params)
+        self.ttl_seconds = ttl_seconds
+        self.status = QUEUED
+        self.submitted_at = datetime.datetime.now()
+        self.started_at: Optional[datetime.datetime] = None
+        self.finished_at: Optional[datetime.datetime] = None
+        self.expires_at: Optional[float] = None  # monotonic, set once the job is done
+        self.result: Any = None
+        self.error: Optional[str] = None
+        self.done = asyncio.Event()
+
+    @property
+    def finished(self) -> bool:
+        return self.status in (SUCCEEDED, FAILED)
+
+    def describe(self) -> Dict[str, Any]:
+        """Status of the job without its result"""
+        return {"job_id": self.job_id, "kind": self.kind, "params": self.params, "status": self.status,
+                "submitted_at": self.submitted_at, "started_at": self.started_at,
+                "finished_at": self.finished_at, "error": self.error}
+
+
+def job_key(kind: str, params: Dict[str, Any]) -> Tuple:
+    return (kind,) + tuple(sorted((name, repr(value)) for name, value in params.items()))
+
+
+class JobRunner:
+    """
+    Runs slow analytics outside the request that asks for them. submit() queues a job and returns at once,
+    workers pull jobs off a bounded queue and run each on its own session, so at most `workers` database
+    connections go to jobs however many are submitted. A job identical to one queued or running (same kind
+    and parameters) is not queued again, the existing one is returned. Finished jobs and their results
+    are kept for result_ttl seconds (or the job's own ttl) and then forgotten.
+    """
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], workers: int = 2, max_queue_size: int = 100,
+                 result_ttl: float = 3600):
+        self.session_factory = session_factory
+        self.workers = workers
+        self.result_ttl = result_ttl
+        self._handlers: Dict[str, JobHandler] = {}
+        self._queue: "asyncio.Queue[Job]" = asyncio.Queue(maxsize=max_queue_size)
+        self._jobs: Dict[str, Job] = {}
+        self._active: Dict[Tuple, Job] = {}  # key -> queued or running job
+        self._latest: Dict[Tuple, Job] = {}  # key -> last job that succeeded and has not expired
+        self._tasks: List[asyncio.Task] = []
+        self.completed = 0
+        self.failed = 0
+        self.deduplicated = 0
+
+    @property
+    def kinds(self) -> List[str]:
+        return list(self._handlers)
+
+    def register(self, kind: str, handler: JobHandler) -> None:
+        self._handlers[kind] = handler
+
+    def _new_job(self, kind: str, params: Optional[Dict[str, Any]], ttl_seconds: Optional[float]) -> Job:
+        if kind not in self._handlers:
+            raise ValueError(f"Unknown job kind {kind}, use one of {', '.join(self._handlers)}")
+        self._purge()
+        return Job(kind, params or {}, ttl_seconds if ttl_seconds is not None else self.result_ttl)
+
+    def _track(self, job: Job) -> Job:
+        self._jobs[job.job_id] = job
+        self._active[job.key] = job
+        return job
+
+    def submit(self, kind: str, params: Optional[Dict[str, Any]] = None, ttl_seconds: Optional[float] = None) -> Job:
+        """Queue a job, or return the identical one already waiting; raises when the queue is full"""
+        job = self._new_job(kind, params, ttl_seconds)
+        active = self._active.get(job.key)
+        if active is not None:
+            self.deduplicated += 1
+            return active
+        try:
+            self._queue.put_nowait(job)
+        except asyncio.QueueFull:
+            raise Exception(f"Job queue is full ({self._queue.maxsize} jobs waiting)")
+        return self._track(job)
+
+    async def enqueue(self, kind: str, params: Optional[Dict[str, Any]] = None,
+                      ttl_seconds: Optional[float] = None) -> Job:
+        """submit() for batch producers, waits for room in the queue instead of raising"""
+        job = self._new_job(kind, params, ttl_seconds)
+        active = self._active.get(job.key)
+        if active is not None:
+            self.deduplicated += 1
+            return active
+        # Tracked before waiting, a worker may finish the job before put() returns
+        self._track(job)
+        try:
+            await self._queue.put(job)
+        except BaseException:
+            del self._jobs[job.job_id]
+            del self._active[job.key]
+            raise
+        return job
+
+    def get(self, job_id: str) -> Optional[Job]:
+        self._purge()
+        return self._jobs.get(job_id)
+
+    def latest(self, kind: str, params: Optional[Dict[str, Any]] = None) -> Optional[Job]:
+        """
+        Most recent successful job of this kind and parameters whose result has not expired. When it expires
+        before an older one (an ad-hoc run with a short ttl after a long lived nightly run), the older
+        result is returned again.
+        """
+        self._purge()
+        return self._latest.get(job_key(kind, params or {}))
+
+    async def run(self, job: Job) -> None:
+        job.status = RUNNING
+        job.started_at = datetime.datetime.now()
+        try:
+            with tracer.start_trace(f"job {job.kind}", job_id=job.job_id):
+                async with self.session_factory() as session:
+                    job.result = await self._handlers[job.kind](session, job.params)
+            job.status = SUCCEEDED
+            self.completed += 1
+            self._latest[job.key] = job
+        except Exception as e:
+            job.status = FAILED
+            job.error = str(e)
+            self.failed += 1
+            log.error("job_failed", job_id=job.job_id, kind=job.kind, error=str(e))
+        finally:
+            job.finished_at = datetime.datetime.now()
+            job.expires_at = time.monotonic() + job.ttl_seconds
+            if self._active.get(job.key) is job:
+                del self._active[job.key]
+            job.done.set()
+
+    async def _work(self):
+        while True:
+            job = await self._queue.get()
+            try:
+                await self.run(job)
+            finally:
+                self._queue.task_done()
+
+    def _purge(self) -> None:
+        now = time.monotonic()
+        expired = [job_id for job_id, job in self._jobs.items()
+                   if job.expires_at is not None and job.expires_at <= now]
+        orphaned = set()
+        for job_id in expired:
+            job = self._jobs.pop(job_id)
+            if self._latest.get(job.key) is job:
+                del self._latest[job.key]
+                orphaned.add(job.key)
+        for job in (self._jobs.values() if orphaned else ()):
+            if job.key in orphaned and job.status == SUCCEEDED:
+                current = self._latest.get(job.key)
+                if current is None or job.finished_at > current.finished_at:
+                    self._latest[job.key] = job
+
+    def start(self) -> None:
+        self._tasks = [task for task in self._tasks if not task.done()]
+        while len(self._tasks) < self.workers:
+            self._tasks.append(asyncio.create_task(self._work()))
+
+    async def stop(self) -> None:
+        """Cancel the workers, queued jobs are dropped and running ones are cancelled"""
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    def stats(self) -> Dict[str, Any]:
+        self._purge()
+        return {"workers": self.workers, "queued": self._queue.qsize(),
+                "running": sum(1 for job in self._active.values() if job.status == RUNNING),
+                "stored": len(self._jobs), "completed": self.completed, "failed": self.failed,
+                "deduplicated": self.deduplicated}
@@ -0,0 +1,188 @@
+import asyncio
+from typing import Optional, List, Dict, Tuple, Set, Callable
+
+from sqlmodel import select, func, and_, case
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from .supplier_manager import SupplierManager
+from ..Db.database_management import DatabaseManagement
+from ..utils.background import PeriodicTask
+from ..utils.log import get_logger
+from ..utils.metrics import instrumented
+from ..Db.models import Product, Shelf, StorageRack, ProductStatus, Inventory, Supplier, InventorySupplier, \
+    SupplierReceipt, InventoryReceipt
+
+log = get_logger("restock")
+
+
+@instrumented
+class RestockManager:
+    def __init__(self, session: AsyncSession):
+        self.session = session
+        self.db = DatabaseManagement(session)
+
+    async def get_stock_levels(self, product_name: Optional[str] = None, per_product: bool = False,
+                               inventory_ids: Optional[List[str]] = None) -> Dict[Tuple[str, Optional[str]], int]:
+        """
+        Count ON_SHELF products for every inventory (or only inventory_ids) with a single grouped query.
+        Keys are (inventory_id, product_name); product_name is None unless per_product is set.
+        """
+        if per_product:
+            # The names an inventory stocks come from the receipts it was sent, not the shelves: a sale clears
+            # the product's shelf, so a name that sold out would otherwise disappear instead of counting 0
+            stock = func.count(case((Product.status == ProductStatus.ON_SHELF, Product.product_id)))
+            query = (
+                select(SupplierReceipt.inventory_id, Product.product_name, stock)
+                .join(Product, Product.receipt_id == SupplierReceipt.receipt_id)
+                .group_by(SupplierReceipt.inventory_id, Product.product_name)
+            )
+            if product_name:
+                query = query.where(Product.product_name == product_name)
+            if inventory_ids is not None:
+                query = query.where(SupplierReceipt.inventory_id.in_(inventory_ids))
+            result = await self.session.exec(query)
+            return {(inventory_id, name): count for inventory_id, name, count in result.all()}
+
+        on_shelf = and_(Product.shelf_id == Shelf.shelf_id, Product.status == ProductStatus.ON_SHELF)
+        if product_name:
+            on_shelf = and_(on_shelf, Product.product_name == product_name)
+
+        # Outer joins keep empty inventories in the result with a count of 0
+        query = (
+            select(Inventory.inventory_id, func.count(Product.product_id))
+            .outerjoin(StorageRack, StorageRack.inventory_id == Inventory.inventory_id)
+            .outerjoin(Shelf, Shelf.rack_id == StorageRack.rack_id)
+            .outerjoin(Product, on_shelf)
+            .group_by(Inventory.inventory_id)
+        )
+        if inventory_ids is not None:
+            query = query.where(Inventory.inventory_id.in_(inventory_ids))
+        result = await self.session.exec(query)
+        return {(inventory_id, product_name): count for inventory_id, count in result.all()}
+
+    async def get_pending_restock_inventories(self) -> Set[str]:
+        """Inventories with a supplier receipt that has not been received yet"""
+        query = (
+            select(SupplierReceipt.inventory_id)
+            .outerjoin(InventoryReceipt, InventoryReceipt.supplier_receipt_id == SupplierReceipt.receipt_id)
+            .where(InventoryReceipt.receipt_id.is_(None))
+            .distinct()
+        )
+        result = await self.session.exec(query)
+        return set(result.all())
+
+    async def get_inventory_suppliers(self, inventory_ids: List[str]) -> Dict[str, Supplier]:
+        """First linked supplier of each inventory, in one query"""
+        if not inventory_ids:
+            return {}
+        query = (
+            select(InventorySupplier.inventory_id, Supplier)
+            .join(Supplier, Supplier.supplier_id == InventorySupplier.supplier_id)
+            .where(InventorySupplier.inventory_id.in_(inventory_ids))
+            .order_by(InventorySupplier.inventory_id, Supplier.supplier_id)
+        )
+        result = await self.session.exec(query)
+        suppliers = {}
+        for inventory_id, supplier in result.all():
+            suppliers.setdefault(inventory_id, supplier)
+        return suppliers
+
+    async def find_low_stock(self, min_threshold: int, product_name: Optional[str] = None,
+                             per_product: bool = False,
+                             inventory_ids: Optional[List[str]] = None) -> Dict[Tuple[str, Optional[str]], int]:
+        """Stock levels that are below the threshold"""
+        levels = await self.get_stock_levels(product_name=product_name, per_product=per_product,
+                                             inventory_ids=inventory_ids)
+        return {key: count for key, count in levels.items() if count < min_threshold}
+
+    async def restock_low_inventories(self, min_threshold: int = 10, order_size: int = 20,
+                                      product_name: Optional[str] = None, per_product: bool = False,
+                                      supplier_id: Optional[str] = None,
+                                      inventory_ids: Optional[List[str]] = None) -> Dict[str, str]:
+        """
+        Order products for every inventory below threshold.
+        Inventories with an unreceived supplier receipt are skipped so they are not reordered twice.
+        Orders go to the inventory's linked supplier unless supplier_id is given.
+        Returns a mapping of inventory_id to the new supplier receipt id.
+        """
+        low_stock = await self.find_low_stock(min_threshold, product_name=product_name, per_product=per_product,
+                                              inventory_ids=inventory_ids)
+        if not low_stock:
+            return {}
+
+        pending = await self.get_pending_restock_inventories()
+
+        # Group the product names to order per inventory
+        to_order: Dict[str, List[Optional[str]]] = {}
+        for (inventory_id, name), count in low_stock.items():
+            if inventory_id in pending:
+                log.info("restock_skipped_pending", inventory_id=inventory_id)
+                continue
+            log.info("stock_below_threshold", inventory_id=inventory_id, product_name=name, count=count,
+                     threshold=min_threshold)
+            to_order.setdefault(inventory_id, []).append(name)
+        if not to_order:
+            return {}
+
+        if supplier_id:
+            supplier = await self.db.search(Supplier, all_results=False, supplier_id=supplier_id)
+            if not supplier:
+                raise ValueError(f"Supplier {supplier_id} not found")
+            suppliers = {inventory_id: supplier for inventory_id in to_order}
+        else:
+            suppliers = await self.get_inventory_suppliers(list(to_order.keys()))
+
+        supplier_manager = SupplierManager(self.session)
+        orders = {}
+        for inventory_id, names in to_order.items():
+            supplier = suppliers.get(inventory_id)
+            if not supplier:
+                log.warning("restock_no_supplier", inventory_id=inventory_id)
+                continue
+
+            product_names = [name for name in names if name] or None
+            products, receipt_id = await supplier_manager.create_random_products(
+                supplier_id=supplier.supplier_id,
+                supplier_name=supplier.supplier_name,
+                inventory_id=inventory_id,
+                count=order_size,
+                product_names=product_names
+            )
+            orders[inventory_id] = receipt_id
+            log.info("restock_ordered", inventory_id=inventory_id, receipt_id=receipt_id, products=len(products))
+
+        return orders
+
+
+class RestockMonitor:
+    """Periodically runs RestockManager.restock_low_inventories on its own session"""
+
+    def __init__(self, session_factory: Callable[[], AsyncSession], interval_seconds: int = 300,
+                 min_threshold: int = 10, order_size: int = 20, product_name: Optional[str] = None,
+                 per_product: bool = False):
+        self.session_factory = session_factory
+        self.interval_seconds = interval_seconds
+        self.min_threshold = min_threshold
+        self.order_size = order_size
+        self.product_name = product_name
+        self.per_product = per_product
+        self._task = PeriodicTask("restock_monitor", self.run_once, lambda: self.interval_seconds,
+                                  run_immediately=True)
+        self._lock = asyncio.Lock()
+
+    async def run_once(self) -> Dict[str, str]:
+        """Run a single restock check; overlapping runs wait for each other"""
+        async with self._lock:
+            async with self.session_factory() as session:
+                return await RestockManager(session).restock_low_inventories(
+                    min_threshold=self.min_threshold,
+                    order_size=self.order_size,
+                    product_name=self.product_name,
+                    per_product=self.per_product
+                )
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
@@ -0,0 +1,153 @@
+import datetime
+from typing import Optional, List, Dict, Set, Iterable, Tuple
+
+from sqlmodel import select
+from sqlmodel.ext.asyncio.session import AsyncSession
+
+from ..config.Settings import settings
+from ..Db.database_management import DatabaseManagement
+from ..Db.models import ShelfScan, ShelfScanItem, ShelfScanDelta, ShelfScanChange
+from ..utils.id_generator import new_id, new_ids
+from ..utils.metrics import metrics, instrumented
+
+scans_completed = metrics.counter("shelf_scans_total", "Shelf scans stored")
+
+
+@instrumented
+class ScanStore:
+    """
+    Stores shelf scans as the products added and removed since the shelf's previous scan, with a full
+    checkpoint every checkpoint_interval scans or when the delta would not be smaller than the scan itself.
+    The contents of any scan are rebuilt from its checkpoint plus the chain of deltas leading to it, with a
+    fixed number of queries however many scans are asked for.
+    A new scan is based on the newest scan of its shelf, so every scan of a shelf must be written through
+    record_scan with everything the scan found; partial reads stored as scans would become delta bases.
+    """
+
+    def __init__(self, session: AsyncSession, checkpoint_interval: Optional[int] = None):
+        self.session = session
+        self.db = DatabaseManagement(session)
+        self.checkpoint_interval = checkpoint_interval or settings.SCAN_CHECKPOINT_INTERVAL
+
+    async def recent_scans(self, shelf_id: str, limit: Optional[int] = None) -> List[ShelfScan]:
+        """Scans of a shelf, newest first"""
+        query = (
+            select(ShelfScan)
+            .where(ShelfScan.shelf_id == shelf_id)
+            .order_by(ShelfScan.scan_timestamp.desc(), ShelfScan.scan_id.desc())
+        )
+        if limit:
+            query = query.limit(limit)
+        return list((await self.session.exec(query)).all())
+
+    async def get_contents(self, scan_ids: Iterable[str]) -> Dict[str, Set[str]]:
+        """Product IDs found by each scan"""
+        scan_ids = list(dict.fromkeys(scan_ids))
+        if not scan_ids:
+            return {}
+
+        # Which checkpoint each requested scan builds on, then every delta of those checkpoints
+        deltas = (await self.session.exec(
+            select(ShelfScanDelta).where(ShelfScanDelta.scan_id.in_(scan_ids))
+        )).all()
+        checkpoint_of = {scan_id: scan_id for scan_id in scan_ids}
+        checkpoint_of.update({delta.scan_id: delta.checkpoint_scan_id for delta in deltas})
+        checkpoints = set(checkpoint_of.values())
+        base_of: Dict[str, str] = {}
+        if deltas:
+            chain_rows = (await self.session.exec(
+                select(ShelfScanDelta.scan_id, ShelfScanDelta.base_scan_id)
+                .where(ShelfScanDelta.checkpoint_scan_id.in_(checkpoints))
+            )).all()
+            base_of = dict(chain_rows)
+
+        # Only the deltas on the way from a requested scan back to its checkpoint are needed
+        needed: Set[str] = set()
+        for scan_id in scan_ids:
+            current = scan_id
+            while current in base_of and current not in needed:
+                needed.add(current)
+                current = base_of[current]
+
+        contents: Dict[str, Set[str]] = {checkpoint: set() for checkpoint in checkpoints}
+        items = (await self.session.exec(
+            select(ShelfScanItem.scan_id, ShelfScanItem.product_id).where(ShelfScanItem.scan_id.in_(checkpoints))
+        )).all()
+        for scan_id, product_id in items:
+            contents[scan_id].add(product_id)
+
+        changes: Dict[str, Tuple[List[str], List[str]]] = {scan_id: ([], []) for scan_id in needed}
+        if needed:
+            rows = (await self.session.exec(
+                select(ShelfScanChange.scan_id, ShelfScanChange.product_id, ShelfScanChange.added)
+                .where(ShelfScanChange.scan_id.in_(needed))
+            )).all()
+            for scan_id, product_id, added in rows:
+                changes[scan_id][0 if added else 1].append(product_id)
+
+        def resolve(scan_id: str) -> Set[str]:
+            # Walk back to the nearest scan already rebuilt, then apply the deltas forwards
+            chain = []
+            current = scan_id
+            while current not in contents:
+                chain.append(current)
+                current = base_of[current]
+            result = contents[current]
+            for delta_id in reversed(chain):
+                added, removed = changes[delta_id]
+                result = (result | set(added)) - set(removed)
+                contents[delta_id] = result
+            return result
+
+        return {scan_id: resolve(scan_id) for scan_id in scan_ids}
+
+    async def get_scan_contents(self, scan_id: str) -> Set[str]:
+        return (await self.get_contents([scan_id]))[scan_id]
+
+    async def record_scan(self, shelf_id: str, product_ids: Iterable[str],
+                          scan_timestamp: Optional[datetime.datetime] = None, auto_commit: bool = True) -> ShelfScan:
+        """Store a scan of a shelf that found product_ids, as a delta when that is smaller"""
+        product_ids = set(product_ids)
+        scan = ShelfScan(scan_id=new_id("SCAN"), shelf_id=shelf_id,
+                         scan_timestamp=scan_timestamp or datetime.datetime.now())
+
+        previous = await self.recent_scans(shelf_id, limit=1)
+        delta = None
+        if previous:
+            base = previous[0]
+            base_delta = (await self.session.exec(
+                select(ShelfScanDelta).where(ShelfScanDelta.scan_id == base.scan_id)
+            )).first()
+            depth = base_delta.depth + 1 if base_delta else 1
+            if depth < self.checkpoint_interval:
+                before = await self.get_scan_contents(base.scan_id)
+                added = product_ids - before
+                removed = before - product_ids
+                if len(added) + len(removed) < len(product_ids):
+                    delta = (base, base_delta, depth, added, removed)
+
+        self.session.add(scan)
+        if delta is None:
+            await self.session.flush()
+            await self.db.bulk_insert(ShelfScanItem, [
+                {"scan_item_id": item_id, "scan_id": scan.scan_id, "product_id": product_id}
+                for item_id, product_id in zip(new_ids("SCANITEM", len(product_ids)), product_ids)
+            ], auto_commit=False)
+        else:
+            base, base_delta, depth, added, removed = delta
+            self.session.add(ShelfScanDelta(
+                scan_id=scan.scan_id,
+                base_scan_id=base.scan_id,
+                checkpoint_scan_id=base_delta.checkpoint_scan_id if base_delta else base.scan_id,
+                depth=depth
+            ))
+            changed = [(product_id, True) for product_id in added] + [(product_id, False) for product_id in removed]
+            await self.session.flush()
+            await self.db.bulk_insert(ShelfScanChange, [
+                {"change_id": change_id, "scan_id": scan.scan_id, "product_id": product_id, "added": is_added}
+                for change_id, (product_id, is_added) in zip(new_ids("SCANCHANGE", len(changed)), changed)
+            ], auto_commit=False)
+        if auto_commit:
+            await self.session.commit()
+        scans_completed.inc()
+        return scan
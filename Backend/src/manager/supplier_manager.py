@@ -1,16 +1,27 @@
 import hashlib
 import datetime
 import random
-import uuid
 import asyncio
 from typing import List, Tuple, Dict, Optional
 
 from sqlmodel.ext.asyncio.session import AsyncSession
 from ..Db.database_management import DatabaseManagement
+from ..utils.id_generator import new_id, new_ids
+from ..utils.epc import new_rfid_tag
+from ..utils.metrics import instrumented
+from ..utils.log import get_logger
+from ..tracing.tracer import traced
+from ..cache.tag_index import tag_index
+from ..cache.inventory_versions import inventory_versions
 from ..Db.models import Supplier, Product, SupplierReceipt, SupplierReceiptItem, ProductStatus, \
     InventorySupplier
 
 
+log = get_logger("supplier")
+
+
+@instrumented
+@traced
 class SupplierManager:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -22,7 +33,7 @@ class SupplierManager:
         if not supplier:
             supplier = Supplier(supplier_id=supplier_id, supplier_name=supplier_name)
             await self.db.insert(supplier)
-            print(f"Created supplier with ID: {supplier_id}")
+            log.info("supplier_created", supplier_id=supplier_id)
         return supplier.model_dump()
 
     async def link_supplier_to_inventory(self, supplier_id: str, inventory_id: str) -> InventorySupplier:
@@ -43,7 +54,8 @@ class SupplierManager:
                 supplier_id=supplier_id
             )
             await self.db.insert(inv_supplier)
-            print(f"Linked supplier {supplier_id} to inventory {inventory_id}")
+            inventory_versions.bump(inventory_id)
+            log.info("supplier_linked", supplier_id=supplier_id, inventory_id=inventory_id)
             return inv_supplier
 
         return existing_link
@@ -53,8 +65,7 @@ class SupplierManager:
         # Ensure the supplier is linked to the inventory
         await self.link_supplier_to_inventory(supplier_id, inventory_id)
 
-        receipt_hash = hashlib.sha256(str(datetime.datetime.now()).encode()).hexdigest()[:10]
-        receipt_id = f"SR_{receipt_hash}"
+        receipt_id = new_id("SR")
 
         receipt = SupplierReceipt(
             receipt_id=receipt_id,
@@ -64,15 +75,12 @@ class SupplierManager:
             total_products_sent=len(products)
         )
         await self.db.insert(receipt)
-        print(f"Created supplier receipt: {receipt_id}")
+        log.info("supplier_receipt_created", receipt_id=receipt_id, supplier_id=supplier_id,
+                 inventory_id=inventory_id, products=len(products))
 
         # Create receipt items
         receipt_items = []
-        for product in products:
-            receipt_item_hash = hashlib.sha256(
-                (str(datetime.datetime.now()) + product.product_id).encode()
-            ).hexdigest()[:10]
-            receipt_item_id = f"SRI_{receipt_item_hash}"
+        for product, receipt_item_id in zip(products, new_ids("SRI", len(products))):
             receipt_item = SupplierReceiptItem(
                 receipt_item_id=receipt_item_id,
                 receipt_id=receipt_id,
@@ -93,6 +101,8 @@ class SupplierManager:
                 "receipt_id": receipt_id
             }
             await self.db.update_row(Product, search_criteria, update_data)
+            tag_index.update(product.rfid_tag, product.product_id, ProductStatus.WITH_SUPPLIER, product.shelf_id,
+                             inventory_id)
 
         try:
             async with self.session as session:
@@ -105,7 +115,8 @@ class SupplierManager:
 
         return receipt_id
 
-    async def create_random_products(self, supplier_id: str, supplier_name: str, count: int,inventory_id: str=None ) -> \
+    async def create_random_products(self, supplier_id: str, supplier_name: str, count: int,inventory_id: str=None,
+                                     product_names: Optional[List[str]] = None) -> \
     Tuple[
         List[Product], str]:
         """Create random products for a supplier and link them to an inventory"""
@@ -114,14 +125,14 @@ class SupplierManager:
 
         products = [
             Product(
-                product_id=f"PRODUCT_{uuid.uuid4().hex}",
-                rfid_tag=f"RFID_{uuid.uuid4().hex}",
-                product_name=random.choice(["Widget A", "Widget B", "Gadget X", "Tool Y"]),
+                product_id=product_id,
+                rfid_tag=new_rfid_tag(),
+                product_name=random.choice(product_names or ["Widget A", "Widget B", "Gadget X", "Tool Y"]),
                 status=ProductStatus.WITH_SUPPLIER,  # Default status
                 supplier_id=supplier_id,
                 price=random.randint(50, 1000),
             )
-            for _ in range(count)
+            for product_id in new_ids("PRODUCT", count)
         ]
 
         try:
@@ -133,10 +144,12 @@ class SupplierManager:
         except Exception as e:
             await self.session.rollback()
             raise Exception(f"Failed to insert products: {str(e)}")
+        tag_index.update_many(products)
 
             # Create supplier receipt with these products
         receipt_id = "No inventory_id was provided"
         if inventory_id:
             receipt_id = await self.create_supplier_receipt(supplier_id, inventory_id, products)
 
+        log.info("products_created", supplier_id=supplier_id, count=len(products), inventory_id=inventory_id)
         return products, receipt_id
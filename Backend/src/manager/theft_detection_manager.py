@@ -3,12 +3,27 @@ from typing import Optional, List, Dict, Any, Tuple
 
 from sqlmodel.ext.asyncio.session import AsyncSession
 from ..Db.database_management import DatabaseManagement
+from ..cache.tag_index import tag_index
+from ..cache.shelf_state import shelf_state
+from ..cache.missing_buffer import missing_buffer
+from ..events.bus import event_bus
+from ..utils.metrics import metrics, instrumented
+from ..utils.log import get_logger
+from ..tracing.tracer import traced
+from .scan_store import ScanStore
 from ..Db.models import (
-    Product, ShelfInventory, ShelfScan, ShelfScanItem, Inventory,
+    Product, ShelfInventory, ShelfScan, Inventory,
     StorageRack, Shelf, ProductStatus, Sale, InventoryReceipt
 )
 
 
+log = get_logger("theft")
+
+thefts_detected = metrics.counter("thefts_detected_total", "Products reported stolen")
+
+
+@instrumented
+@traced
 class TheftDetectionManager:
     def __init__(self, session: AsyncSession):
         self.session = session
@@ -16,7 +31,8 @@ class TheftDetectionManager:
 
     async def detect_missing_products(self, scan_id: str) -> List[Product]:
         """
-        Analyze a shelf scan to detect missing products that weren't found during scanning
+        Analyze a shelf scan to detect missing products that weren't found during scanning.
+        Only products missed by enough consecutive scans (see MissingBuffer) are reported and returned.
         """
         # Get the scan record
         scan = await self.db.search(ShelfScan, all_results=False, scan_id=scan_id)
@@ -28,20 +44,19 @@ class TheftDetectionManager:
         if not shelf:
             raise ValueError(f"Shelf {scan.shelf_id} not found")
 
-        # Get all products that should be on this shelf
-        expected_products = await self.db.search(
-            Product,
-            all_results=True,
-            shelf_id=scan.shelf_id,
-            status=ProductStatus.ON_SHELF
-        )
+        # Products that should be on this shelf, from the in-memory shelf state
+        expected = await shelf_state.get_expected(self.session, scan.shelf_id)
 
-        # Get all products that were found in the scan
-        scan_items = await self.db.search(ShelfScanItem, all_results=True, scan_id=scan_id)
-        found_product_ids = {item.product_id for item in scan_items}
+        # Get all products that were found in the scan, rebuilt from its checkpoint and deltas
+        found_product_ids = await ScanStore(self.session).get_scan_contents(scan_id)
 
-        # Products that were expected but not found
-        missing_products = [p for p in expected_products if p.product_id not in found_product_ids]
+        # Products that were expected but not found, reported once enough scans missed them
+        missing_ids = [product_id for product_id in expected.values() if product_id not in found_product_ids]
+        missing_ids = missing_buffer.observe(scan.shelf_id, scan_id, missing_ids, found_product_ids,
+                                             scan.scan_timestamp)
+        missing_products = []
+        if missing_ids:
+            missing_products = await self.db.search(Product, all_results=True, product_id__in=missing_ids)
 
         # Report all missing products
         for product in missing_products:
@@ -95,6 +110,7 @@ class TheftDetectionManager:
             "receipt_id": product.receipt_id
         }
         await self.db.update_row(Product, search_criteria, update_data)
+        tag_index.update(product.rfid_tag, product_id, ProductStatus.MISSING, product.shelf_id, inventory_id)
 
         # Update ShelfInventory
         shelf_inventory = await self.db.search(
@@ -129,7 +145,10 @@ class TheftDetectionManager:
             "new_inventory_theft_count": inventory.previous_theft_count + 1
         }
 
-        print(f"Theft detected: Product {product_id} ({product.product_name}) valued at ${product.price}")
+        thefts_detected.inc()
+        event_bus.publish("theft", inventory_id, theft_report)
+        log.warning("theft_detected", product_id=product_id, product_name=product.product_name, price=product.price,
+                    inventory_id=inventory_id, scan_id=scan_id)
         return theft_report
 
     async def get_theft_statistics(self, inventory_id: str) -> Dict[str, Any]:
@@ -344,20 +363,18 @@ class TheftDetectionManager:
             status=ProductStatus.MISSING
         )
 
-        # Get shelf scan history
-        shelf_scans = await self.db.search(ShelfScan, all_results=True, shelf_id=shelf_id)
-
-        # Sort scans by timestamp
-        shelf_scans.sort(key=lambda x: x.scan_timestamp, reverse=True)
+        # Get the 10 most recent scans, newest first, and what each of them found
+        scan_store = ScanStore(self.session)
+        shelf_scans = await scan_store.recent_scans(shelf_id, limit=10)
+        scan_contents = await scan_store.get_contents(scan.scan_id for scan in shelf_scans)
 
         # Analyze scan history
         scan_history = []
-        for scan in shelf_scans[:10]:  # Get the 10 most recent scans
-            scan_items = await self.db.search(ShelfScanItem, all_results=True, scan_id=scan.scan_id)
+        for scan in shelf_scans:
             scan_history.append({
                 "scan_id": scan.scan_id,
                 "timestamp": scan.scan_timestamp.isoformat(),
-                "items_found": len(scan_items)
+                "items_found": len(scan_contents[scan.scan_id])
             })
 
         # Get all shelf inventory records for this shelf
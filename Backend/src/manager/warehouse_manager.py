@@ -1,14 +1,61 @@
 import datetime
-import hashlib
 import random
-from typing import Optional, List, Dict, Any, Tuple
+from typing import Optional, List, Dict, Any, Tuple, Iterable, NamedTuple
 
+from sqlmodel import select, update, or_
 from sqlmodel.ext.asyncio.session import AsyncSession
+from .restock_manager import RestockManager
+from .scan_store import ScanStore
 from ..Db.database_management import DatabaseManagement
+from ..utils.id_generator import new_id, new_ids
+from ..utils.epc import is_epc_tag
+from ..cache.tag_index import tag_index
+from ..cache.shelf_state import shelf_state
+from ..cache.missing_buffer import missing_buffer
+from ..cache.inventory_versions import inventory_versions
+from ..events.bus import event_bus
+from ..utils.metrics import metrics, instrumented
+from ..utils.log import get_logger
+from ..tracing.tracer import traced
 from ..Db.models import Product, ShelfInventory, SupplierReceiptItem, SupplierReceipt, InventoryReceiptItem, \
     Shelf, InventoryReceipt, StorageRack, ProductStatus, Inventory, Sale, ShelfScan, InventoryOwner
 
 
+log = get_logger("warehouse")
+
+items_received = metrics.counter("items_received_total", "Products received into inventories")
+products_sold = metrics.counter("products_sold_total", "Products sold")
+missing_reported = metrics.counter("missing_products_reported_total", "Products reported missing")
+
+
+class ProductMove(NamedTuple):
+    """A product found on to_shelf while the database has it on from_shelf (or missing)"""
+    rfid_tag: str
+    product_id: str
+    from_shelf: Optional[str]
+    to_shelf: str
+    previous_status: ProductStatus
+
+
+def make_rack_id(inventory_id: str, rack_number: int) -> str:
+    return f"{inventory_id}_RACK_{rack_number:03d}"
+
+
+def make_shelf_id(inventory_id: str, rack_number: int, shelf_number: int) -> str:
+    return f"{inventory_id}_SHELF_{rack_number:03d}_{shelf_number:02d}"
+
+
+def section_name(number: int) -> str:
+    """1 -> A, 26 -> Z, 27 -> AA, like spreadsheet columns"""
+    name = ""
+    while number > 0:
+        number, remainder = divmod(number - 1, 26)
+        name = chr(65 + remainder) + name
+    return name
+
+
+@instrumented
+@traced
 class WarehouseManager:
     def __init__(self, session: AsyncSession, shelf_ids: Optional[list] = None):
         self.session = session
@@ -18,11 +65,13 @@ class WarehouseManager:
     async def setup_inventory(self, inventory_id: str, owner_id: str, location: str) -> Inventory:
         inventory = await self.db.search(Inventory, all_results=False, inventory_id=inventory_id)
         if not inventory:
-            owner = InventoryOwner(
-                owner_id=owner_id,
-                owner_name="Main Warehouse Owner"
-            )
-            await self.db.insert(owner)
+            owner = await self.db.search(InventoryOwner, all_results=False, owner_id=owner_id)
+            if not owner:
+                owner = InventoryOwner(
+                    owner_id=owner_id,
+                    owner_name="Main Warehouse Owner"
+                )
+                await self.db.insert(owner)
             inventory = Inventory(
                 inventory_id=inventory_id,
                 owner_id=owner_id,
@@ -30,7 +79,8 @@ class WarehouseManager:
                 previous_theft_count=0
             )
             await self.db.insert(inventory)
-            print(f"Created inventory with ID: {inventory_id}")
+            inventory_versions.bump(inventory_id)
+            log.info("inventory_created", inventory_id=inventory_id)
 
             # Create default storage racks and shelves
             await self.setup_racks_and_shelves(inventory_id)
@@ -39,33 +89,75 @@ class WarehouseManager:
 
     async def setup_racks_and_shelves(self, inventory_id: str, rack_count: int = 2,num_shelf:int=4) -> List[StorageRack]:
         """Set up storage racks and shelves for an inventory"""
-        racks = []
-        for i in range(rack_count):
-            rack_id = f"RACK_{i + 1:03d}"
-            rack = await self.db.search(StorageRack, all_results=False, rack_id=rack_id)
-            if not rack:
-                rack = StorageRack(
-                    rack_id=rack_id,
-                    inventory_id=inventory_id,
-                    rack_location=f"Section {chr(65 + i)}"  # A, B, C, etc.
-                )
-                await self.db.insert(rack)
-                print(f"Created rack: {rack_id} in inventory {inventory_id}")
-
-                for j in range(num_shelf):
-                    shelf_id = f"SHELF_{i * 4 + j + 1:03d}"
-                    shelf = await self.db.search(Shelf, all_results=False, shelf_id=shelf_id)
-                    if not shelf:
-                        shelf = Shelf(
-                            shelf_id=shelf_id,
-                            rack_id=rack_id,
-                            shelf_location=f"Level {j + 1}"
-                        )
-                        await self.db.insert(shelf)
-                        print(f"Created shelf: {shelf_id} on rack {rack_id}")
+        await self.provision_layout(inventory_id, rack_count=rack_count, shelves_per_rack=num_shelf)
+        return await self.db.search(StorageRack, all_results=True, inventory_id=inventory_id)
+
+    async def provision_layout(self, inventory_id: str, rack_count: Optional[int] = None,
+                               shelves_per_rack: Optional[int] = None,
+                               layout: Optional[List[int]] = None) -> Dict[str, Any]:
+        """
+        Create the racks and shelves of an inventory in one bulk transaction.
+        layout lists the number of shelves of each rack, rack_count x shelves_per_rack is the uniform shortcut.
+        IDs are scoped to the inventory and existing racks/shelves are skipped, so re-running is safe.
+        """
+        if layout is None:
+            if rack_count is None or shelves_per_rack is None:
+                raise ValueError("Provide either a layout or rack_count and shelves_per_rack")
+            layout = [shelves_per_rack] * rack_count
+        if any(num_shelves < 0 for num_shelves in layout):
+            raise ValueError("Shelf counts in a layout can not be negative")
+
+        inventory = await self.db.search(Inventory, all_results=False, inventory_id=inventory_id)
+        if not inventory:
+            raise ValueError(f"Inventory {inventory_id} not found")
+
+        # One query each for what already exists
+        existing_racks = set((await self.session.exec(
+            select(StorageRack.rack_id).where(StorageRack.inventory_id == inventory_id)
+        )).all())
+        existing_shelves = set((await self.session.exec(
+            select(Shelf.shelf_id)
+            .join(StorageRack, Shelf.rack_id == StorageRack.rack_id)
+            .where(StorageRack.inventory_id == inventory_id)
+        )).all())
+
+        rack_rows = []
+        shelf_rows = []
+        for rack_number, num_shelves in enumerate(layout, start=1):
+            rack_id = make_rack_id(inventory_id, rack_number)
+            if rack_id not in existing_racks:
+                rack_rows.append({
+                    "rack_id": rack_id,
+                    "inventory_id": inventory_id,
+                    "rack_location": f"Section {section_name(rack_number)}"
+                })
+            for shelf_number in range(1, num_shelves + 1):
+                shelf_id = make_shelf_id(inventory_id, rack_number, shelf_number)
+                if shelf_id not in existing_shelves:
+                    shelf_rows.append({
+                        "shelf_id": shelf_id,
+                        "rack_id": rack_id,
+                        "shelf_location": f"Level {shelf_number}"
+                    })
 
-            racks.append(rack)
-        return racks
+        try:
+            await self.db.bulk_insert(StorageRack, rack_rows, auto_commit=False)
+            await self.db.bulk_insert(Shelf, shelf_rows, auto_commit=False)
+            await self.session.commit()
+        except Exception as e:
+            await self.session.rollback()
+            raise Exception(f"Failed to provision layout for inventory {inventory_id}: {str(e)}")
+        inventory_versions.bump(inventory_id)
+
+        log.info("inventory_provisioned", inventory_id=inventory_id, racks_created=len(rack_rows),
+                 shelves_created=len(shelf_rows))
+        return {
+            "inventory_id": inventory_id,
+            "total_racks": len(layout),
+            "total_shelves": sum(layout),
+            "racks_created": len(rack_rows),
+            "shelves_created": len(shelf_rows)
+        }
 
     async def receive_products(self, supplier_receipt_id: str, inventory_id: str, loss_simulation: bool = False) -> str:
         """Receive products from a supplier receipt into inventory with optional loss simulation"""
@@ -73,9 +165,10 @@ class WarehouseManager:
         if not supplier_receipt:
             raise ValueError(f"Supplier receipt {supplier_receipt_id} not found!")
 
-        receipt_hash = hashlib.sha256(str(datetime.datetime.now()).encode()).hexdigest()[:10]
-        inventory_receipt_id = f"IR_{receipt_hash}"
+        inventory_receipt_id = new_id("IR")
         received_products = []
+        lost = 0
+        not_found = 0
 
         supplier_items = await self.db.search(SupplierReceiptItem, all_results=True, receipt_id=supplier_receipt_id)
 
@@ -83,14 +176,16 @@ class WarehouseManager:
         for item in supplier_items:
             product = await self.db.search(Product, all_results=False, product_id=item.product_id)
             if not product:
-                print(f"Warning: Product {item.product_id} not found in the database")
+                log.item("receipt_product_not_found", product_id=item.product_id)
+                not_found += 1
                 continue
 
             if not loss_simulation or random.random() > 0.3:  # 70% chance of receiving or no simulation
                 received_products.append(product)
-                print(f"Received product: {product.product_id}, RFID: {product.rfid_tag}")
+                log.item("product_received", product_id=product.product_id, rfid_tag=product.rfid_tag)
             else:
-                print(f"***Simulated loss: {item.product_id} not received!***")
+                log.item("product_lost_in_transit", product_id=item.product_id)
+                lost += 1
                 await self.report_missing_product(product.product_id)
 
         inventory_receipt = InventoryReceipt(
@@ -101,15 +196,11 @@ class WarehouseManager:
             total_products_received=len(received_products)
         )
         await self.db.insert(inventory_receipt)
-        print(f"Created inventory receipt: {inventory_receipt_id}")
 
         # Create receipt items
         receipt_items = []
         for product in received_products:
-            receipt_item_hash = hashlib.sha256(
-                (str(datetime.datetime.now()) + product.product_id).encode()
-            ).hexdigest()[:10]
-            receipt_item_id = f"IRI_{receipt_item_hash}"
+            receipt_item_id = new_id("IRI")
 
             receipt_item = InventoryReceiptItem(
                 receipt_item_id=receipt_item_id,
@@ -131,6 +222,8 @@ class WarehouseManager:
                 "receipt_id": product.receipt_id
             }
             await self.db.update_row(Product, search_criteria, update_data)
+            tag_index.update(product.rfid_tag, product.product_id, ProductStatus.OUT_SHELF, product.shelf_id,
+                             inventory_id)
 
         # Bulk insert receipt items
         # await asyncio.gather(*(self.db.insert(item) for item in receipt_items))
@@ -143,6 +236,10 @@ class WarehouseManager:
         except Exception as e:
             await self.session.rollback()
             raise Exception(f"Failed to insert products: {str(e)}")
+        inventory_versions.bump(inventory_id)
+        items_received.inc(amount=len(received_products))
+        log.info("products_received", receipt_id=inventory_receipt_id, supplier_receipt_id=supplier_receipt_id,
+                 inventory_id=inventory_id, received=len(received_products), lost=lost, not_found=not_found)
 
         return inventory_receipt_id
 
@@ -160,12 +257,13 @@ class WarehouseManager:
 
 
         shelf_inventory_records = {}
+        placed = []
         now = datetime.datetime.now()
 
         for product_id in product_ids:
             product = await self.db.search(Product, all_results=False, product_id=product_id)
             if not product:
-                print(f"Warning: Product {product_id} not found")
+                log.item("placement_product_not_found", product_id=product_id)
                 continue
 
             # Determine target shelf
@@ -190,12 +288,11 @@ class WarehouseManager:
                 "receipt_id": product.receipt_id
             }
             await self.db.update_row(Product, search_criteria, update_data)
+            tag_index.update(product.rfid_tag, product_id, ProductStatus.ON_SHELF, target_shelf.shelf_id,
+                             inventory_id)
 
             # Create shelf inventory record
-            record_hash = hashlib.sha256(
-                (str(now) + product_id + target_shelf.shelf_id).encode()
-            ).hexdigest()[:10]
-            record_id = f"SI_{record_hash}"
+            record_id = new_id("SI")
 
             shelf_inventory = ShelfInventory(
                 shelf_inventory_id=record_id,
@@ -210,58 +307,161 @@ class WarehouseManager:
                 shelf_inventory_records[target_shelf.shelf_id] = []
             shelf_inventory_records[target_shelf.shelf_id].append(shelf_inventory)
 
-            print(f"Placed product {product_id} on shelf {target_shelf.shelf_id}")
+            placed.append({"product_id": product_id, "rfid_tag": product.rfid_tag, "shelf_id": target_shelf.shelf_id})
+            log.item("product_placed", product_id=product_id, shelf_id=target_shelf.shelf_id)
 
+        log.info("products_placed", inventory_id=inventory_id, requested=len(product_ids), placed=len(placed),
+                 shelves=len(shelf_inventory_records))
+        if placed:
+            event_bus.publish("placement", inventory_id, {"products": placed})
         return shelf_inventory_records
 
-    async def scan_shelf(self, shelf_id: str) -> Tuple[ShelfScan, List[Product]]:
-        """Perform a scan of a shelf and record found products"""
-        from src.Db.models import ShelfScan, ShelfScanItem
-
-        # Create a scan record
-        scan_hash = hashlib.sha256(str(datetime.datetime.now()).encode()).hexdigest()[:10]
-        scan_id = f"SCAN_{scan_hash}"
-
-        scan = ShelfScan(
-            scan_id=scan_id,
-            shelf_id=shelf_id,
-            scan_timestamp=datetime.datetime.now()
-        )
-        await self.db.insert(scan)
-
-        # Find all products that should be on this shelf
-        expected_products = await self.db.search(Product, all_results=True, shelf_id=shelf_id,
-                                                 status=ProductStatus.ON_SHELF)
-
-        # Simulate scanning (in a real system, this would connect to RFID readers)
-        found_products = []
-        missing_products = []
-
-        for product in expected_products:
+    async def move_products(self, moves: Iterable[ProductMove]) -> Dict[str, Any]:
+        """
+        Relocate products in one transaction: each gets its new shelf and ON_SHELF status, its open
+        ShelfInventory interval is closed and a new one is opened on the new shelf.
+        Moves to unknown shelves and of products that were sold or returned meanwhile are skipped. Moves to
+        a shelf of another inventory than the one the product was received into are rejected as failed.
+        """
+        moves = {move.product_id: move for move in moves}
+        skipped: Dict[str, str] = {}
+        failed: Dict[str, str] = {}
+        if not moves:
+            return {"moved": [], "skipped": skipped, "failed": failed}
+
+        targets = list({move.to_shelf for move in moves.values()})
+        shelf_inventories: Dict[str, str] = {}
+        for offset in range(0, len(targets), 500):
+            rows = (await self.session.exec(
+                select(Shelf.shelf_id, StorageRack.inventory_id)
+                .join(StorageRack, Shelf.rack_id == StorageRack.rack_id)
+                .where(Shelf.shelf_id.in_(targets[offset:offset + 500]))
+            )).all()
+            shelf_inventories.update(rows)
+
+        product_ids = list(moves)
+        statuses: Dict[str, ProductStatus] = {}
+        product_inventories: Dict[str, Optional[str]] = {}
+        for offset in range(0, len(product_ids), 500):
+            rows = (await self.session.exec(
+                select(Product.product_id, Product.status, SupplierReceipt.inventory_id)
+                .outerjoin(SupplierReceipt, Product.receipt_id == SupplierReceipt.receipt_id)
+                .where(Product.product_id.in_(product_ids[offset:offset + 500]))
+            )).all()
+            for product_id, product_status, inventory_id in rows:
+                statuses[product_id] = product_status
+                product_inventories[product_id] = inventory_id
+
+        moved: List[ProductMove] = []
+        by_target: Dict[str, List[str]] = {}
+        for product_id, move in moves.items():
+            status = statuses.get(product_id)
+            if move.to_shelf not in shelf_inventories:
+                skipped[product_id] = f"Shelf {move.to_shelf} not found"
+            elif status is None:
+                skipped[product_id] = "Product not found"
+            elif product_inventories[product_id] != shelf_inventories[move.to_shelf]:
+                failed[product_id] = (f"Shelf {move.to_shelf} is not in inventory "
+                                      f"{product_inventories[product_id]} of the product")
+            elif status not in (ProductStatus.ON_SHELF, ProductStatus.MISSING):
+                skipped[product_id] = f"Product is {ProductStatus(status).value}"
+            else:
+                moved.append(move)
+                by_target.setdefault(move.to_shelf, []).append(product_id)
+
+        if moved:
+            now = datetime.datetime.now()
+            moved_ids = [move.product_id for move in moved]
+            try:
+                for shelf_id, ids in by_target.items():
+                    for offset in range(0, len(ids), 500):
+                        await self.session.exec(
+                            update(Product)
+                            .where(Product.product_id.in_(ids[offset:offset + 500]))
+                            .values(shelf_id=shelf_id, status=ProductStatus.ON_SHELF)
+                        )
+                for offset in range(0, len(moved_ids), 500):
+                    await self.session.exec(
+                        update(ShelfInventory)
+                        .where(ShelfInventory.product_id.in_(moved_ids[offset:offset + 500]),
+                               ShelfInventory.removed_timestamp.is_(None))
+                        .values(removed_timestamp=now)
+                    )
+                await self.db.bulk_insert(ShelfInventory, [
+                    {"shelf_inventory_id": record_id, "shelf_id": move.to_shelf, "product_id": move.product_id,
+                     "added_timestamp": now}
+                    for record_id, move in zip(new_ids("SI", len(moved)), moved)
+                ], auto_commit=False)
+                await self.session.commit()
+            except Exception as e:
+                await self.session.rollback()
+                raise Exception(f"Failed to move products: {str(e)}")
+
+            moved_by_inventory: Dict[str, List[Dict[str, Any]]] = {}
+            for move in moved:
+                inventory_id = shelf_inventories[move.to_shelf]
+                tag_index.update(move.rfid_tag, move.product_id, ProductStatus.ON_SHELF, move.to_shelf, inventory_id)
+                moved_by_inventory.setdefault(inventory_id, []).append({
+                    "product_id": move.product_id, "rfid_tag": move.rfid_tag, "from_shelf_id": move.from_shelf,
+                    "shelf_id": move.to_shelf, "previous_status": ProductStatus(move.previous_status).value
+                })
+            for inventory_id, products in moved_by_inventory.items():
+                event_bus.publish("move", inventory_id, {"products": products})
+
+        if failed:
+            log.warning("product_moves_rejected", rejected=len(failed))
+        log.info("products_moved", moved=len(moved), skipped=len(skipped), failed=len(failed))
+        return {"moved": moved, "skipped": skipped, "failed": failed}
+
+    async def scan_shelf(self, shelf_id: str, detected_tags: Optional[Iterable[str]] = None,
+                         scan_timestamp: Optional[datetime.datetime] = None,
+                         with_products: bool = True) -> Tuple[ShelfScan, List[Product]]:
+        """
+        Perform a scan of a shelf and record found products.
+        detected_tags are the RFID tags the shelf reader reported, without them the read is simulated.
+        The expected tags come from the in-memory shelf state; the found products are only loaded when
+        with_products is set, background reconciliation of reader scans skips that query.
+        Products that were not found are reported missing once the missing buffer confirms them.
+        """
+        # Tags of all products that should be on this shelf
+        expected = await shelf_state.get_expected(self.session, shelf_id)
+
+        # Simulate scanning unless the reader reported what it saw
+        found_ids = []
+        missing_ids = []
+        detected = set(detected_tags) if detected_tags is not None else None
+
+        for rfid_tag, product_id in expected.items():
             # For simulation: 95% chance products are found
-            if random.random() < 0.95:
-                found_products.append(product)
-
-                # Create scan item record
-                scan_item_hash = hashlib.sha256(
-                    (scan_id + product.product_id).encode()
-                ).hexdigest()[:10]
-                scan_item_id = f"SCANITEM_{scan_item_hash}"
-
-                scan_item = ShelfScanItem(
-                    scan_item_id=scan_item_id,
-                    scan_id=scan_id,
-                    product_id=product.product_id
-                )
-                await self.db.insert(scan_item)
+            if (rfid_tag in detected) if detected is not None else random.random() < 0.95:
+                found_ids.append(product_id)
             else:
-                missing_products.append(product)
+                missing_ids.append(product_id)
+
+        # Tags of other shelves the reader heard here are part of the scan too, which also clears their
+        # missing suspicions; moving them is left to the location resolver
+        foreign_ids = []
+        if detected:
+            others = [tag for tag in detected if tag not in expected]
+            if others:
+                resolved = await tag_index.resolve_many(self.session, others)
+                foreign_ids = [info.product_id for info in resolved.values()]
+
+        # Store the scan, as a delta against the previous scan of this shelf when that is smaller
+        scan = await ScanStore(self.session).record_scan(shelf_id, found_ids + foreign_ids, scan_timestamp)
+
+        # Report missing products that were also missed by enough earlier scans
+        confirmed_ids = missing_buffer.observe(shelf_id, scan.scan_id, missing_ids, found_ids + foreign_ids,
+                                               scan.scan_timestamp)
+        for product_id in confirmed_ids:
+            await self.report_missing_product(product_id)
 
-        # Report missing products
-        for product in missing_products:
-            await self.report_missing_product(product.product_id)
+        found_products = []
+        if with_products and found_ids:
+            found_products = await self.db.search(Product, all_results=True, product_id__in=found_ids)
 
-        print(f"Shelf scan completed: Found {len(found_products)} products, Missing {len(missing_products)} products")
+        log.info("shelf_scanned", shelf_id=shelf_id, scan_id=scan.scan_id, found=len(found_ids),
+                 foreign=len(foreign_ids), missing=len(missing_ids), confirmed_missing=len(confirmed_ids))
         return scan, found_products
 
     async def report_missing_product(self, product_id: str) -> None:
@@ -271,11 +471,13 @@ class WarehouseManager:
             raise ValueError(f"Product {product_id} not found")
 
         # Get the inventory this product was in
+        inventory_id = None
         if product.shelf_id:
             shelf = await self.db.search(Shelf, all_results=False, shelf_id=product.shelf_id)
             if shelf:
                 rack = await self.db.search(StorageRack, all_results=False, rack_id=shelf.rack_id)
                 if rack:
+                    inventory_id = rack.inventory_id
                     # Update inventory theft count
                     inventory = await self.db.search(Inventory, all_results=False, inventory_id=rack.inventory_id)
                     if inventory:
@@ -302,6 +504,7 @@ class WarehouseManager:
             "receipt_id": product.receipt_id
         }
         await self.db.update_row(Product, search_criteria, update_data)
+        tag_index.update(product.rfid_tag, product_id, ProductStatus.MISSING, product.shelf_id, inventory_id)
 
         # If product was on a shelf, update ShelfInventory
         shelf_inventory = await self.db.search(
@@ -323,7 +526,15 @@ class WarehouseManager:
             }
             await self.db.update_row(ShelfInventory, search_criteria, update_data)
 
-        print(f"Product {product_id} marked as missing")
+        event_bus.publish("missing", inventory_id, {
+            "product_id": product_id,
+            "product_name": product.product_name,
+            "rfid_tag": product.rfid_tag,
+            "shelf_id": product.shelf_id,
+            "price": product.price
+        })
+        missing_reported.inc()
+        log.info("product_missing", product_id=product_id, inventory_id=inventory_id, shelf_id=product.shelf_id)
 
     async def record_product_sale(self, product_id: str, inventory_id: str) -> Sale:
         """Record a product sale and update its status"""
@@ -332,10 +543,7 @@ class WarehouseManager:
             raise ValueError(f"Product {product_id} not found")
 
         # Create sale record
-        sale_hash = hashlib.sha256(
-            (str(datetime.datetime.now()) + product_id).encode()
-        ).hexdigest()[:10]
-        sale_id = f"SALE_{sale_hash}"
+        sale_id = new_id("SALE")
 
         sale = Sale(
             sale_id=sale_id,
@@ -380,10 +588,104 @@ class WarehouseManager:
 
         # Insert sale
         await self.db.insert(sale)
-        print(f"Recorded sale of product {product_id} from inventory {inventory_id}")
+        tag_index.update(product.rfid_tag, product_id, ProductStatus.SOLD, None, inventory_id)
+        event_bus.publish("sale", inventory_id, {"products": [
+            {"product_id": product_id, "rfid_tag": product.rfid_tag, "price": product.price}
+        ]})
+        products_sold.inc()
+        log.info("product_sold", product_id=product_id, inventory_id=inventory_id)
 
         return sale
 
+    async def checkout_products(self, rfid_tags: Optional[List[str]] = None, product_ids: Optional[List[str]] = None,
+                                inventory_id: Optional[str] = None) -> Dict[str, Any]:
+        """
+        Sell a basket of products, identified by RFID tag and/or product ID, in one transaction.
+        Items that can not be sold are reported in "failed" and do not abort the rest of the basket.
+        """
+        rfid_tags = rfid_tags or []
+        product_ids = product_ids or []
+        failed: Dict[str, str] = {}
+
+        # Resolve every item together with the inventory of its shelf in one query
+        epc_tags = [tag for tag in rfid_tags if is_epc_tag(tag)]
+        query = (
+            select(Product, StorageRack.inventory_id)
+            .outerjoin(Shelf, Product.shelf_id == Shelf.shelf_id)
+            .outerjoin(StorageRack, Shelf.rack_id == StorageRack.rack_id)
+            .where(or_(Product.rfid_tag.in_(epc_tags), Product.product_id.in_(product_ids)))
+        )
+        rows = (await self.session.exec(query)).all() if epc_tags or product_ids else []
+        by_tag = {product.rfid_tag: (product, inv_id) for product, inv_id in rows}
+        by_id = {product.product_id: (product, inv_id) for product, inv_id in rows}
+
+        now = datetime.datetime.now()
+        sales: List[Sale] = []
+        sold_ids = set()
+        identifiers = [(tag, by_tag.get(tag)) for tag in rfid_tags] + [(pid, by_id.get(pid)) for pid in product_ids]
+        for identifier, resolved in identifiers:
+            if not resolved:
+                failed[identifier] = "Product not found"
+                continue
+            product, product_inventory_id = resolved
+            if product.product_id in sold_ids:
+                failed[identifier] = "Duplicate item in basket"
+                continue
+            if product.status == ProductStatus.SOLD:
+                failed[identifier] = "Product already sold"
+                continue
+            sale_inventory_id = inventory_id or product_inventory_id
+            if not sale_inventory_id:
+                failed[identifier] = "Cannot determine inventory for product"
+                continue
+            if inventory_id and product_inventory_id and product_inventory_id != inventory_id:
+                failed[identifier] = f"Product belongs to inventory {product_inventory_id}"
+                continue
+
+            sales.append(Sale(
+                product_id=product.product_id,
+                inventory_id=sale_inventory_id,
+                sale_timestamp=now
+            ))
+            sold_ids.add(product.product_id)
+
+        for sale, sale_id in zip(sales, new_ids("SALE", len(sales))):
+            sale.sale_id = sale_id
+
+        if sales:
+            try:
+                await self.db.bulk_insert(Sale, [sale.model_dump() for sale in sales], auto_commit=False)
+                await self.session.exec(
+                    update(Product)
+                    .where(Product.product_id.in_(sold_ids))
+                    .values(status=ProductStatus.SOLD, shelf_id=None)
+                )
+                await self.session.exec(
+                    update(ShelfInventory)
+                    .where(ShelfInventory.product_id.in_(sold_ids), ShelfInventory.removed_timestamp.is_(None))
+                    .values(removed_timestamp=now)
+                )
+                await self.session.commit()
+            except Exception as e:
+                await self.session.rollback()
+                raise Exception(f"Failed to record checkout: {str(e)}")
+
+            sale_inventories = {sale.product_id: sale.inventory_id for sale in sales}
+            sold_by_inventory: Dict[str, List[Dict[str, Any]]] = {}
+            for product, _ in by_id.values():
+                if product.product_id in sale_inventories:
+                    tag_index.update(product.rfid_tag, product.product_id, ProductStatus.SOLD, None,
+                                     sale_inventories[product.product_id])
+                    sold_by_inventory.setdefault(sale_inventories[product.product_id], []).append(
+                        {"product_id": product.product_id, "rfid_tag": product.rfid_tag, "price": product.price}
+                    )
+            products_sold.inc(amount=len(sales))
+            for sale_inventory_id, products in sold_by_inventory.items():
+                event_bus.publish("sale", sale_inventory_id, {"products": products})
+
+        log.info("checkout_completed", inventory_id=inventory_id, sold=len(sales), failed=len(failed))
+        return {"sales": sales, "failed": failed}
+
     async def get_inventory_statistics(self, inventory_id: str) -> Dict[str, Any]:
         """Get comprehensive statistics about an inventory"""
         inventory = await self.db.search(Inventory, all_results=False, inventory_id=inventory_id)
@@ -460,59 +762,23 @@ class WarehouseManager:
 
         return statistics
 
-    async def restock_inventory(self, inventory_id: str, supplier_id: str, min_threshold: int = 10) -> Optional[str]:
+    async def restock_inventory(self, inventory_id: str, supplier_id: str, min_threshold: int = 10,
+                                product_name: Optional[str] = None) -> Optional[str]:
         """Automatically restock inventory if stock falls below threshold"""
-        # Check current stock
         inventory = await self.db.search(Inventory, all_results=False, inventory_id=inventory_id)
         if not inventory:
             raise ValueError(f"Inventory {inventory_id} not found")
 
-        # Get all racks in this inventory
-        racks = await self.db.search(StorageRack, all_results=True, inventory_id=inventory_id)
-        rack_ids = [rack.rack_id for rack in racks]
-
-        # Get all shelves in these racks
-        all_shelves = []
-        for rack_id in rack_ids:
-            shelves = await self.db.search(Shelf, all_results=True, rack_id=rack_id)
-            all_shelves.extend(shelves)
-
-        shelf_ids = [shelf.shelf_id for shelf in all_shelves]
-
-        # Count products on shelves
-        products_on_shelf = []
-        for shelf_id in shelf_ids:
-            products = await self.db.search(
-                Product,
-                all_results=True,
-                shelf_id=shelf_id,
-                status=ProductStatus.ON_SHELF
-            )
-            products_on_shelf.extend(products)
-
-        # If below threshold, trigger restock
-        if len(products_on_shelf) < min_threshold:
-            print(
-                f"Inventory {inventory_id} below threshold ({len(products_on_shelf)}/{min_threshold}). Triggering restock.")
-
-            # This would typically call into SupplierManager to order more products
-            # For demonstration purposes, let's simulate that here
-
-            # Call an external SupplierManager to create new products (assuming it exists)
-            # This is a placeholder - in a real system you'd import and use SupplierManager
-            from Backend.src.manager.supplier_manager import SupplierManager
-            supplier_manager = SupplierManager(self.session)
-
-            # Order new products (20 is arbitrary for demo)
-            products, receipt_id = await supplier_manager.create_random_products(
-                supplier_id=supplier_id,
-                supplier_name="Auto Restock Supplier",
-                inventory_id=inventory_id,
-                count=20
-            )
-
-            print(f"Restock order placed: Receipt ID {receipt_id}, {len(products)} products ordered")
-            return receipt_id
+        # Stock levels come from one grouped COUNT query instead of loading every product
+        orders = await RestockManager(self.session).restock_low_inventories(
+            min_threshold=min_threshold,
+            order_size=20,
+            product_name=product_name,
+            supplier_id=supplier_id,
+            inventory_ids=[inventory_id]
+        )
+        if inventory_id in orders:
+            return orders[inventory_id]
 
-        print(f"Inventory {inventory_id} has sufficient stock: {len(products_on_shelf)}/{min_threshold}")
-        return None
\ No newline at end of file
+        log.info("restock_not_needed", inventory_id=inventory_id)
+        return None
@@ -0,0 +1,78 @@
+"""
+Local stand-in for an OpenTelemetry collector: accepts OTLP/HTTP JSON trace exports and appends the spans to
+a JSONL file that python -m src.tracing.summary reads.
+
+    python -m src.tracing.collector --port 4318 --out traces.jsonl
+
+Point TRACE_EXPORTER=otlp and TRACE_OTLP_ENDPOINT at http://127.0.0.1:4318/v1/traces. A real collector
+listening on the same port takes its place without changes to the app.
+"""
+import argparse
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from .export import from_otlp, write_spans
+
+
+class CollectorServer(ThreadingHTTPServer):
+    daemon_threads = True
+
+    def __init__(self, address, out_path: str):
+        super().__init__(address, OtlpHandler)
+        self.out_file = open(out_path, "a")
+        self.lock = threading.Lock()
+        self.spans = 0
+
+    def server_close(self):
+        super().server_close()
+        self.out_file.close()
+
+
+class OtlpHandler(BaseHTTPRequestHandler):
+    def do_POST(self):
+        if self.path != "/v1/traces":
+            self.send_error(404)
+            return
+        if not self.headers.get("Content-Type", "").startswith("application/json"):
+            self.send_error(415, "Only the OTLP JSON encoding is supported")
+            return
+        try:
+            spans = from_otlp(json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0)))))
+        except (ValueError, KeyError, TypeError) as e:
+            self.send_error(400, f"Invalid OTLP payload: {str(e)}")
+            return
+        with self.server.lock:
+            write_spans(self.server.out_file, spans)
+            self.server.out_file.flush()
+            self.server.spans += len(spans)
+        body = b'{"partialSuccess":{}}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local OTLP/HTTP JSON trace collector")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=4318)
+    parser.add_argument("--out", default="traces.jsonl", help="JSONL file the spans are appended to")
+    args = parser.parse_args()
+    server = CollectorServer((args.host, args.port), args.out)
+    print(f"Collecting traces on http://{args.host}:{args.port}/v1/traces into {args.out}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+        print(f"Collected {server.spans} spans")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,199 @@
+import json
+import os
+import queue
+import threading
+import urllib.request
+from typing import Optional, Dict, List, Any, Iterable
+
+from ..utils.log import get_logger
+
+log = get_logger("tracing")
+
+SERVICE_NAME = "theftblock-backend"
+KINDS = {"internal": 1, "server": 2, "client": 3}
+KIND_NAMES = {number: name for name, number in KINDS.items()}
+
+
+class SpanExporter:
+    """
+    Finished traces go through a bounded queue to a writer thread that serializes and writes them in batches,
+    so the event loop only enqueues. A full queue drops the trace.
+    """
+
+    def __init__(self, queue_size: int = 1_000, batch_size: int = 100):
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=queue_size)
+        self._thread: Optional[threading.Thread] = None
+        self.exported = 0
+        self.dropped = 0
+        self.failed = 0
+
+    def export(self, trace) -> None:
+        try:
+            self._queue.put_nowait(trace)
+        except queue.Full:
+            self.dropped += 1
+
+    def write(self, spans: List[Dict[str, Any]]) -> None:
+        raise NotImplementedError
+
+    def close(self) -> None:
+        pass
+
+    def _run(self):
+        while True:
+            traces = [self._queue.get()]
+            while len(traces) < self.batch_size:
+                try:
+                    traces.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            stopping = traces[-1] is None
+            traces = [trace for trace in traces if trace is not None]
+            if traces:
+                try:
+                    self.write([span.to_dict() for trace in traces for span in trace.spans])
+                    self.exported += len(traces)
+                except Exception as e:
+                    self.failed += len(traces)
+                    log.warning("trace_export_failed", traces=len(traces), error=str(e))
+            if stopping:
+                return
+
+    def start(self) -> None:
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name=type(self).__name__, daemon=True)
+            self._thread.start()
+
+    def stop(self) -> None:
+        if self._thread is not None:
+            self._queue.put(None)
+            self._thread.join()
+            self._thread = None
+        self.close()
+
+    def stats(self) -> Dict[str, int]:
+        return {"queued": self._queue.qsize(), "exported": self.exported, "dropped": self.dropped,
+                "failed": self.failed}
+
+
+class JsonlSpanExporter(SpanExporter):
+    """One span per line in path, rotated to path.1 .. path.<backup_count> once it reaches max_bytes"""
+
+    def __init__(self, path: str, max_bytes: int = 50_000_000, backup_count: int = 5, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.backup_count = backup_count
+        self._file = None
+
+    def write(self, spans: List[Dict[str, Any]]) -> None:
+        if self._file is None:
+            self._file = open(self.path, "a")
+        write_spans(self._file, spans)
+        self._file.flush()
+        if self.max_bytes and self._file.tell() >= self.max_bytes:
+            self._rotate()
+
+    def _rotate(self) -> None:
+        self._file.close()
+        self._file = None
+        for number in range(self.backup_count - 1, 0, -1):
+            if os.path.exists(f"{self.path}.{number}"):
+                os.replace(f"{self.path}.{number}", f"{self.path}.{number + 1}")
+        if self.backup_count:
+            os.replace(self.path, f"{self.path}.1")
+        else:
+            os.remove(self.path)
+
+    def close(self) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+
+class OtlpHttpSpanExporter(SpanExporter):
+    """Posts batches as OTLP/HTTP JSON to a collector, such as python -m src.tracing.collector"""
+
+    def __init__(self, endpoint: str, timeout: float = 5.0, **kwargs):
+        super().__init__(**kwargs)
+        self.endpoint = endpoint
+        self.timeout = timeout
+
+    def write(self, spans: List[Dict[str, Any]]) -> None:
+        request = urllib.request.Request(self.endpoint, data=json.dumps(to_otlp(spans), default=str).encode(),
+                                         headers={"Content-Type": "application/json"}, method="POST")
+        with urllib.request.urlopen(request, timeout=self.timeout) as response:
+            response.read()
+
+
+def write_spans(file, spans: Iterable[Dict[str, Any]]) -> None:
+    file.write("".join(json.dumps(span, default=str, separators=(",", ":")) + "\n" for span in spans))
+
+
+def _otlp_value(value: Any) -> Dict[str, Any]:
+    if isinstance(value, bool):
+        return {"boolValue": value}
+    if isinstance(value, int):
+        return {"intValue": str(value)}
+    if isinstance(value, float):
+        return {"doubleValue": value}
+    return {"stringValue": str(value)}
+
+
+def _plain_value(value: Dict[str, Any]) -> Any:
+    if "intValue" in value:
+        return int(value["intValue"])
+    for key in ("boolValue", "doubleValue", "stringValue"):
+        if key in value:
+            return value[key]
+    return None
+
+
+def to_otlp(spans: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """Spans as an OTLP ExportTraceServiceRequest in its JSON encoding"""
+    otlp_spans = []
+    for span in spans:
+        start = int(span["start"] * 1e9)
+        otlp_span = {
+            "traceId": span["trace_id"],
+            "spanId": span["span_id"],
+            "name": span["name"],
+            "kind": KINDS.get(span["kind"], 1),
+            "startTimeUnixNano": str(start),
+            "endTimeUnixNano": str(start + int(span["duration_ms"] * 1e6)),
+            "attributes": [{"key": key, "value": _otlp_value(value)} for key, value in span["attributes"].items()],
+            "status": {"code": 2, "message": span["error"]} if span.get("error") else {"code": 1}
+        }
+        if span["parent_id"]:
+            otlp_span["parentSpanId"] = span["parent_id"]
+        otlp_spans.append(otlp_span)
+    return {"resourceSpans": [{
+        "resource": {"attributes": [{"key": "service.name", "value": {"stringValue": SERVICE_NAME}}]},
+        "scopeSpans": [{"scope": {"name": "theftblock"}, "spans": otlp_spans}]
+    }]}
+
+
+def from_otlp(payload: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Spans of an OTLP JSON export request in the JSONL exporter's format"""
+    spans = []
+    for resource_spans in payload.get("resourceSpans", []):
+        for scope_spans in resource_spans.get("scopeSpans", []):
+            for otlp_span in scope_spans.get("spans", []):
+                start = int(otlp_span["startTimeUnixNano"])
+                span = {
+                    "trace_id": otlp_span["traceId"],
+                    "span_id": otlp_span["spanId"],
+                    "parent_id": otlp_span.get("parentSpanId") or None,
+                    "name": otlp_span["name"],
+                    "kind": KIND_NAMES.get(otlp_span.get("kind"), "internal"),
+                    "start": round(start / 1e9, 6),
+                    "duration_ms": round((int(otlp_span["endTimeUnixNano"]) - start) / 1e6, 3),
+                    "attributes": {attribute["key"]: _plain_value(attribute["value"])
+                                   for attribute in otlp_span.get("attributes", [])}
+                }
+                status = otlp_span.get("status", {})
+                if status.get("code") == 2:
+                    span["error"] = status.get("message", "")
+                spans.append(span)
+    return spans
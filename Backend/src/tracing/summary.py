@@ -0,0 +1,165 @@
+"""
+Flame summary of the slowest traces in exported span files.
+
+    python -m src.tracing.summary traces.jsonl traces.jsonl.1 --top 5
+    python -m src.tracing.summary traces.jsonl --match "/inventory/{inventory_id}" --depth 4
+
+Sibling spans of the same name (the same statement for sql spans) are merged into one line with their count,
+so a loop of 300 identical queries shows as one 300x line. Each line shows the total time, its share of the
+trace and the self time, the part not spent in child spans. Hot spots sums self time over the printed traces.
+"""
+import argparse
+import json
+from collections import defaultdict
+from typing import Optional, Dict, List, Any, Iterable
+
+BAR_WIDTH = 30
+
+
+class Node:
+    """Spans of one label under the same parent, merged"""
+
+    def __init__(self, label: str):
+        self.label = label
+        self.count = 0
+        self.total_ms = 0.0
+        self.self_ms = 0.0
+        self.errors = 0
+        self.children: Dict[str, "Node"] = {}
+
+
+def label(span: Dict[str, Any]) -> str:
+    statement = span["attributes"].get("db.statement")
+    return f"sql {statement}" if statement else span["name"]
+
+
+def load_spans(paths: Iterable[str]) -> Dict[str, List[Dict[str, Any]]]:
+    traces = defaultdict(list)
+    for path in paths:
+        with open(path) as file:
+            for line in file:
+                line = line.strip()
+                if line:
+                    span = json.loads(line)
+                    traces[span["trace_id"]].append(span)
+    return traces
+
+
+def find_root(spans: List[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    """The span whose parent is not in the trace, the earliest if the trace was cut short"""
+    span_ids = {span["span_id"] for span in spans}
+    roots = [span for span in spans if not span["parent_id"] or span["parent_id"] not in span_ids]
+    return min(roots, key=lambda span: span["start"]) if roots else None
+
+
+def build_tree(root: Dict[str, Any], spans: List[Dict[str, Any]]) -> Node:
+    children = defaultdict(list)
+    for span in spans:
+        children[span["parent_id"]].append(span)
+    tree = Node(label(root))
+    _merge(tree, root, children)
+    return tree
+
+
+def _merge(node: Node, span: Dict[str, Any], children: Dict[str, List[Dict[str, Any]]]) -> None:
+    child_spans = children.get(span["span_id"], [])
+    node.count += 1
+    node.total_ms += span["duration_ms"]
+    node.self_ms += max(0.0, span["duration_ms"] - sum(child["duration_ms"] for child in child_spans))
+    node.errors += 1 if span.get("error") else 0
+    for child in child_spans:
+        child_label = label(child)
+        child_node = node.children.get(child_label)
+        if child_node is None:
+            child_node = node.children[child_label] = Node(child_label)
+        _merge(child_node, child, children)
+
+
+def render(node: Node, trace_ms: float, depth: int, min_percent: float, width: int,
+           indent: int = 0, lines: Optional[List[str]] = None) -> List[str]:
+    lines = [] if lines is None else lines
+    share = node.total_ms / trace_ms if trace_ms else 0.0
+    bar = "#" * max(1, round(share * BAR_WIDTH))
+    count = f"{node.count}x " if node.count > 1 else ""
+    errors = f" [{node.errors} failed]" if node.errors else ""
+    text = f"{'  ' * indent}{count}{node.label}{errors}"
+    lines.append(f"{bar:<{BAR_WIDTH}} {node.total_ms:>10.1f} ms {share:>6.1%} self {node.self_ms:>9.1f} ms  "
+                 f"{text[:width]}")
+    if indent + 1 >= depth:
+        return lines
+    hidden = 0
+    for child in sorted(node.children.values(), key=lambda child: child.total_ms, reverse=True):
+        if trace_ms and child.total_ms / trace_ms * 100 < min_percent:
+            hidden += 1
+            continue
+        render(child, trace_ms, depth, min_percent, width, indent + 1, lines)
+    if hidden:
+        lines.append(f"{'':<{BAR_WIDTH}} {'':>10}    {'':>6}      {'':>9}     {'  ' * (indent + 1)}"
+                     f"... {hidden} more under {min_percent}%")
+    return lines
+
+
+def hot_spots(trees: List[Node]) -> List[Node]:
+    """Self time and count per label over the trees, largest self time first"""
+    totals: Dict[str, Node] = {}
+
+    def add(node: Node):
+        total = totals.get(node.label)
+        if total is None:
+            total = totals[node.label] = Node(node.label)
+        total.count += node.count
+        total.total_ms += node.total_ms
+        total.self_ms += node.self_ms
+        for child in node.children.values():
+            add(child)
+
+    for tree in trees:
+        add(tree)
+    return sorted(totals.values(), key=lambda node: node.self_ms, reverse=True)
+
+
+def summarize(traces: Dict[str, List[Dict[str, Any]]], top: int = 5, match: Optional[str] = None,
+              depth: int = 8, min_percent: float = 1.0, width: int = 140) -> str:
+    roots = []
+    for trace_id, spans in traces.items():
+        root = find_root(spans)
+        if root is not None and (match is None or match in root["name"]):
+            roots.append((root, spans))
+    roots.sort(key=lambda item: item[0]["duration_ms"], reverse=True)
+    if not roots:
+        return "No matching traces"
+
+    lines = [f"{len(roots)} traces, the {min(top, len(roots))} slowest:"]
+    trees = []
+    for root, spans in roots[:top]:
+        tree = build_tree(root, spans)
+        trees.append(tree)
+        dropped = root["attributes"].get("spans_dropped")
+        lines.append("")
+        lines.append(f"trace {root['trace_id']}  {root['name']}  {root['duration_ms']:.1f} ms, {len(spans)} spans"
+                     f"{f', {dropped} dropped' if dropped else ''}")
+        render(tree, root["duration_ms"], depth, min_percent, width, lines=lines)
+
+    traced_ms = sum(tree.total_ms for tree in trees)
+    lines.append("")
+    lines.append("Hot spots (self time over these traces):")
+    for node in hot_spots(trees)[:10]:
+        share = node.self_ms / traced_ms if traced_ms else 0.0
+        lines.append(f"{node.self_ms:>10.1f} ms {share:>6.1%} {node.count:>7}x  {node.label[:width]}")
+    return "\n".join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Flame summary of the slowest exported traces")
+    parser.add_argument("files", nargs="+", help="JSONL span files, rotated ones included")
+    parser.add_argument("--top", type=int, default=5, help="Slowest traces to show")
+    parser.add_argument("--match", help="Only traces whose root span name contains this")
+    parser.add_argument("--depth", type=int, default=8, help="Levels of the tree to show")
+    parser.add_argument("--min-percent", type=float, default=1.0, help="Hide spans under this share of the trace")
+    parser.add_argument("--width", type=int, default=140, help="Characters of each span label")
+    args = parser.parse_args()
+    print(summarize(load_spans(args.files), args.top, args.match, args.depth, args.min_percent, args.width))
+
+
+if __name__ == "__main__":
+    main()
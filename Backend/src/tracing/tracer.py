@@ -0,0 +1,304 @@
+import asyncio
+import functools
+import inspect
+import random
+import time
+from contextvars import ContextVar
+from typing import Optional, Dict, List, Any
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from ..Db.profiler import fingerprint
+
+
+def new_trace_id() -> str:
+    return f"{random.getrandbits(128):032x}"
+
+
+def new_span_id() -> str:
+    return f"{random.getrandbits(64):016x}"
+
+
+class Span:
+    """
+    A timed operation of a trace. Used as a context manager it becomes the current span, the parent of spans
+    opened inside it in the same task and of the tasks created there.
+    """
+
+    __slots__ = ("trace", "span_id", "parent_id", "name", "kind", "attributes", "start", "duration", "error",
+                 "_started", "_token")
+
+    def __init__(self, trace: "Trace", name: str, kind: str, parent_id: Optional[str],
+                 attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = new_span_id()
+        self.parent_id = parent_id
+        self.name = name
+        self.kind = kind
+        self.attributes = attributes
+        self.start = 0.0  # Unix time
+        self.duration = 0.0  # Seconds
+        self.error: Optional[str] = None
+        self._started = 0.0
+        self._token = None
+
+    def set(self, **attributes) -> None:
+        self.attributes.update(attributes)
+
+    def rename(self, name: str) -> None:
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.time()
+        self._started = time.perf_counter()
+        self._token = current_span.set(self)
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        self.duration = time.perf_counter() - self._started
+        if exc_type is not None and not issubclass(exc_type, asyncio.CancelledError):
+            self.error = f"{exc_type.__name__}: {exc}"
+        current_span.reset(self._token)
+        self.trace.finish(self)
+        return False
+
+    def to_dict(self) -> Dict[str, Any]:
+        entry = {
+            "trace_id": self.trace.trace_id,
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "kind": self.kind,
+            "start": round(self.start, 6),
+            "duration_ms": round(self.duration * 1000, 3),
+            "attributes": self.attributes
+        }
+        if self.error:
+            entry["error"] = self.error
+        return entry
+
+
+class _NoopSpan:
+    """Stands in for a span outside a sampled trace, so callers never check"""
+
+    name = ""
+
+    def set(self, **attributes) -> None:
+        pass
+
+    def rename(self, name: str) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NOOP_SPAN = _NoopSpan()
+# Current span while inside a trace that was not sampled, so nothing below it starts a trace of its own
+UNSAMPLED = _NoopSpan()
+
+
+class _UnsampledScope:
+    __slots__ = ("_token",)
+
+    def __enter__(self):
+        self._token = current_span.set(UNSAMPLED)
+        return NOOP_SPAN
+
+    def __exit__(self, exc_type, exc, traceback):
+        current_span.reset(self._token)
+        return False
+
+
+class Trace:
+    """Spans of one sampled trace, handed to the exporter when the root span ends"""
+
+    def __init__(self, tracer: "Tracer", trace_id: str, max_spans: int):
+        self.tracer = tracer
+        self.trace_id = trace_id
+        self.max_spans = max_spans
+        self.spans: List[Span] = []
+        self.root: Optional[Span] = None
+        self.dropped = 0
+        self.closed = False
+
+    def open(self, name: str, kind: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        if self.closed or len(self.spans) >= self.max_spans:
+            self.dropped += 1
+            return NOOP_SPAN
+        span = Span(self, name, kind, parent_id, attributes)
+        self.spans.append(span)
+        if self.root is None:
+            self.root = span
+        return span
+
+    def record(self, name: str, kind: str, parent_id: str, start: float, duration: float,
+               attributes: Dict[str, Any], error: Optional[str] = None) -> None:
+        """Add a span that already ended, timed by the caller"""
+        span = self.open(name, kind, parent_id, attributes)
+        if span is not NOOP_SPAN:
+            span.start = start
+            span.duration = duration
+            span.error = error
+
+    def finish(self, span: Span) -> None:
+        if span is self.root:
+            self.closed = True
+            if self.dropped:
+                span.attributes["spans_dropped"] = self.dropped
+            self.tracer.export(self)
+
+
+current_span: ContextVar[Optional[Any]] = ContextVar("current_span", default=None)
+
+
+class Tracer:
+    """
+    Head-based sampling: whether a trace is recorded is decided once, when its root span starts, and spans
+    inside an unsampled trace cost a context variable lookup. Without an exporter nothing is traced.
+    """
+
+    def __init__(self):
+        self.exporter = None
+        self.sample_rate = 0.0
+        self.max_spans = 5_000
+        self.traces_started = 0
+        self.traces_sampled = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.exporter is not None
+
+    def configure(self, exporter, sample_rate: float, max_spans: int = 5_000) -> None:
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.max_spans = max_spans
+
+    def start_trace(self, name: str, kind: str = "internal", sampled: Optional[bool] = None,
+                    trace_id: Optional[str] = None, parent_id: Optional[str] = None, **attributes):
+        """
+        Root span of a new trace, sampled at sample_rate unless sampled is given (a caller's traceparent).
+        trace_id and parent_id continue a trace started by the caller.
+        """
+        if self.exporter is None:
+            return NOOP_SPAN
+        self.traces_started += 1
+        if sampled is None:
+            sampled = random.random() < self.sample_rate
+        if not sampled:
+            return _UnsampledScope()
+        self.traces_sampled += 1
+        return Trace(self, trace_id or new_trace_id(), self.max_spans).open(name, kind, parent_id, attributes)
+
+    def span(self, name: str, kind: str = "internal", root: bool = True, **attributes):
+        """
+        Child of the current span. Outside any trace it starts one when root, otherwise it does nothing,
+        for operations not worth a trace of their own.
+        """
+        parent = current_span.get()
+        if parent is None:
+            return self.start_trace(name, kind, **attributes) if root else NOOP_SPAN
+        if parent is UNSAMPLED:
+            return NOOP_SPAN
+        return parent.trace.open(name, kind, parent.span_id, attributes)
+
+    def export(self, trace: Trace) -> None:
+        if self.exporter is not None:
+            self.exporter.export(trace)
+
+    def stats(self) -> Dict[str, Any]:
+        stats = {"sample_rate": self.sample_rate, "traces_started": self.traces_started,
+                 "traces_sampled": self.traces_sampled}
+        if self.exporter is not None:
+            stats.update(self.exporter.stats())
+        return stats
+
+
+tracer = Tracer()
+
+
+def traced(cls=None, root: bool = True):
+    """
+    Class decorator giving every public coroutine method a span named Class.method. With root=False the
+    methods are only traced inside a trace that is already running.
+    """
+    def decorate(cls):
+        for name, method in list(vars(cls).items()):
+            if name.startswith("_") or not inspect.iscoroutinefunction(method):
+                continue
+            setattr(cls, name, _spanned(method, f"{cls.__name__}.{name}", root))
+        return cls
+    return decorate(cls) if cls is not None else decorate
+
+
+def _spanned(method, span_name: str, root: bool):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        span = tracer.span(span_name, root=root)
+        if span is NOOP_SPAN:
+            return await method(*args, **kwargs)
+        with span:
+            return await method(*args, **kwargs)
+    return wrapper
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    parent = current_span.get()
+    if isinstance(parent, Span):
+        conn.info.setdefault("trace_started", []).append((parent, time.time(), time.perf_counter()))
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info.get("trace_started")
+    if started:
+        parent, start, perf_start = started.pop()
+        attributes = {"db.statement": fingerprint(statement)}
+        if executemany:
+            attributes["db.rows"] = len(parameters)
+        parent.trace.record("sql", "client", parent.span_id, start, time.perf_counter() - perf_start, attributes)
+
+
+def _handle_error(context):
+    started = context.connection.info.get("trace_started") if context.connection is not None else None
+    if started:
+        parent, start, perf_start = started.pop()
+        parent.trace.record("sql", "client", parent.span_id, start, time.perf_counter() - perf_start,
+                            {"db.statement": fingerprint(context.statement or "")},
+                            error=f"{type(context.original_exception).__name__}: {context.original_exception}")
+
+
+def install_sql_tracing(engine: Engine) -> None:
+    """Give every statement of the engine (the sync_engine of an async one) a span in the current trace"""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+        event.listen(engine, "handle_error", _handle_error)
+
+
+def setup_tracing_from_settings() -> None:
+    """Start the configured exporter when TRACING_ENABLED"""
+    from ..config.Settings import settings
+    from .export import JsonlSpanExporter, OtlpHttpSpanExporter
+    if not settings.TRACING_ENABLED:
+        return
+    if settings.TRACE_EXPORTER == "otlp":
+        exporter = OtlpHttpSpanExporter(settings.TRACE_OTLP_ENDPOINT, queue_size=settings.TRACE_QUEUE_SIZE)
+    elif settings.TRACE_EXPORTER == "jsonl":
+        exporter = JsonlSpanExporter(settings.TRACE_FILE, max_bytes=settings.TRACE_FILE_MAX_BYTES,
+                                     queue_size=settings.TRACE_QUEUE_SIZE)
+    else:
+        raise ValueError(f"Unknown trace exporter {settings.TRACE_EXPORTER}, expected jsonl or otlp")
+    exporter.start()
+    tracer.configure(exporter, settings.TRACE_SAMPLE_RATE, settings.TRACE_MAX_SPANS)
+
+
+def shutdown_tracing() -> None:
+    """Stop tracing once the finished traces are exported"""
+    exporter = tracer.exporter
+    tracer.exporter = None
+    if exporter is not None:
+        exporter.stop()
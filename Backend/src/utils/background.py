@@ -0,0 +1,64 @@
+import asyncio
+from typing import Optional, Callable, Awaitable, Union
+
+from .log import get_logger
+
+log = get_logger("background")
+
+
+class BackgroundTask:
+    """
+    The asyncio task of a long running component. start() runs the coroutine function unless it is already
+    running, stop() cancels it and waits until it has finished.
+    """
+
+    def __init__(self, run: Callable[[], Awaitable[None]]):
+        self.run = run
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self) -> None:
+        if not self.running:
+            self._task = asyncio.create_task(self.run())
+
+    async def stop(self) -> None:
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+
+class PeriodicTask(BackgroundTask):
+    """
+    Awaits job after every delay, given in seconds or as a function returning the seconds until the next
+    run. A failing run is logged and the schedule goes on.
+    """
+
+    def __init__(self, name: str, job: Callable[[], Awaitable[object]],
+                 delay: Union[float, Callable[[], float]], run_immediately: bool = False):
+        super().__init__(self._loop)
+        self.name = name
+        self.job = job
+        self.delay = delay
+        self.run_immediately = run_immediately
+
+    async def run_job(self) -> None:
+        try:
+            await self.job()
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            log.error("periodic_task_failed", task=self.name, error=str(e))
+
+    async def _loop(self) -> None:
+        if self.run_immediately:
+            await self.run_job()
+        while True:
+            await asyncio.sleep(self.delay() if callable(self.delay) else self.delay)
+            await self.run_job()
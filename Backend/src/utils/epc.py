@@ -0,0 +1,37 @@
+"""
+RFID tags are EPCs written as "RFID_" followed by the hex of the EPC, 24 digits for EPC-96 tags and 32 for
+128-bit tags. The database stores the raw 12 or 16 bytes; the string form is what the API, logs and
+reader protocols use.
+"""
+import re
+import uuid
+
+TAG_PREFIX = "RFID_"
+EPC_SIZES = (12, 16)
+_TAG_PATTERN = re.compile(r"RFID_(?:[0-9a-fA-F]{24}|[0-9a-fA-F]{32})\Z")
+
+
+def is_epc_tag(rfid_tag) -> bool:
+    return isinstance(rfid_tag, str) and _TAG_PATTERN.match(rfid_tag) is not None
+
+
+def tag_to_epc(rfid_tag: str) -> bytes:
+    # Runs for every bound tag, so it avoids the regex: with the length checked first fromhex can only
+    # return 12 or 16 bytes for exactly 24 or 32 hex digits
+    if isinstance(rfid_tag, str) and len(rfid_tag) in (29, 37) and rfid_tag.startswith(TAG_PREFIX):
+        try:
+            epc = bytes.fromhex(rfid_tag[5:])
+            if len(epc) in EPC_SIZES:
+                return epc
+        except ValueError:
+            pass
+    raise ValueError(f"{rfid_tag!r} is not an RFID_ tag with a 96 or 128 bit EPC")
+
+
+def epc_to_tag(epc) -> str:
+    return TAG_PREFIX + bytes(epc).hex()
+
+
+def new_rfid_tag() -> str:
+    """Random 128-bit EPC"""
+    return TAG_PREFIX + uuid.uuid4().hex
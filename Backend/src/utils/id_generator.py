@@ -0,0 +1,128 @@
+import datetime
+import os
+import socket
+import threading
+import time
+import zlib
+from typing import List, Optional
+
+from ..config.Settings import settings
+
+# Crockford base32, its characters are in ASCII order so encoded IDs sort like the numbers they encode
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"
+_DECODE = {char: value for value, char in enumerate(ALPHABET)}
+
+# 80 bit IDs, every field is a whole number of base32 characters:
+# 50 bit millisecond timestamp (10 chars) | 15 bit worker (3 chars) | 15 bit sequence (3 chars)
+TIMESTAMP_CHARS = 10
+WORKER_BITS = 15
+SEQUENCE_BITS = 15
+MAX_WORKER_ID = (1 << WORKER_BITS) - 1
+MAX_SEQUENCE = (1 << SEQUENCE_BITS) - 1
+
+
+def _encode(value: int, length: int) -> str:
+    chars = []
+    for _ in range(length):
+        chars.append(ALPHABET[value & 31])
+        value >>= 5
+    return "".join(reversed(chars))
+
+
+def _default_worker_id() -> int:
+    """
+    Worker component derived from host name and process ID. Only 15 bits, so two processes can derive the
+    same one: server processes lease a unique ID instead (src/Db/worker_lease.py) unless WORKER_ID is set.
+    """
+    seed = f"{socket.gethostname()}:{os.getpid()}".encode()
+    return zlib.crc32(seed) & MAX_WORKER_ID
+
+
+class IdGenerator:
+    """
+    Time ordered, collision free IDs like "SCAN_01JAB3C4D5E6F7G8".
+    IDs from one generator never repeat and increase with time, so they append to the end of B-tree indexes.
+    Processes only need distinct worker IDs to never collide with each other. The worker ID is the one
+    given, else the one leased through set_worker_id(), else derived from host name and process ID.
+    """
+
+    def __init__(self, worker_id: Optional[int] = None):
+        self._fixed_worker_id = worker_id
+        self._leased_worker_id: Optional[int] = None
+        self._lock = threading.Lock()
+        self._reset()
+
+    def set_worker_id(self, worker_id: Optional[int]) -> None:
+        """Use a leased worker ID, None goes back to the derived one; a fixed worker ID is kept"""
+        with self._lock:
+            self._leased_worker_id = worker_id
+            self._reset()
+
+    def _reset(self) -> None:
+        worker_id = self._fixed_worker_id
+        if worker_id is None:
+            worker_id = self._leased_worker_id
+        if worker_id is None:
+            worker_id = _default_worker_id()
+        if not 0 <= worker_id <= MAX_WORKER_ID:
+            raise ValueError(f"Worker ID must be between 0 and {MAX_WORKER_ID}")
+        self.worker_id = worker_id
+        self._worker_chars = _encode(worker_id, 3)
+        self._last_ms = 0
+        self._sequence = 0
+        self._time_chars = ""
+
+    def _advance(self, count: int):
+        """Reserve count sequence numbers, returns (time chars, first sequence)"""
+        now_ms = time.time_ns() // 1_000_000
+        if now_ms > self._last_ms:
+            self._last_ms = now_ms
+            self._sequence = 0
+            self._time_chars = _encode(now_ms, TIMESTAMP_CHARS)
+        elif self._sequence + count > MAX_SEQUENCE + 1:
+            # Sequence exhausted (or clock went backwards): borrow the next millisecond
+            self._last_ms += 1
+            self._sequence = 0
+            self._time_chars = _encode(self._last_ms, TIMESTAMP_CHARS)
+        first = self._sequence
+        self._sequence += count
+        return self._time_chars, first
+
+    def new_id(self, prefix: str) -> str:
+        with self._lock:
+            time_chars, sequence = self._advance(1)
+        return (f"{prefix}_{time_chars}{self._worker_chars}"
+                f"{ALPHABET[sequence >> 10]}{ALPHABET[(sequence >> 5) & 31]}{ALPHABET[sequence & 31]}")
+
+    def new_ids(self, prefix: str, count: int) -> List[str]:
+        """Allocate IDs for a bulk insert, a millisecond's worth of sequence at a time"""
+        ids = []
+        while count > 0:
+            block = min(count, MAX_SEQUENCE + 1)
+            with self._lock:
+                time_chars, first = self._advance(block)
+            head = f"{prefix}_{time_chars}{self._worker_chars}"
+            ids.extend(
+                f"{head}{ALPHABET[sequence >> 10]}{ALPHABET[(sequence >> 5) & 31]}{ALPHABET[sequence & 31]}"
+                for sequence in range(first, first + block)
+            )
+            count -= block
+        return ids
+
+
+def id_timestamp(generated_id: str) -> datetime.datetime:
+    """Creation time encoded in an ID made by IdGenerator"""
+    encoded = generated_id.rsplit("_", 1)[-1][:TIMESTAMP_CHARS]
+    milliseconds = 0
+    for char in encoded:
+        milliseconds = (milliseconds << 5) | _DECODE[char]
+    return datetime.datetime.fromtimestamp(milliseconds / 1000)
+
+
+id_generator = IdGenerator(settings.WORKER_ID)
+new_id = id_generator.new_id
+new_ids = id_generator.new_ids
+
+if hasattr(os, "register_at_fork"):
+    # A forked worker must not keep producing its parent's sequence, nor use the worker ID its parent leased
+    os.register_at_fork(after_in_child=lambda: id_generator.set_worker_id(None))
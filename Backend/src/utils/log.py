@@ -0,0 +1,197 @@
+import json
+import logging
+import logging.handlers
+import queue
+import random
+import sys
+import threading
+import time
+from typing import Optional, Dict, Any
+
+ROOT_LOGGER = "theftblock"
+
+
+class JsonFormatter(logging.Formatter):
+    """One JSON object per line: time, level, logger, event and the event's fields"""
+
+    def format(self, record: logging.LogRecord) -> str:
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname.lower(),
+            "logger": record.name,
+            "event": record.getMessage()
+        }
+        fields = getattr(record, "fields", None)
+        if fields:
+            entry.update(fields)
+        if record.exc_info:
+            entry["exception"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str, separators=(",", ":"))
+
+
+class TextFormatter(logging.Formatter):
+    """Human readable line with the event's fields as key=value pairs"""
+
+    def __init__(self):
+        super().__init__("%(asctime)s %(levelname)s %(name)s %(message)s")
+
+    def format(self, record: logging.LogRecord) -> str:
+        line = super().format(record)
+        fields = getattr(record, "fields", None)
+        if fields:
+            line += " " + " ".join(f"{key}={value}" for key, value in fields.items())
+        return line
+
+
+class _QueueHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to the writer thread untouched, formatting happens there. A full queue drops the record
+    instead of blocking the event loop.
+    """
+
+    def __init__(self, log_queue: queue.Queue):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+class _ItemLimiter:
+    """Per-event sampling plus a token bucket of rate_limit events per second"""
+
+    def __init__(self, sample_rate: float, rate_limit: float):
+        self.sample_rate = sample_rate
+        self.rate_limit = rate_limit
+        self._buckets: Dict[str, list] = {}  # event -> [tokens, last refill]
+        self._lock = threading.Lock()
+        self.suppressed = 0
+
+    def allow(self, event: str) -> bool:
+        if self.sample_rate < 1.0 and random.random() >= self.sample_rate:
+            self.suppressed += 1
+            return False
+        if self.rate_limit <= 0:
+            return True
+        now = time.monotonic()
+        with self._lock:
+            bucket = self._buckets.get(event)
+            if bucket is None:
+                bucket = self._buckets[event] = [self.rate_limit, now]
+            bucket[0] = min(self.rate_limit, bucket[0] + (now - bucket[1]) * self.rate_limit)
+            bucket[1] = now
+            if bucket[0] < 1:
+                self.suppressed += 1
+                return False
+            bucket[0] -= 1
+        return True
+
+
+class StructuredLogger:
+    """
+    Logger of named events with keyword fields: log.info("products_received", receipt_id=..., received=...).
+    item() is for per-product events inside a loop. They are off unless LOG_ITEM_EVENTS is set, and then
+    sampled and rate limited per event name, so operations log their summary event instead.
+    """
+
+    def __init__(self, name: str):
+        self.logger = logging.getLogger(f"{ROOT_LOGGER}.{name}")
+
+    def _log(self, level: int, event: str, fields: Dict[str, Any], exc_info=None) -> None:
+        if self.logger.isEnabledFor(level):
+            self.logger.log(level, event, extra={"fields": fields}, exc_info=exc_info)
+
+    def debug(self, event: str, **fields) -> None:
+        self._log(logging.DEBUG, event, fields)
+
+    def info(self, event: str, **fields) -> None:
+        self._log(logging.INFO, event, fields)
+
+    def warning(self, event: str, **fields) -> None:
+        self._log(logging.WARNING, event, fields)
+
+    def error(self, event: str, exc_info=None, **fields) -> None:
+        self._log(logging.ERROR, event, fields, exc_info)
+
+    def item(self, event: str, **fields) -> None:
+        limiter = _config.item_limiter
+        if limiter is None or not self.logger.isEnabledFor(logging.INFO) or not limiter.allow(event):
+            return
+        self._log(logging.INFO, event, fields)
+
+
+class _LoggingConfig:
+    def __init__(self):
+        self.listener: Optional[logging.handlers.QueueListener] = None
+        self.handler: Optional[_QueueHandler] = None
+        self.item_limiter: Optional[_ItemLimiter] = None
+
+
+_config = _LoggingConfig()
+
+
+def get_logger(name: str) -> StructuredLogger:
+    return StructuredLogger(name)
+
+
+def setup_logging(level: str = "INFO", log_format: str = "json", path: Optional[str] = None,
+                  queue_size: int = 10_000, item_events: bool = False, item_sample_rate: float = 1.0,
+                  item_rate_limit: float = 100.0, max_bytes: int = 50_000_000, backup_count: int = 5,
+                  stdout: bool = True) -> None:
+    """
+    Route the application's loggers through a bounded queue to a writer thread, which formats the records
+    and writes them to stdout and, with path, to a rotating file. Calling it again replaces the setup.
+    """
+    shutdown_logging()
+    formatter = JsonFormatter() if log_format == "json" else TextFormatter()
+    handlers = [logging.StreamHandler(sys.stdout)] if stdout else []
+    if path:
+        handlers.append(logging.handlers.RotatingFileHandler(path, maxBytes=max_bytes, backupCount=backup_count))
+    for handler in handlers:
+        handler.setFormatter(formatter)
+
+    log_queue: queue.Queue = queue.Queue(maxsize=queue_size)
+    _config.handler = _QueueHandler(log_queue)
+    _config.listener = logging.handlers.QueueListener(log_queue, *handlers, respect_handler_level=False)
+    _config.item_limiter = _ItemLimiter(item_sample_rate, item_rate_limit) if item_events else None
+
+    root = logging.getLogger(ROOT_LOGGER)
+    root.handlers = [_config.handler]
+    root.setLevel(level.upper())
+    root.propagate = False
+    _config.listener.start()
+
+
+def shutdown_logging() -> None:
+    """Stop the writer thread once the queued records are written"""
+    if _config.listener is not None:
+        _config.listener.stop()
+        for handler in _config.listener.handlers:
+            handler.close()
+        _config.listener = None
+    if _config.handler is not None:
+        logging.getLogger(ROOT_LOGGER).removeHandler(_config.handler)
+        _config.handler = None
+
+
+def setup_logging_from_settings(**overrides) -> None:
+    from ..config.Settings import settings
+    options = dict(level=settings.LOG_LEVEL, log_format=settings.LOG_FORMAT, path=settings.LOG_FILE,
+                   queue_size=settings.LOG_QUEUE_SIZE, item_events=settings.LOG_ITEM_EVENTS,
+                   item_sample_rate=settings.LOG_ITEM_SAMPLE_RATE, item_rate_limit=settings.LOG_ITEM_RATE_LIMIT)
+    options.update(overrides)
+    setup_logging(**options)
+
+
+def logging_stats() -> Dict[str, int]:
+    return {
+        "queued": _config.handler.queue.qsize() if _config.handler is not None else 0,
+        "dropped": _config.handler.dropped if _config.handler is not None else 0,
+        "items_suppressed": _config.item_limiter.suppressed if _config.item_limiter is not None else 0
+    }
@@ -0,0 +1,214 @@
+import asyncio
+import functools
+import inspect
+import math
+import time
+from typing import Optional, Dict, List, Tuple, Callable, Iterable, Any
+
+from .background import BackgroundTask
+from .log import get_logger
+
+log = get_logger("metrics")
+
+# Seconds, from a cached lookup to a slow analytics query
+DEFAULT_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(names: Tuple[str, ...], values: Tuple[str, ...], extra: str = "") -> str:
+    pairs = [f'{name}="{_escape(value)}"' for name, value in zip(names, values)]
+    if extra:
+        pairs.append(extra)
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == math.inf:
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    """Monotonic count per label values. Plain dict updates, only ever touched from the event loop"""
+
+    kind = "counter"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self._values: Dict[Tuple[str, ...], float] = {} if self.labels else {(): 0}
+
+    def inc(self, *label_values: str, amount: float = 1) -> None:
+        self._values[label_values] = self._values.get(label_values, 0) + amount
+
+    def value(self, *label_values: str) -> float:
+        return self._values.get(label_values, 0)
+
+    def samples(self) -> List[str]:
+        return [f"{self.name}{_format_labels(self.labels, values)} {_format_value(value)}"
+                for values, value in self._values.items()]
+
+
+class Gauge:
+    """Value read from a callback at scrape time, so the hot path never updates it"""
+
+    kind = "gauge"
+
+    def __init__(self, name: str, documentation: str, read: Callable[[], Optional[float]]):
+        self.name = name
+        self.documentation = documentation
+        self.read = read
+
+    def samples(self) -> List[str]:
+        value = self.read()
+        return [] if value is None else [f"{self.name} {_format_value(value)}"]
+
+
+class Histogram:
+    """
+    Observations counted into fixed buckets per label values. Only the bucket an observation falls into is
+    incremented (found by bisection), the cumulative counts Prometheus expects are summed at scrape time.
+    """
+
+    kind = "histogram"
+
+    def __init__(self, name: str, documentation: str, labels: Iterable[str] = (),
+                 buckets: Iterable[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labels = tuple(labels)
+        self.buckets = tuple(sorted(buckets))
+        self._series: Dict[Tuple[str, ...], List[float]] = {}  # counts per bucket + overflow, then sum
+
+    def observe(self, value: float, *label_values: str) -> None:
+        series = self._series.get(label_values)
+        if series is None:
+            series = self._series[label_values] = [0] * (len(self.buckets) + 2)
+        buckets = self.buckets
+        low, high = 0, len(buckets)
+        while low < high:
+            middle = (low + high) // 2
+            if value <= buckets[middle]:
+                high = middle
+            else:
+                low = middle + 1
+        series[low] += 1
+        series[-1] += value
+
+    def count(self, *label_values: str) -> int:
+        series = self._series.get(label_values)
+        return int(sum(series[:-1])) if series else 0
+
+    def samples(self) -> List[str]:
+        lines = []
+        for values, series in self._series.items():
+            cumulative = 0
+            for bound, count in zip(self.buckets + (math.inf,), series):
+                cumulative += count
+                le = 'le="' + _format_value(bound) + '"'
+                lines.append(f"{self.name}_bucket{_format_labels(self.labels, values, le)} {int(cumulative)}")
+            labels = _format_labels(self.labels, values)
+            lines.append(f"{self.name}_sum{labels} {_format_value(series[-1])}")
+            lines.append(f"{self.name}_count{labels} {int(cumulative)}")
+        return lines
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._metrics: Dict[str, Any] = {}
+
+    def _add(self, metric):
+        existing = self._metrics.get(metric.name)
+        if existing is not None:
+            return existing
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labels: Iterable[str] = ()) -> Counter:
+        return self._add(Counter(name, documentation, labels))
+
+    def histogram(self, name: str, documentation: str, labels: Iterable[str] = (),
+                  buckets: Iterable[float] = DEFAULT_BUCKETS) -> Histogram:
+        return self._add(Histogram(name, documentation, labels, buckets))
+
+    def gauge(self, name: str, documentation: str, read: Callable[[], Optional[float]]) -> Gauge:
+        """Register a gauge read at scrape time, replacing an earlier one of the same name"""
+        gauge = Gauge(name, documentation, read)
+        self._metrics[name] = gauge
+        return gauge
+
+    def render(self) -> str:
+        """All metrics in the Prometheus text exposition format"""
+        lines = []
+        for metric in self._metrics.values():
+            try:
+                samples = metric.samples()
+            except Exception as e:
+                log.error("metric_collect_failed", metric=metric.name, error=str(e))
+                continue
+            lines.append(f"# HELP {metric.name} {metric.documentation}")
+            lines.append(f"# TYPE {metric.name} {metric.kind}")
+            lines.extend(samples)
+        return "\n".join(lines) + "\n"
+
+
+metrics = MetricsRegistry()
+
+manager_latency = metrics.histogram("manager_method_seconds", "Latency of manager methods",
+                                    labels=("manager", "method"))
+manager_errors = metrics.counter("manager_method_errors_total", "Manager method calls that raised",
+                                 labels=("manager", "method"))
+
+
+def instrumented(cls):
+    """Class decorator timing every public coroutine method into manager_method_seconds"""
+    manager = cls.__name__
+    for name, method in list(vars(cls).items()):
+        if name.startswith("_") or not inspect.iscoroutinefunction(method):
+            continue
+        setattr(cls, name, _timed(method, manager, name))
+    return cls
+
+
+def _timed(method, manager: str, name: str):
+    @functools.wraps(method)
+    async def wrapper(*args, **kwargs):
+        start = time.perf_counter()
+        try:
+            return await method(*args, **kwargs)
+        except Exception:
+            manager_errors.inc(manager, name)
+            raise
+        finally:
+            manager_latency.observe(time.perf_counter() - start, manager, name)
+    return wrapper
+
+
+class LoopLagMonitor:
+    """Measures how late the event loop wakes up from a sleep of interval seconds, the time it was blocked"""
+
+    def __init__(self, interval_seconds: float = 0.5):
+        self.interval_seconds = interval_seconds
+        self.lag = metrics.histogram("event_loop_lag_seconds", "Delay of event loop wake-ups past their deadline",
+                                     buckets=(0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 5.0))
+        self.last_lag = 0.0
+        metrics.gauge("event_loop_lag_last_seconds", "Most recent event loop lag", lambda: self.last_lag)
+        self._task = BackgroundTask(self._run)
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            deadline = loop.time() + self.interval_seconds
+            await asyncio.sleep(self.interval_seconds)
+            self.last_lag = max(0.0, loop.time() - deadline)
+            self.lag.observe(self.last_lag)
+
+    def start(self) -> None:
+        self._task.start()
+
+    async def stop(self) -> None:
+        await self._task.stop()
@@ -0,0 +1,22 @@
+import math
+from typing import Dict, Iterable, Sequence
+
+
+def percentile(sorted_values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile of already sorted values"""
+    if not sorted_values:
+        return 0.0
+    rank = max(0, min(len(sorted_values) - 1, math.ceil(pct / 100 * len(sorted_values)) - 1))
+    return sorted_values[rank]
+
+
+def latency_summary(latencies: Iterable[float], scale: float = 1000.0) -> Dict[str, float]:
+    """p50/p95/p99/max of latencies in seconds, reported in milliseconds by default"""
+    values = sorted(latencies)
+    return {
+        "count": len(values),
+        "p50_ms": round(percentile(values, 50) * scale, 3),
+        "p95_ms": round(percentile(values, 95) * scale, 3),
+        "p99_ms": round(percentile(values, 99) * scale, 3),
+        "max_ms": round((values[-1] if values else 0.0) * scale, 3)
+    }